@@ -2,18 +2,83 @@ from pkg.app.ai_agent import ai_agent_app_server
 from pkg.app.image_generate import image_generate_app_server
 from pkg.app.metric import metric_app_server
 from pkg.app.resource import resource_app_server
-from pkg.db.db import DBManager
+from pkg.app.resource_async import resource_async_app_server
+from pkg.client.llm.artifact import artifact_store
+from pkg.client.llm.pool import agent_pool_manager
+from pkg.client.llm.sandbox import sandbox
+from pkg.db.db import DBManager, set_db_manager
+from pkg.db.migrate import plan
 from pkg.server.http.server import WebServerLoader
 from pkg.util.config.config import config_manager
+from pkg.util.log.log import logger
 
 
-def init_webserver():
+def create_db_manager():
     config = config_manager.get_config()
-    db_manager = DBManager(db_name=config.db.db_name, db_host=config.db.host, db_port=config.db.port, db_user=config.db.user, db_password=config.db.password)
-    db_manager.connect()
+    return DBManager(
+        db_name=config.db.db_name,
+        db_host=config.db.host,
+        db_port=config.db.port,
+        db_user=config.db.user,
+        db_password=config.db.password,
+        pool_size=config.db.pool_size,
+        max_overflow=config.db.max_overflow,
+        pool_recycle=config.db.pool_recycle,
+        pool_pre_ping=config.db.pool_pre_ping,
+        enable_async=config.db.enable_async,
+    )
+
+
+def init_db():
+    # 建表只需在主进程执行一次, 连接池不能跨 fork 复用, 用完即释放
+    db_manager = create_db_manager()
     db_manager.init_db()
-    webserver = WebServerLoader(host=config.server.host, port=config.server.port)
+    indexes, foreign_keys = plan(db_manager.engine)
+    if indexes or foreign_keys:
+        # create_all 不修改已有的表
+        logger.warning(
+            "missing {} indexes and {} foreign keys, run python -m pkg.db.migrate".format(
+                len(indexes), len(foreign_keys)
+            )
+        )
+    db_manager.dispose()
+
+
+def init_worker():
+    # 每个 worker 进程各自持有连接池与 agent 池
+    db_manager = create_db_manager()
+    db_manager.connect()
+    set_db_manager(db_manager)
+    agent_pool_manager.init_pools(
+        size=config_manager.get_config().llm.agent_pool_size,
+        timeout=config_manager.get_config().llm.agent_pool_timeout,
+    )
+    storage = config_manager.get_config().storage
+    artifact_store.configure(
+        path=storage.artifact_path,
+        threshold=storage.artifact_threshold,
+        ttl=storage.artifact_ttl,
+        max_bytes=storage.artifact_max_bytes,
+    )
+    sandbox_config = config_manager.get_config().sandbox
+    sandbox.configure(
+        workers=sandbox_config.workers,
+        timeout=sandbox_config.timeout,
+        cpu_seconds=sandbox_config.cpu_seconds,
+        memory_bytes=sandbox_config.memory_mb * 1024 * 1024,
+        max_input_chars=sandbox_config.max_input_chars,
+    )
+    sandbox.warm_up()
+
+
+def init_webserver():
+    config = config_manager.get_config()
+    init_db()
+    webserver = WebServerLoader(host=config.server.host, port=config.server.port, workers=config.server.workers)
+    webserver.add_worker_initializer(init_worker)
     webserver.register_server([metric_app_server, ai_agent_app_server, image_generate_app_server, resource_app_server])
+    if config.db.enable_async:
+        webserver.register_server([resource_async_app_server])
     webserver.start()
 
 
@@ -21,4 +86,4 @@ def main():
     init_webserver()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,7 +1,51 @@
+import codecs
+import functools
+import json
+import tempfile
+from typing import AsyncIterator, Iterator, List, Optional
+
+from fastapi import Depends, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
-from pkg.client.llm.llm import LiscoAgent
+from pkg.client.llm.artifact import artifact_store, start_collecting
+from pkg.client.llm import codec
+from pkg.client.llm.cache import llm_cache_bypass
+from pkg.client.llm.formatter import (
+    format_events,
+    iter_chunks,
+    iter_json_events,
+    iter_object_events,
+)
+from pkg.client.llm.http_client import http_client_registry
+from pkg.client.llm.llm import LiscoAgent, model_router
+from pkg.client.llm.pool import AgentPoolExhausted, agent_pool_manager
+from pkg.client.llm.rate_limit import UpstreamOverloaded
+from pkg.client.llm.sandbox import SandboxError, SandboxInputTooLarge, sandbox
+from pkg.client.llm.tool import (
+    InputFormatEnum,
+    OutputFormatEnum,
+    pretty_print,
+    pretty_print_text,
+)
 from pkg.server.http.server import AppServer
+from pkg.server.http.sse import EventSourceResponse, format_sse, start_event_stream
+from pkg.util.config.config import config_manager
+from pkg.util.metric.metric import metric_registry
+
+# 响应头标明请求由本地解析(local)还是 LLM(llm)处理
+SERVED_BY_HEADER = "X-Lisco-Path"
+# 响应头标明响应体为哪个 artifact 的完整内容
+ARTIFACT_HEADER = "X-Lisco-Artifact"
+# 请求头 X-Lisco-Cache: bypass 时不读 LLM 响应缓存, 结果仍会写回缓存
+CACHE_BYPASS = "bypass"
+PRETTY_PRINT_REQUESTS_TOTAL = "ai_agent_pretty_print_requests_total"
+
+metric_registry.describe(
+    PRETTY_PRINT_REQUESTS_TOTAL,
+    "pretty-print 请求数, path 为 local 或 llm, result 为 ok 或 error(agent 调用失败)",
+)
 
 
 class AIAgentAppServer(AppServer):
@@ -11,6 +55,22 @@ class AIAgentAppServer(AppServer):
 
 ai_agent_app_server = AIAgentAppServer()
 ai_agent_app = ai_agent_app_server.get_app()
+ai_agent_app.router.add_event_handler("shutdown", http_client_registry.aclose)
+ai_agent_app.router.add_event_handler("shutdown", http_client_registry.close)
+ai_agent_app.router.add_event_handler("shutdown", sandbox.shutdown)
+
+
+@ai_agent_app.exception_handler(AgentPoolExhausted)
+@ai_agent_app.exception_handler(UpstreamOverloaded)
+def overloaded_handler(request, exc: Exception):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+@ai_agent_app.exception_handler(SandboxError)
+def sandbox_error_handler(request, exc: SandboxError):
+    # 超出限制的输入同样不交给 LLM
+    status_code = 413 if isinstance(exc, SandboxInputTooLarge) else 422
+    return JSONResponse(status_code=status_code, content={"detail": str(exc)})
 
 
 @ai_agent_app.get("/")
@@ -18,10 +78,22 @@ def read_root():
     return {"Hello": "World, ai agent"}
 
 
-class PrettyPrintPythonObjectBody(BaseModel):
-    query: str = Field(description="用户请求字符串")
-    prompt: str = Field(
-        """
+@ai_agent_app.get("/pool/stats")
+def read_pool_stats():
+    return agent_pool_manager.stats()
+
+
+@ai_agent_app.get("/router/stats")
+def read_router_stats():
+    return model_router.snapshot()
+
+
+async def llm_cache_control(x_lisco_cache: Optional[str] = Header(None)):
+    # 需为 async 依赖, 在请求所在的上下文中设置, 同步路由的线程池会复制该上下文
+    llm_cache_bypass.set(x_lisco_cache == CACHE_BYPASS)
+
+
+PRETTY_PRINT_PROMPT = """
     你是字符串处理专家，使用 pretty_print_python_object 工具并按照下面规则处理用户请求字符串，并返回处理结果。
     参数解析规则：
         input_format：
@@ -30,13 +102,383 @@ class PrettyPrintPythonObjectBody(BaseModel):
             like_json_text: 类似 json 文本，但是因为有一点格式问题，如缺少了一个引号、括号会导致 json 解析错误的文本
         output_format：
             输出格式，可选值：json, yaml, toml, ini, xml, html, markdown, latex, text， 默认为 text
-    """,
-        description="用户提示词",
+    """
+
+
+class PrettyPrintPythonObjectBody(BaseModel):
+    query: str = Field(description="用户请求字符串")
+    prompt: str = Field(PRETTY_PRINT_PROMPT, description="用户提示词")
+    output_format: OutputFormatEnum = Field(
+        OutputFormatEnum.JSON,
+        description="query 能直接解析时本地格式化的输出格式, 无法解析时由 LLM 按 query 决定",
     )
 
 
-@ai_agent_app.post("/pretty-print-python-object")
-def pretty_print_python_object(body: PrettyPrintPythonObjectBody) -> str:
-    agent = LiscoAgent()
-    result = agent.invoke({"input": "{}\n {}".format(body.prompt, body.query)})
+def pretty_print_locally(query: str, output_format: OutputFormatEnum) -> Optional[str]:
+    """
+    query 本身就是合法的 json 文本或 python 对象, 或只有常见格式问题能在本地修复时
+    直接格式化, 不经过 LLM; 在沙箱进程中执行, 超出限制时抛出 SandboxError
+    """
+    return sandbox.run(pretty_print_text, query, output_format.value)
+
+
+async def apretty_print_locally(
+    query: str, output_format: OutputFormatEnum
+) -> Optional[str]:
+    return await sandbox.arun(pretty_print_text, query, output_format.value)
+
+
+def agent_input(prompt: str, query: str) -> dict:
+    return {"input": "{}\n {}".format(prompt, query)}
+
+
+def record_request(path: str, result: str = "ok"):
+    metric_registry.inc(PRETTY_PRINT_REQUESTS_TOTAL, {"path": path, "result": result})
+
+
+def record_served_by(response: Response, path: str):
+    response.headers[SERVED_BY_HEADER] = path
+    record_request(path)
+
+
+@ai_agent_app.post(
+    "/pretty-print-python-object", dependencies=[Depends(llm_cache_control)]
+)
+def pretty_print_python_object(
+    body: PrettyPrintPythonObjectBody, response: Response
+) -> str:
+    result = pretty_print_locally(body.query, body.output_format)
+    if result is not None:
+        record_served_by(response, "local")
+        return result
+
+    response.headers[SERVED_BY_HEADER] = "llm"
+    artifacts = start_collecting()
+    try:
+        with agent_pool_manager.get_pool(LiscoAgent).acquire() as agent:
+            result = agent.invoke(agent_input(body.prompt, body.query))
+    except Exception:
+        record_request("llm", "error")
+        raise
+    record_request("llm")
+    # 工具结果已转存时直接返回最后一个 artifact, 而不是 LLM 复述的内容
+    chunks = artifact_store.open(artifacts[-1].id) if artifacts else None
+    if chunks is not None:
+        return StreamingResponse(
+            json_string_stream(chunks),
+            media_type="application/json",
+            headers={SERVED_BY_HEADER: "llm", ARTIFACT_HEADER: artifacts[-1].id},
+        )
     return result["output"]
+
+
+def json_string_stream(chunks: Iterator[str]) -> Iterator[str]:
+    """
+    逐块编码为一个 json 字符串, 与直接返回 str 时的响应体一致
+    """
+    yield '"'
+    for chunk in chunks:
+        yield json.dumps(chunk, ensure_ascii=False)[1:-1]
+    yield '"'
+
+
+@ai_agent_app.get("/artifacts/{artifact_id}")
+def read_artifact(artifact_id: str):
+    chunks = artifact_store.open(artifact_id)
+    if chunks is None:
+        raise HTTPException(status_code=404, detail="artifact not found or expired")
+    return StreamingResponse(chunks, media_type="text/plain; charset=utf-8")
+
+
+def agent_event_to_sse(event: dict) -> Optional[str]:
+    """
+    astream_events 事件转换为 SSE:
+        - token: LLM 逐 token 输出
+        - action: 开始调用工具
+        - step: 工具调用结果
+        - output: 最终答案
+        - artifact: 转存的工具结果, 见 agent_event_stream
+    """
+    kind = event["event"]
+    data = event["data"]
+    if kind == "on_chat_model_stream":
+        content = data["chunk"].content
+        if content:
+            return format_sse({"content": content}, event="token")
+    elif kind == "on_tool_start":
+        return format_sse({"tool": event["name"], "input": data.get("input")}, "action")
+    elif kind == "on_tool_end":
+        output = getattr(data.get("output"), "content", data.get("output"))
+        return format_sse({"tool": event["name"], "output": output}, event="step")
+    elif kind == "on_chain_end" and not event["parent_ids"]:
+        return format_sse({"output": data["output"].get("output")}, event="output")
+    return None
+
+
+async def agent_event_stream(agent_class, query: dict):
+    """
+    工具结果转存为 artifact 时, 在最终答案后以 artifact 事件分块推送完整内容;
+    agent 执行结束后才计入请求数, 执行失败计为 error
+    """
+    async with agent_pool_manager.get_pool(agent_class).aacquire() as agent:
+        yield format_sse({"agent": agent_class.__name__}, event="start")
+        artifacts = start_collecting()
+        try:
+            async for event in agent.astream_events(query):
+                sse = agent_event_to_sse(event)
+                if sse:
+                    yield sse
+        except Exception as e:
+            record_request("llm", "error")
+            yield format_sse({"detail": str(e)}, event="error")
+            return
+    record_request("llm")
+    for artifact in artifacts:
+        chunks = artifact_store.open(artifact.id)
+        if chunks is None:
+            continue
+        async for chunk in iterate_in_threadpool(chunks):
+            yield format_sse({"id": artifact.id, "content": chunk}, event="artifact")
+
+
+@ai_agent_app.post(
+    "/pretty-print-python-object/stream", dependencies=[Depends(llm_cache_control)]
+)
+async def pretty_print_python_object_stream(body: PrettyPrintPythonObjectBody):
+    """
+    流式版本, 以 Server-Sent Events 推送中间步骤与最终答案
+    """
+    result = await apretty_print_locally(body.query, body.output_format)
+    if result is not None:
+        response = EventSourceResponse(iter([format_sse({"output": result}, "output")]))
+        record_served_by(response, "local")
+        return response
+
+    query = agent_input(body.prompt, body.query)
+    try:
+        events = await start_event_stream(agent_event_stream(LiscoAgent, query))
+    except Exception:
+        record_request("llm", "error")
+        raise
+    return EventSourceResponse(events, headers={SERVED_BY_HEADER: "llm"})
+
+
+class PrettyPrintPythonObjectBatchBody(BaseModel):
+    queries: List[str] = Field(max_length=1000, description="用户请求字符串列表")
+    prompt: str = Field(PRETTY_PRINT_PROMPT, description="用户提示词")
+    output_format: OutputFormatEnum = Field(
+        OutputFormatEnum.JSON,
+        description="query 能直接解析时本地格式化的输出格式, 无法解析时由 LLM 按 query 决定",
+    )
+    max_concurrency: Optional[int] = Field(
+        None, ge=1, description="同时执行的 agent 调用数, 不超过配置的上限"
+    )
+
+
+def ndjson_line(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False, default=str) + "\n"
+
+
+async def artifact_line(line: dict, artifact_id: str, chunks: Iterator[str]):
+    """
+    output 为 artifact 的完整内容, 逐块编码输出, 不整体读入内存
+    """
+    line = dict(line, artifact=artifact_id)
+    yield json.dumps(line, ensure_ascii=False)[:-1] + ', "output": '
+    async for part in iterate_in_threadpool(json_string_stream(chunks)):
+        yield part
+    yield "}\n"
+
+
+async def batch_result_stream(body: PrettyPrintPythonObjectBatchBody):
+    """
+    本地能处理的条目先返回, 其余交给 agent 并发执行, 按完成先后返回;
+    工具结果转存为 artifact 的条目, output 为最后一个 artifact 的完整内容, 并带 artifact id
+    """
+    llm_items = []
+    for index, query in enumerate(body.queries):
+        try:
+            result = await apretty_print_locally(query, body.output_format)
+        except SandboxError as e:
+            yield ndjson_line({"index": index, "path": "local", "error": str(e)})
+            continue
+        if result is None:
+            llm_items.append(index)
+            continue
+        record_request("local")
+        yield ndjson_line({"index": index, "path": "local", "output": result})
+    if not llm_items:
+        return
+
+    limit = config_manager.get_config().llm.batch_max_concurrency
+    max_concurrency = min(body.max_concurrency or limit, limit)
+    queries = [agent_input(body.prompt, body.queries[index]) for index in llm_items]
+    try:
+        async with agent_pool_manager.get_pool(LiscoAgent).aacquire() as agent:
+            async for position, result, artifacts in agent.abatch_as_completed(
+                queries, max_concurrency
+            ):
+                index = llm_items[position]
+                if isinstance(result, Exception):
+                    record_request("llm", "error")
+                    line = {"index": index, "path": "llm", "error": str(result)}
+                    yield ndjson_line(line)
+                    continue
+                record_request("llm")
+                line = {"index": index, "path": "llm"}
+                chunks = artifact_store.open(artifacts[-1].id) if artifacts else None
+                if chunks is None:
+                    line["output"] = result["output"]
+                    yield ndjson_line(line)
+                    continue
+                async for part in artifact_line(line, artifacts[-1].id, chunks):
+                    yield part
+    except AgentPoolExhausted as e:
+        # 响应已开始, 无法再返回 503, 剩余条目逐条报错
+        for index in llm_items:
+            record_request("llm", "error")
+            yield ndjson_line({"index": index, "path": "llm", "error": str(e)})
+
+
+@ai_agent_app.post(
+    "/pretty-print-python-object/batch", dependencies=[Depends(llm_cache_control)]
+)
+async def pretty_print_python_object_batch(body: PrettyPrintPythonObjectBatchBody):
+    """
+    批量版本, 每行一个 json 结果(NDJSON), 含 index 对应请求中的下标, 失败条目带 error
+    """
+    return StreamingResponse(
+        batch_result_stream(body), media_type="application/x-ndjson"
+    )
+
+
+# 不超过该大小的 json 请求体整体用 orjson 处理, 超过时写入临时文件逐块解析输出
+FORMAT_BUFFER_BYTES = 8 * 1024 * 1024
+FORMAT_READ_BYTES = 64 * 1024
+FORMAT_REQUESTS_TOTAL = "ai_agent_format_requests_total"
+FORMAT_MEDIA_TYPES = {
+    OutputFormatEnum.JSON: "application/json",
+    OutputFormatEnum.YAML: "application/yaml",
+    OutputFormatEnum.TOML: "application/toml",
+    OutputFormatEnum.XML: "application/xml",
+    OutputFormatEnum.MARKDOWN: "text/markdown; charset=utf-8",
+}
+
+metric_registry.describe(
+    FORMAT_REQUESTS_TOTAL, "format 请求数, path 为 buffered、streaming 或 sandbox"
+)
+
+
+async def read_body(request: Request, limit: int):
+    """
+    :return: (请求体, None), 超过 limit 字节时为 (None, 含完整请求体的临时文件)
+    """
+    parts = []
+    size = 0
+    stream = request.stream()
+    async for chunk in stream:
+        parts.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            spool = tempfile.TemporaryFile()
+            await run_in_threadpool(spool.writelines, parts)
+            async for chunk in stream:
+                await run_in_threadpool(spool.write, chunk)
+            spool.seek(0)
+            return None, spool
+    return b"".join(parts), None
+
+
+def iter_file_text(f) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with f:
+        while True:
+            chunk = f.read(FORMAT_READ_BYTES)
+            text = decoder.decode(chunk, final=not chunk)
+            if text:
+                yield text
+            if not chunk:
+                return
+
+
+def format_json_body(body: bytes, output_format: str) -> Iterator:
+    try:
+        obj = codec.loads(body)
+    except ValueError:
+        # 超过 64 位的整数等 orjson 不支持的输入逐块解析, 非法 json 也由其给出错误位置
+        events = iter_json_events(iter_chunks(body.decode()))
+        return format_events(events, output_format)
+    if output_format == OutputFormatEnum.JSON.value:
+        return iter([codec.dumps(obj)])
+    return format_events(iter_object_events(obj), output_format)
+
+
+async def prefetched(first, chunks: Iterator) -> AsyncIterator:
+    yield first
+    async for chunk in iterate_in_threadpool(chunks):
+        yield chunk
+
+
+@ai_agent_app.post("/format")
+async def format_text(
+    request: Request,
+    input_format: InputFormatEnum = InputFormatEnum.JSON_TEXT,
+    output_format: OutputFormatEnum = OutputFormatEnum.JSON,
+):
+    """
+    不经过 LLM 直接格式化请求体, 请求体为原始文本(utf-8), 响应逐块返回
+        - json_text: orjson 解析与输出, 布局与 json.dumps(indent=4, ensure_ascii=False)
+          一致; 超过 FORMAT_BUFFER_BYTES 时逐块解析输出, 数值与字符串保持原样
+        - python_object: 在沙箱中解析
+        - like_json_text: 在沙箱中解析或修复, 修复不可信时返回 422
+    """
+    body, spool = await read_body(request, FORMAT_BUFFER_BYTES)
+    if input_format == InputFormatEnum.JSON_TEXT:
+        path = "buffered" if spool is None else "streaming"
+        if spool is None:
+            build = functools.partial(format_json_body, body, output_format.value)
+        else:
+            build = functools.partial(
+                format_events,
+                iter_json_events(iter_file_text(spool)),
+                output_format.value,
+            )
+    elif spool is not None:
+        spool.close()
+        raise HTTPException(status_code=413, detail="request body too large")
+    else:
+        path = "sandbox"
+        try:
+            text = body.decode()
+        except UnicodeDecodeError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if input_format == InputFormatEnum.PYTHON_OBJECT:
+            try:
+                result = await sandbox.arun(
+                    pretty_print, text, input_format.value, output_format.value
+                )
+            except (
+                ValueError,
+                TypeError,
+                SyntaxError,
+                RecursionError,
+                MemoryError,
+            ) as e:
+                raise HTTPException(status_code=422, detail=str(e))
+        else:
+            result = await sandbox.arun(pretty_print_text, text, output_format.value)
+            if result is None:
+                raise HTTPException(status_code=422, detail="unable to parse locally")
+        build = functools.partial(iter, [result])
+    metric_registry.inc(FORMAT_REQUESTS_TOTAL, {"path": path})
+
+    # 先取出第一块, 输入开头即有错误时仍能返回 422
+    try:
+        chunks = await run_in_threadpool(build)
+        first = await run_in_threadpool(next, chunks, "")
+    except (ValueError, TypeError) as e:
+        if spool is not None:
+            spool.close()
+        raise HTTPException(status_code=422, detail=str(e))
+    media_type = FORMAT_MEDIA_TYPES.get(output_format, "text/plain; charset=utf-8")
+    return StreamingResponse(prefetched(first, chunks), media_type=media_type)
@@ -1,10 +1,16 @@
 import json
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Union
 
 from fastapi import Query
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field
 
 from pkg.server.http.server import AppServer
+from pkg.util.config.config import config_manager
+from pkg.util.metric.metric import metric_registry
+from pkg.util.metric.runtime import RuntimeSampler
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
 
 
 class MetricAppServer(AppServer):
@@ -15,6 +21,13 @@ class MetricAppServer(AppServer):
 metric_app_server = MetricAppServer()
 metric_app = metric_app_server.get_app()
 
+runtime_sampler = RuntimeSampler(
+    interval=config_manager.get_config().metric.sample_interval,
+    capacity=config_manager.get_config().metric.sample_capacity,
+)
+metric_app.router.add_event_handler("startup", runtime_sampler.start)
+metric_app.router.add_event_handler("shutdown", runtime_sampler.stop)
+
 
 @metric_app.get(
     path="/",
@@ -39,7 +52,9 @@ def read_root(
 
 
 class MetricResponse(BaseModel):
-    data: Dict[str, str] = Field(description="指标键值对")
+    data: List[Dict[str, Optional[Union[int, float]]]] = Field(
+        description="进程运行时采样, 按时间先后排列, 包含 CPU、RSS、GC、文件描述符、线程池与事件循环延迟"
+    )
 
 
 # 写一个 POST metric 接口，同样是 展示应用内部指标， body 参数 json， 参数有 size
@@ -47,23 +62,42 @@ class MetricResponse(BaseModel):
     path="/",
     summary="展示应用内部指标",
     name="GetMetrics",
-    description="获取应用内部指标接口，可以接收一个可选的'size'参数来展示如何处理查询参数。",
+    description="获取应用内部指标接口，返回最近 size 次进程运行时采样。",
     tags=["Metric"],
     response_model=MetricResponse,
 )
 def read_root(
-        size: Optional[int] = Query(3, description="一个可选的整数参数，用于演示如何处理查询参数", title=None)
+        size: Optional[int] = Query(3, description="返回最近的采样条数, 为空时返回缓冲区内全部采样", title=None)
 ):
-    data= {
-        "CPUUsage": "10%",
-        "MemoryUsage": "20%",
-        "DiskUsage": "30%",
-        "NetworkUsage": "40%",
-        "BatteryUsage": "90%"
-    }
-
-    # 根据 size 返回  size 个数据
-    if size is not None:
-        data = {k: v for k, v in data.items() for _ in range(size)}
+    return {"data": runtime_sampler.recent(size)}
+
+
+@metric_app.get(
+    path="/metrics",
+    summary="Prometheus 格式的应用指标",
+    description="按子应用/路由统计的请求数、状态码与耗时直方图, 以 Prometheus text 格式输出",
+    tags=["Metric"],
+    response_class=PlainTextResponse,
+)
+def read_prometheus_metrics():
+    return PlainTextResponse(metric_registry.to_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@metric_app.get(
+    path="/metrics/json",
+    summary="JSON 格式的应用指标",
+    description="与 /metrics 相同的指标, 直方图额外给出 avg/p50/p90/p99 估算值",
+    tags=["Metric"],
+)
+def read_json_metrics():
+    return metric_registry.to_json()
+
 
-    return {"data": data}
+@metric_app.get(
+    path="/metrics/agents",
+    summary="agent 执行指标",
+    description="按 agent 类汇总的执行耗时、迭代轮数、LLM 耗时与首 token 耗时、token 消耗、各工具耗时",
+    tags=["Metric"],
+)
+def read_agent_metrics():
+    return metric_registry.to_json(prefix="agent_")
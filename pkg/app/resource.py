@@ -1,12 +1,20 @@
-from typing import Optional, List
+from enum import Enum
+from typing import Any, Dict, Optional, List
 
-from fastapi import Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import Depends, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from pkg.db.db import get_db
+from pkg.db.bulk import DEFAULT_CHUNK_SIZE, bulk_delete, bulk_insert, bulk_update
+from pkg.db.db import get_db, get_db_manager
+from pkg.db.export import DEFAULT_BATCH_SIZE, csv_chunks, ndjson_chunks, stream_rows
+from pkg.db.pagination import KeysetPage, NEXT_CURSOR_HEADER
 
 from pkg.server.http.server import AppServer
+from pkg.util.cache.cache import LRUTTLCache
+from pkg.util.config.config import config_manager
 from pkg.db.model.model import (
     User as UserModel,
     Image as ImageModel,
@@ -34,6 +42,68 @@ def read_root():
     return {"Hello": "World, " + APP_NAME}
 
 
+def create_identity_cache() -> LRUTTLCache:
+    """
+    按 id 读取的缓存, 以 (表名, id) 为键; 更新/删除接口负责失效
+
+    - 缓存在各 worker 进程内, 写入只能失效本进程的条目, 多 worker 时关闭缓存,
+      避免其他 worker 在 ttl 内返回旧数据
+    - 只缓存 user、instance; 其余表带有 ON DELETE CASCADE / SET NULL 外键,
+      父行删除时由数据库改写, 接口无法逐条失效, 因此不缓存
+    """
+    config = config_manager.get_config()
+    maxsize = config.cache.resource_cache_size
+    if config.server.workers > 1:
+        logger.warning(
+            "resource identity cache disabled: {} workers".format(config.server.workers)
+        )
+        maxsize = 0
+    return LRUTTLCache(maxsize=maxsize, ttl=config.cache.resource_cache_ttl)
+
+
+identity_cache = create_identity_cache()
+
+
+def cache_key(model, pk):
+    return model.__tablename__, pk
+
+
+@resource_app.exception_handler(IntegrityError)
+def integrity_error_handler(request, exc: IntegrityError):
+    # 外键引用不存在、唯一键冲突等
+    return JSONResponse(status_code=409, content={"detail": str(exc.orig)})
+
+
+@resource_app.get("/cache/stats")
+def read_cache_stats():
+    return identity_cache.stats()
+
+
+CURSOR_QUERY = Query(None, description="上一页响应头 X-Next-Cursor 返回的游标")
+ORDER_BY_QUERY = Query(None, description="排序列, 仅支持主键或索引列, '-' 前缀表示降序")
+
+
+def keyset_page(model, limit, cursor, order_by) -> KeysetPage:
+    try:
+        return KeysetPage(model, limit, cursor=cursor, order_by=order_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def paginate(
+    db: Session, response: Response, model, skip, limit, cursor, order_by, where=None
+):
+    """
+    游标分页, 下一页游标写入响应头; 不带游标时 skip 仍按 offset 生效, 兼容旧客户端
+    """
+    page = keyset_page(model, limit, cursor, order_by)
+    stmt = page.statement(skip, where=where)
+    rows, next_cursor = page.page(db.execute(stmt).scalars().all())
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows
+
+
 class User(BaseModel):
     id: Optional[int] = None
     name: str
@@ -53,17 +123,23 @@ def create_user(user: User, db: Session = Depends(get_db)):
 
 @resource_app.get("/users/{user_id}", response_model=User)
 def read_user(user_id: int, db: Session = Depends(get_db)):
+    key = cache_key(UserModel, user_id)
+    user = identity_cache.get(key)
+    if user is not None:
+        return user
+
     db_user = db.query(UserModel).filter(UserModel.id == user_id).first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-
-    return User(
+    user = User(
         id=db_user.id,
         name=db_user.name,
         phone=db_user.phone,
         password=db_user.password,
         description=db_user.description,
     )
+    identity_cache.set(key, user)
+    return user
 
 
 @resource_app.put("/users/{user_id}", response_model=User)
@@ -79,6 +155,7 @@ def update_user(user_id: int, updated_user: User, db: Session = Depends(get_db))
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    identity_cache.delete(cache_key(UserModel, user_id))
     return User(
         id=db_user.id,
         name=db_user.name,
@@ -96,27 +173,39 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
 
     db.delete(db_user)
     db.commit()
+    identity_cache.delete(cache_key(UserModel, user_id))
     return {"detail": "User deleted"}
 
 
 @resource_app.get("/users/")
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = db.query(UserModel).offset(skip).limit(limit).all()
+def read_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: Session = Depends(get_db),
+):
+    users = paginate(db, response, UserModel, skip, limit, cursor, order_by)
     logger.info("users: {}".format(users))
     return users
 
 
+# 创建者改为外键(ON DELETE SET NULL)后可为空, 旧版本中为必填
+CREATE_USER_ID_DESCRIPTION = "创建者 id, 可为空; 创建者被删除后置为 null"
+
+
 class ImageSchema(BaseModel):
     id: Optional[int] = None
     name: str
     title_type: str
     title: str
-    create_user_id: int
+    create_user_id: Optional[int] = Field(None, description=CREATE_USER_ID_DESCRIPTION)
     path: str
     description: Optional[str] = None
 
     class Config:
-        orm_mode = True  # 这将允许 Pydantic 模型从 ORM 模型实例中读取数据
+        from_attributes = True  # 这将允许 Pydantic 模型从 ORM 模型实例中读取数据
 
 
 @resource_app.post("/images/", response_model=ImageSchema)
@@ -166,8 +255,15 @@ def delete_image(image_id: int, db: Session = Depends(get_db)):
 
 
 @resource_app.get("/images/", response_model=List[ImageSchema])
-def read_images(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    images = db.query(ImageModel).offset(skip).limit(limit).all()
+def read_images(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: Session = Depends(get_db),
+):
+    images = paginate(db, response, ImageModel, skip, limit, cursor, order_by)
     return [ImageSchema.from_orm(image) for image in images]
 
 
@@ -177,7 +273,7 @@ class InstanceSchema(BaseModel):
     description: Optional[str] = None
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 
 class InstanceAttrSchema(BaseModel):
@@ -188,7 +284,7 @@ class InstanceAttrSchema(BaseModel):
     instance_id: int
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 
 @resource_app.post("/instance_attrs/", response_model=InstanceAttrSchema)
@@ -244,8 +340,15 @@ def delete_instance_attr(attr_id: int, db: Session = Depends(get_db)):
 
 
 @resource_app.get("/instance_attrs/", response_model=List[InstanceAttrSchema])
-def read_instance_attrs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    attrs = db.query(InstanceAttrModel).offset(skip).limit(limit).all()
+def read_instance_attrs(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: Session = Depends(get_db),
+):
+    attrs = paginate(db, response, InstanceAttrModel, skip, limit, cursor, order_by)
     return [InstanceAttrSchema.from_orm(attr) for attr in attrs]
 
 
@@ -260,12 +363,19 @@ def create_instance(instance: InstanceSchema, db: Session = Depends(get_db)):
 
 @resource_app.get("/instances/{instance_id}", response_model=InstanceSchema)
 def read_instance(instance_id: int, db: Session = Depends(get_db)):
+    key = cache_key(InstanceModel, instance_id)
+    instance = identity_cache.get(key)
+    if instance is not None:
+        return instance
+
     db_instance = (
         db.query(InstanceModel).filter(InstanceModel.id == instance_id).first()
     )
     if db_instance is None:
         raise HTTPException(status_code=404, detail="Instance not found")
-    return InstanceSchema.from_orm(db_instance)
+    instance = InstanceSchema.from_orm(db_instance)
+    identity_cache.set(key, instance)
+    return instance
 
 
 @resource_app.put("/instances/{instance_id}", response_model=InstanceSchema)
@@ -285,6 +395,7 @@ def update_instance(
     db.add(db_instance)
     db.commit()
     db.refresh(db_instance)
+    identity_cache.delete(cache_key(InstanceModel, instance_id))
     return InstanceSchema.from_orm(db_instance)
 
 
@@ -298,12 +409,20 @@ def delete_instance(instance_id: int, db: Session = Depends(get_db)):
 
     db.delete(db_instance)
     db.commit()
+    identity_cache.delete(cache_key(InstanceModel, instance_id))
     return {"detail": "Instance deleted"}
 
 
 @resource_app.get("/instances/", response_model=List[InstanceSchema])
-def read_instances(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    instances = db.query(InstanceModel).offset(skip).limit(limit).all()
+def read_instances(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: Session = Depends(get_db),
+):
+    instances = paginate(db, response, InstanceModel, skip, limit, cursor, order_by)
     return [InstanceSchema.from_orm(instance) for instance in instances]
 
 
@@ -312,10 +431,10 @@ class QuoteSchema(BaseModel):
     name: str
     location: Optional[str] = None
     content: Optional[str] = None
-    create_user_id: int
+    create_user_id: Optional[int] = Field(None, description=CREATE_USER_ID_DESCRIPTION)
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 
 class QuoteFileSchema(BaseModel):
@@ -329,7 +448,7 @@ class QuoteFileSchema(BaseModel):
     description: Optional[str] = None
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 
 @resource_app.post("/quotes/", response_model=QuoteSchema)
@@ -379,8 +498,15 @@ def delete_quote(quote_id: int, db: Session = Depends(get_db)):
 
 
 @resource_app.get("/quotes/", response_model=List[QuoteSchema])
-def read_quotes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    quotes = db.query(QuoteModel).offset(skip).limit(limit).all()
+def read_quotes(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: Session = Depends(get_db),
+):
+    quotes = paginate(db, response, QuoteModel, skip, limit, cursor, order_by)
     return [QuoteSchema.from_orm(quote) for quote in quotes]
 
 
@@ -431,6 +557,229 @@ def delete_quote_file(file_id: int, db: Session = Depends(get_db)):
 
 
 @resource_app.get("/quote_files/", response_model=List[QuoteFileSchema])
-def read_quote_files(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    files = db.query(QuoteFileModel).offset(skip).limit(limit).all()
+def read_quote_files(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: Session = Depends(get_db),
+):
+    files = paginate(db, response, QuoteFileModel, skip, limit, cursor, order_by)
     return [QuoteFileSchema.from_orm(file) for file in files]
+
+
+def get_parent_or_404(db: Session, model, pk: int, detail: str):
+    if db.get(model, pk) is None:
+        raise HTTPException(status_code=404, detail=detail)
+
+
+@resource_app.get(
+    "/instances/{instance_id}/attrs", response_model=List[InstanceAttrSchema]
+)
+def read_instance_attrs_of_instance(
+    instance_id: int,
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: Session = Depends(get_db),
+):
+    get_parent_or_404(db, InstanceModel, instance_id, "Instance not found")
+    where = InstanceAttrModel.instance_id == instance_id
+    attrs = paginate(db, response, InstanceAttrModel, 0, limit, cursor, order_by, where)
+    return [InstanceAttrSchema.from_orm(attr) for attr in attrs]
+
+
+@resource_app.get("/users/{user_id}/images", response_model=List[ImageSchema])
+def read_images_of_user(
+    user_id: int,
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: Session = Depends(get_db),
+):
+    get_parent_or_404(db, UserModel, user_id, "User not found")
+    where = ImageModel.create_user_id == user_id
+    images = paginate(db, response, ImageModel, 0, limit, cursor, order_by, where)
+    return [ImageSchema.from_orm(image) for image in images]
+
+
+@resource_app.get("/users/{user_id}/quotes", response_model=List[QuoteSchema])
+def read_quotes_of_user(
+    user_id: int,
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: Session = Depends(get_db),
+):
+    get_parent_or_404(db, UserModel, user_id, "User not found")
+    where = QuoteModel.create_user_id == user_id
+    quotes = paginate(db, response, QuoteModel, 0, limit, cursor, order_by, where)
+    return [QuoteSchema.from_orm(quote) for quote in quotes]
+
+
+@resource_app.get("/quotes/{quote_id}/files", response_model=List[QuoteFileSchema])
+def read_files_of_quote(
+    quote_id: int,
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: Session = Depends(get_db),
+):
+    get_parent_or_404(db, QuoteModel, quote_id, "Quote not found")
+    where = QuoteFileModel.quote_id == quote_id
+    files = paginate(db, response, QuoteFileModel, 0, limit, cursor, order_by, where)
+    return [QuoteFileSchema.from_orm(file) for file in files]
+
+
+class BulkDeleteBody(BaseModel):
+    ids: List[int]
+
+
+class BulkItemError(BaseModel):
+    index: int
+    detail: str
+
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    errors: List[BulkItemError]
+
+
+CHUNK_SIZE_QUERY = Query(
+    DEFAULT_CHUNK_SIZE, ge=1, le=5000, description="每次提交的行数"
+)
+
+
+def validate_items(schema, items: List[Dict[str, Any]], require_id: bool):
+    """
+    逐条校验, 校验失败的条目记录错误而不是拒绝整个请求
+    """
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            obj = schema.model_validate(item)
+        except ValidationError as err:
+            detail = "; ".join(
+                "{}: {}".format(".".join(map(str, e["loc"])), e["msg"])
+                for e in err.errors()
+            )
+            errors.append((index, detail))
+            continue
+        if require_id and obj.id is None:
+            errors.append((index, "id is required"))
+            continue
+        row = obj.dict(exclude_unset=require_id)
+        if row.get("id") is None:
+            row.pop("id", None)
+        rows.append((index, row))
+    return rows, errors
+
+
+def bulk_result(total: int, errors) -> BulkResult:
+    errors = sorted(errors)
+    return BulkResult(
+        succeeded=total - len(errors),
+        failed=len(errors),
+        errors=[BulkItemError(index=index, detail=detail) for index, detail in errors],
+    )
+
+
+def add_bulk_routes(path: str, model, schema):
+    """
+    为资源注册批量增删改接口: POST/PUT/DELETE /batch/{path}/
+    """
+
+    @resource_app.post(f"/batch/{path}/", response_model=BulkResult)
+    def bulk_create(
+        items: List[Dict[str, Any]],
+        chunk_size: int = CHUNK_SIZE_QUERY,
+        db: Session = Depends(get_db),
+    ):
+        rows, errors = validate_items(schema, items, require_id=False)
+        errors += bulk_insert(db, model, rows, chunk_size)
+        return bulk_result(len(items), errors)
+
+    @resource_app.put(f"/batch/{path}/", response_model=BulkResult)
+    def bulk_modify(
+        items: List[Dict[str, Any]],
+        chunk_size: int = CHUNK_SIZE_QUERY,
+        db: Session = Depends(get_db),
+    ):
+        rows, errors = validate_items(schema, items, require_id=True)
+        errors += bulk_update(db, model, rows, chunk_size)
+        for _, row in rows:
+            identity_cache.delete(cache_key(model, row["id"]))
+        return bulk_result(len(items), errors)
+
+    @resource_app.delete(f"/batch/{path}/", response_model=BulkResult)
+    def bulk_remove(
+        body: BulkDeleteBody,
+        chunk_size: int = CHUNK_SIZE_QUERY,
+        db: Session = Depends(get_db),
+    ):
+        errors = bulk_delete(db, model, body.ids, chunk_size)
+        for _id in body.ids:
+            identity_cache.delete(cache_key(model, _id))
+        return bulk_result(len(body.ids), errors)
+
+
+add_bulk_routes("users", UserModel, User)
+add_bulk_routes("images", ImageModel, ImageSchema)
+add_bulk_routes("instances", InstanceModel, InstanceSchema)
+add_bulk_routes("instance_attrs", InstanceAttrModel, InstanceAttrSchema)
+add_bulk_routes("quotes", QuoteModel, QuoteSchema)
+add_bulk_routes("quote_files", QuoteFileModel, QuoteFileSchema)
+
+
+class ExportFormatEnum(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+EXPORT_MODELS = {
+    "users": UserModel,
+    "images": ImageModel,
+    "instances": InstanceModel,
+    "instance_attrs": InstanceAttrModel,
+    "quotes": QuoteModel,
+    "quote_files": QuoteFileModel,
+}
+
+
+@resource_app.get("/export/{table}")
+def export_table(
+    table: str,
+    format: ExportFormatEnum = ExportFormatEnum.NDJSON,
+    batch_size: int = Query(
+        DEFAULT_BATCH_SIZE, ge=1, le=10000, description="每批读取行数"
+    ),
+):
+    """
+    一次请求流式导出整表, 服务端游标逐批读取, 内存占用与表大小无关
+    """
+    model = EXPORT_MODELS.get(table)
+    if model is None:
+        raise HTTPException(status_code=404, detail="Table not found")
+
+    batches = stream_rows(get_db_manager(), model, batch_size)
+    if format == ExportFormatEnum.CSV:
+        content = csv_chunks(
+            batches, [column.key for column in model.__table__.columns]
+        )
+        media_type = "text/csv"
+    else:
+        content = ndjson_chunks(batches)
+        media_type = "application/x-ndjson"
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{table}.{format.value}"'
+        },
+    )
@@ -0,0 +1,541 @@
+from typing import List, Optional
+
+from fastapi import Depends, HTTPException, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pkg.app.resource import (
+    CURSOR_QUERY,
+    ORDER_BY_QUERY,
+    cache_key,
+    identity_cache,
+    integrity_error_handler,
+    keyset_page,
+    User,
+    ImageSchema,
+    InstanceSchema,
+    InstanceAttrSchema,
+    QuoteSchema,
+    QuoteFileSchema,
+)
+from pkg.db.db import get_async_db
+from pkg.db.pagination import NEXT_CURSOR_HEADER
+from pkg.db.model.model import (
+    User as UserModel,
+    Image as ImageModel,
+    InstanceAttr as InstanceAttrModel,
+    Instance as InstanceModel,
+    Quote as QuoteModel,
+    QuoteFile as QuoteFileModel,
+)
+from pkg.server.http.server import AppServer
+
+APP_NAME = "resource_async"
+
+
+class ResourceAsyncAppServer(AppServer):
+    """
+    resource app 的异步版本, 路由与 resource app 一致,
+    数据库 I/O 走 AsyncSession, 不占用 starlette 线程池
+    """
+
+    def __init__(self):
+        super().__init__("/" + APP_NAME)
+
+
+resource_async_app_server = ResourceAsyncAppServer()
+resource_async_app = resource_async_app_server.get_app()
+resource_async_app.add_exception_handler(IntegrityError, integrity_error_handler)
+
+
+@resource_async_app.get("/")
+async def read_root():
+    return {"Hello": "World, " + APP_NAME}
+
+
+async def paginate(
+    db: AsyncSession,
+    response: Response,
+    model,
+    skip,
+    limit,
+    cursor,
+    order_by,
+    where=None,
+):
+    page = keyset_page(model, limit, cursor, order_by)
+    result = await db.execute(page.statement(skip, where=where))
+    rows, next_cursor = page.page(result.scalars().all())
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows
+
+
+@resource_async_app.post("/users/", response_model=User)
+async def create_user(user: User, db: AsyncSession = Depends(get_async_db)):
+    db_user = UserModel(**user.dict())
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return user
+
+
+@resource_async_app.get("/users/{user_id}", response_model=User)
+async def read_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    key = cache_key(UserModel, user_id)
+    user = identity_cache.get(key)
+    if user is not None:
+        return user
+
+    db_user = await db.get(UserModel, user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    user = User(
+        id=db_user.id,
+        name=db_user.name,
+        phone=db_user.phone,
+        password=db_user.password,
+        description=db_user.description,
+    )
+    identity_cache.set(key, user)
+    return user
+
+
+@resource_async_app.put("/users/{user_id}", response_model=User)
+async def update_user(
+    user_id: int, updated_user: User, db: AsyncSession = Depends(get_async_db)
+):
+    db_user = await db.get(UserModel, user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user_data = updated_user.dict(exclude_unset=True)
+    for key, value in user_data.items():
+        setattr(db_user, key, value)
+
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    identity_cache.delete(cache_key(UserModel, user_id))
+    return User(
+        id=db_user.id,
+        name=db_user.name,
+        phone=db_user.phone,
+        password=db_user.password,
+        description=db_user.description,
+    )
+
+
+@resource_async_app.delete("/users/{user_id}")
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.get(UserModel, user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    await db.delete(db_user)
+    await db.commit()
+    identity_cache.delete(cache_key(UserModel, user_id))
+    return {"detail": "User deleted"}
+
+
+@resource_async_app.get("/users/")
+async def read_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await paginate(db, response, UserModel, skip, limit, cursor, order_by)
+
+
+@resource_async_app.post("/images/", response_model=ImageSchema)
+async def create_image(image: ImageSchema, db: AsyncSession = Depends(get_async_db)):
+    db_image = ImageModel(**image.dict())
+    db.add(db_image)
+    await db.commit()
+    await db.refresh(db_image)
+    return ImageSchema.from_orm(db_image)
+
+
+@resource_async_app.get("/images/{image_id}", response_model=ImageSchema)
+async def read_image(image_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_image = await db.get(ImageModel, image_id)
+    if db_image is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return ImageSchema.from_orm(db_image)
+
+
+@resource_async_app.put("/images/{image_id}", response_model=ImageSchema)
+async def update_image(
+    image_id: int, updated_image: ImageSchema, db: AsyncSession = Depends(get_async_db)
+):
+    db_image = await db.get(ImageModel, image_id)
+    if db_image is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    image_data = updated_image.dict(exclude_unset=True)
+    for key, value in image_data.items():
+        setattr(db_image, key, value)
+
+    db.add(db_image)
+    await db.commit()
+    await db.refresh(db_image)
+    return ImageSchema.from_orm(db_image)
+
+
+@resource_async_app.delete("/images/{image_id}")
+async def delete_image(image_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_image = await db.get(ImageModel, image_id)
+    if db_image is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    await db.delete(db_image)
+    await db.commit()
+    return {"detail": "Image deleted"}
+
+
+@resource_async_app.get("/images/", response_model=List[ImageSchema])
+async def read_images(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+):
+    rows = await paginate(db, response, ImageModel, skip, limit, cursor, order_by)
+    return [ImageSchema.from_orm(image) for image in rows]
+
+
+@resource_async_app.post("/instance_attrs/", response_model=InstanceAttrSchema)
+async def create_instance_attr(
+    attr: InstanceAttrSchema, db: AsyncSession = Depends(get_async_db)
+):
+    db_attr = InstanceAttrModel(**attr.dict())
+    db.add(db_attr)
+    await db.commit()
+    await db.refresh(db_attr)
+    return InstanceAttrSchema.from_orm(db_attr)
+
+
+@resource_async_app.get("/instance_attrs/{attr_id}", response_model=InstanceAttrSchema)
+async def read_instance_attr(attr_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_attr = await db.get(InstanceAttrModel, attr_id)
+    if db_attr is None:
+        raise HTTPException(status_code=404, detail="Instance attribute not found")
+    return InstanceAttrSchema.from_orm(db_attr)
+
+
+@resource_async_app.put("/instance_attrs/{attr_id}", response_model=InstanceAttrSchema)
+async def update_instance_attr(
+    attr_id: int,
+    updated_attr: InstanceAttrSchema,
+    db: AsyncSession = Depends(get_async_db),
+):
+    db_attr = await db.get(InstanceAttrModel, attr_id)
+    if db_attr is None:
+        raise HTTPException(status_code=404, detail="Instance attribute not found")
+
+    attr_data = updated_attr.dict(exclude_unset=True)
+    for key, value in attr_data.items():
+        setattr(db_attr, key, value)
+
+    db.add(db_attr)
+    await db.commit()
+    await db.refresh(db_attr)
+    return InstanceAttrSchema.from_orm(db_attr)
+
+
+@resource_async_app.delete("/instance_attrs/{attr_id}")
+async def delete_instance_attr(attr_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_attr = await db.get(InstanceAttrModel, attr_id)
+    if db_attr is None:
+        raise HTTPException(status_code=404, detail="Instance attribute not found")
+
+    await db.delete(db_attr)
+    await db.commit()
+    return {"detail": "Instance attribute deleted"}
+
+
+@resource_async_app.get("/instance_attrs/", response_model=List[InstanceAttrSchema])
+async def read_instance_attrs(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+):
+    rows = await paginate(
+        db, response, InstanceAttrModel, skip, limit, cursor, order_by
+    )
+    return [InstanceAttrSchema.from_orm(attr) for attr in rows]
+
+
+@resource_async_app.post("/instances/", response_model=InstanceSchema)
+async def create_instance(
+    instance: InstanceSchema, db: AsyncSession = Depends(get_async_db)
+):
+    db_instance = InstanceModel(**instance.dict())
+    db.add(db_instance)
+    await db.commit()
+    await db.refresh(db_instance)
+    return InstanceSchema.from_orm(db_instance)
+
+
+@resource_async_app.get("/instances/{instance_id}", response_model=InstanceSchema)
+async def read_instance(instance_id: int, db: AsyncSession = Depends(get_async_db)):
+    key = cache_key(InstanceModel, instance_id)
+    instance = identity_cache.get(key)
+    if instance is not None:
+        return instance
+
+    db_instance = await db.get(InstanceModel, instance_id)
+    if db_instance is None:
+        raise HTTPException(status_code=404, detail="Instance not found")
+    instance = InstanceSchema.from_orm(db_instance)
+    identity_cache.set(key, instance)
+    return instance
+
+
+@resource_async_app.put("/instances/{instance_id}", response_model=InstanceSchema)
+async def update_instance(
+    instance_id: int,
+    updated_instance: InstanceSchema,
+    db: AsyncSession = Depends(get_async_db),
+):
+    db_instance = await db.get(InstanceModel, instance_id)
+    if db_instance is None:
+        raise HTTPException(status_code=404, detail="Instance not found")
+
+    instance_data = updated_instance.dict(exclude_unset=True)
+    for key, value in instance_data.items():
+        setattr(db_instance, key, value)
+
+    db.add(db_instance)
+    await db.commit()
+    await db.refresh(db_instance)
+    identity_cache.delete(cache_key(InstanceModel, instance_id))
+    return InstanceSchema.from_orm(db_instance)
+
+
+@resource_async_app.delete("/instances/{instance_id}")
+async def delete_instance(instance_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_instance = await db.get(InstanceModel, instance_id)
+    if db_instance is None:
+        raise HTTPException(status_code=404, detail="Instance not found")
+
+    await db.delete(db_instance)
+    await db.commit()
+    identity_cache.delete(cache_key(InstanceModel, instance_id))
+    return {"detail": "Instance deleted"}
+
+
+@resource_async_app.get("/instances/", response_model=List[InstanceSchema])
+async def read_instances(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+):
+    rows = await paginate(db, response, InstanceModel, skip, limit, cursor, order_by)
+    return [InstanceSchema.from_orm(instance) for instance in rows]
+
+
+@resource_async_app.post("/quotes/", response_model=QuoteSchema)
+async def create_quote(quote: QuoteSchema, db: AsyncSession = Depends(get_async_db)):
+    db_quote = QuoteModel(**quote.dict())
+    db.add(db_quote)
+    await db.commit()
+    await db.refresh(db_quote)
+    return QuoteSchema.from_orm(db_quote)
+
+
+@resource_async_app.get("/quotes/{quote_id}", response_model=QuoteSchema)
+async def read_quote(quote_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_quote = await db.get(QuoteModel, quote_id)
+    if db_quote is None:
+        raise HTTPException(status_code=404, detail="Quote not found")
+    return QuoteSchema.from_orm(db_quote)
+
+
+@resource_async_app.put("/quotes/{quote_id}", response_model=QuoteSchema)
+async def update_quote(
+    quote_id: int, updated_quote: QuoteSchema, db: AsyncSession = Depends(get_async_db)
+):
+    db_quote = await db.get(QuoteModel, quote_id)
+    if db_quote is None:
+        raise HTTPException(status_code=404, detail="Quote not found")
+
+    quote_data = updated_quote.dict(exclude_unset=True)
+    for key, value in quote_data.items():
+        setattr(db_quote, key, value)
+
+    db.add(db_quote)
+    await db.commit()
+    await db.refresh(db_quote)
+    return QuoteSchema.from_orm(db_quote)
+
+
+@resource_async_app.delete("/quotes/{quote_id}")
+async def delete_quote(quote_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_quote = await db.get(QuoteModel, quote_id)
+    if db_quote is None:
+        raise HTTPException(status_code=404, detail="Quote not found")
+
+    await db.delete(db_quote)
+    await db.commit()
+    return {"detail": "Quote deleted"}
+
+
+@resource_async_app.get("/quotes/", response_model=List[QuoteSchema])
+async def read_quotes(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+):
+    rows = await paginate(db, response, QuoteModel, skip, limit, cursor, order_by)
+    return [QuoteSchema.from_orm(quote) for quote in rows]
+
+
+@resource_async_app.post("/quote_files/", response_model=QuoteFileSchema)
+async def create_quote_file(
+    file: QuoteFileSchema, db: AsyncSession = Depends(get_async_db)
+):
+    db_file = QuoteFileModel(**file.dict())
+    db.add(db_file)
+    await db.commit()
+    await db.refresh(db_file)
+    return QuoteFileSchema.from_orm(db_file)
+
+
+@resource_async_app.get("/quote_files/{file_id}", response_model=QuoteFileSchema)
+async def read_quote_file(file_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_file = await db.get(QuoteFileModel, file_id)
+    if db_file is None:
+        raise HTTPException(status_code=404, detail="Quote file not found")
+    return QuoteFileSchema.from_orm(db_file)
+
+
+@resource_async_app.put("/quote_files/{file_id}", response_model=QuoteFileSchema)
+async def update_quote_file(
+    file_id: int,
+    updated_file: QuoteFileSchema,
+    db: AsyncSession = Depends(get_async_db),
+):
+    db_file = await db.get(QuoteFileModel, file_id)
+    if db_file is None:
+        raise HTTPException(status_code=404, detail="Quote file not found")
+
+    file_data = updated_file.dict(exclude_unset=True)
+    for key, value in file_data.items():
+        setattr(db_file, key, value)
+
+    db.add(db_file)
+    await db.commit()
+    await db.refresh(db_file)
+    return QuoteFileSchema.from_orm(db_file)
+
+
+@resource_async_app.delete("/quote_files/{file_id}")
+async def delete_quote_file(file_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_file = await db.get(QuoteFileModel, file_id)
+    if db_file is None:
+        raise HTTPException(status_code=404, detail="Quote file not found")
+
+    await db.delete(db_file)
+    await db.commit()
+    return {"detail": "Quote file deleted"}
+
+
+@resource_async_app.get("/quote_files/", response_model=List[QuoteFileSchema])
+async def read_quote_files(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+):
+    rows = await paginate(db, response, QuoteFileModel, skip, limit, cursor, order_by)
+    return [QuoteFileSchema.from_orm(file) for file in rows]
+
+
+async def get_parent_or_404(db: AsyncSession, model, pk: int, detail: str):
+    if await db.get(model, pk) is None:
+        raise HTTPException(status_code=404, detail=detail)
+
+
+@resource_async_app.get(
+    "/instances/{instance_id}/attrs", response_model=List[InstanceAttrSchema]
+)
+async def read_instance_attrs_of_instance(
+    instance_id: int,
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await get_parent_or_404(db, InstanceModel, instance_id, "Instance not found")
+    where = InstanceAttrModel.instance_id == instance_id
+    attrs = await paginate(
+        db, response, InstanceAttrModel, 0, limit, cursor, order_by, where
+    )
+    return [InstanceAttrSchema.from_orm(attr) for attr in attrs]
+
+
+@resource_async_app.get("/users/{user_id}/images", response_model=List[ImageSchema])
+async def read_images_of_user(
+    user_id: int,
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await get_parent_or_404(db, UserModel, user_id, "User not found")
+    where = ImageModel.create_user_id == user_id
+    images = await paginate(db, response, ImageModel, 0, limit, cursor, order_by, where)
+    return [ImageSchema.from_orm(image) for image in images]
+
+
+@resource_async_app.get("/users/{user_id}/quotes", response_model=List[QuoteSchema])
+async def read_quotes_of_user(
+    user_id: int,
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await get_parent_or_404(db, UserModel, user_id, "User not found")
+    where = QuoteModel.create_user_id == user_id
+    quotes = await paginate(db, response, QuoteModel, 0, limit, cursor, order_by, where)
+    return [QuoteSchema.from_orm(quote) for quote in quotes]
+
+
+@resource_async_app.get(
+    "/quotes/{quote_id}/files", response_model=List[QuoteFileSchema]
+)
+async def read_files_of_quote(
+    quote_id: int,
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = CURSOR_QUERY,
+    order_by: Optional[str] = ORDER_BY_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await get_parent_or_404(db, QuoteModel, quote_id, "Quote not found")
+    where = QuoteFileModel.quote_id == quote_id
+    files = await paginate(
+        db, response, QuoteFileModel, 0, limit, cursor, order_by, where
+    )
+    return [QuoteFileSchema.from_orm(file) for file in files]
@@ -0,0 +1,285 @@
+import asyncio
+import json
+from typing import List
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+
+from pkg.app import ai_agent
+from pkg.app.ai_agent import (
+    PRETTY_PRINT_REQUESTS_TOTAL,
+    PrettyPrintPythonObjectBatchBody,
+    agent_event_stream,
+    agent_event_to_sse,
+    ai_agent_app,
+    batch_result_stream,
+)
+from pkg.client.llm import artifact as artifact_module
+from pkg.client.llm.artifact import ArtifactStore
+from pkg.client.llm.fake import ScriptedChatModel
+from pkg.client.llm.llm import LiscoAgent
+from pkg.client.llm.pool import AgentPool, agent_pool_manager
+from pkg.client.llm.sandbox import sandbox
+from pkg.util.config.config import config_manager
+from pkg.util.metric.metric import metric_registry
+
+
+TOOL_OBJ = json.dumps(list(range(300)))
+TOOL_CALL = {
+    "name": "pretty_print_python_object",
+    "args": {"obj": TOOL_OBJ, "input_format": "json_text", "output_format": "json"},
+    "id": "call_1",
+}
+
+
+class QueryChatModel(ScriptedChatModel):
+    """
+    按请求内容回复: 含 boom 时失败, 含 slow 时延迟返回, 含 tool 时先调用格式化工具
+    """
+
+    responses: List[AIMessage] = []
+
+    @staticmethod
+    def _query(messages) -> str:
+        return [m for m in messages if m.type == "human"][-1].content
+
+    def _response(self, messages) -> AIMessage:
+        query = self._query(messages)
+        if "boom" in query:
+            raise ValueError("boom")
+        if "tool" in query:
+            if any(isinstance(m, AIMessage) and m.tool_calls for m in messages):
+                return AIMessage(content="结果已直接返回")
+            return AIMessage(content="", tool_calls=[TOOL_CALL])
+        return AIMessage(content="llm " + query.split()[-1])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if "slow" in self._query(messages):
+            await asyncio.sleep(0.1)
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if "slow" in self._query(messages):
+            await asyncio.sleep(0.1)
+        async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            yield chunk
+
+
+class ScriptedLiscoAgent(LiscoAgent):
+    concurrency = []
+
+    def __init__(self):
+        super().__init__(llm=QueryChatModel())
+
+    async def abatch_as_completed(self, queries, max_concurrency: int):
+        ScriptedLiscoAgent.concurrency.append(max_concurrency)
+        async for item in super().abatch_as_completed(queries, max_concurrency):
+            yield item
+
+
+@pytest.fixture
+def scripted_pool(monkeypatch):
+    ScriptedLiscoAgent.concurrency = []
+    pool = AgentPool(ScriptedLiscoAgent, size=1, timeout=1)
+    monkeypatch.setitem(agent_pool_manager.pools, LiscoAgent, pool)
+    monkeypatch.setattr(config_manager.get_config().llm, "batch_max_concurrency", 4)
+    return pool
+
+
+async def run_batch(**kwargs) -> List[dict]:
+    body = PrettyPrintPythonObjectBatchBody(**kwargs)
+    text = "".join([part async for part in batch_result_stream(body)])
+    return [json.loads(line) for line in text.splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_batch_local_and_agent_items(scripted_pool):
+    lines = await run_batch(
+        queries=["[1]", "please slow a", "please fast b", "please boom c", "{'k': 2}"]
+    )
+    # 本地条目先按顺序返回, agent 条目按完成先后返回, index 对应请求中的下标
+    assert lines[:2] == [
+        {"index": 0, "path": "local", "output": "[\n    1\n]"},
+        {"index": 4, "path": "local", "output": '{\n    "k": 2\n}'},
+    ]
+    assert lines[-1] == {"index": 1, "path": "llm", "output": "llm a"}
+    assert sorted(lines[2:4], key=lambda line: line["index"]) == [
+        {"index": 2, "path": "llm", "output": "llm b"},
+        {"index": 3, "path": "llm", "error": "boom"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_sandbox_error_per_item(scripted_pool, monkeypatch):
+    monkeypatch.setattr(sandbox, "max_input_chars", 20)
+    lines = await run_batch(queries=["[" + "1, " * 20 + "1]", "[2]"])
+    assert lines[0]["index"] == 0 and "input too large" in lines[0]["error"]
+    assert lines[1] == {"index": 1, "path": "local", "output": "[\n    2\n]"}
+    assert ScriptedLiscoAgent.concurrency == []
+
+
+@pytest.mark.asyncio
+async def test_batch_returns_artifact_per_item(scripted_pool, tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path), threshold=1000)
+    monkeypatch.setattr(artifact_module, "artifact_store", store)
+    monkeypatch.setattr(ai_agent, "artifact_store", store)
+    lines = await run_batch(queries=["please tool a", "please fast b"])
+    lines.sort(key=lambda line: line["index"])
+    # 转存的条目返回完整结果而不是 LLM 拿到的摘要
+    assert lines[0]["output"] == json.dumps(list(range(300)), indent=4)
+    assert store.read(lines[0]["artifact"]) == lines[0]["output"]
+    assert lines[1] == {"index": 1, "path": "llm", "output": "llm b"}
+
+
+@pytest.mark.parametrize("requested, expected", [(None, 4), (2, 2), (100, 4)])
+@pytest.mark.asyncio
+async def test_batch_max_concurrency_clamp(scripted_pool, requested, expected):
+    await run_batch(queries=["please fast a"], max_concurrency=requested)
+    assert ScriptedLiscoAgent.concurrency == [expected]
+
+
+EVENTS = [
+    {"event": "on_chain_start", "name": "AgentExecutor", "data": {}, "parent_ids": []},
+    {
+        "event": "on_chat_model_stream",
+        "name": "model",
+        "data": {"chunk": AIMessageChunk(content="")},
+        "parent_ids": ["1"],
+    },
+    {
+        "event": "on_chat_model_stream",
+        "name": "model",
+        "data": {"chunk": AIMessageChunk(content="好")},
+        "parent_ids": ["1"],
+    },
+    {
+        "event": "on_tool_start",
+        "name": "pretty_print",
+        "data": {"input": {"obj": "[1]"}},
+        "parent_ids": ["1"],
+    },
+    {
+        "event": "on_tool_end",
+        "name": "pretty_print",
+        "data": {"output": ToolMessage(content="处理完成", tool_call_id="call")},
+        "parent_ids": ["1"],
+    },
+    {
+        "event": "on_chain_end",
+        "name": "RunnableSequence",
+        "data": {"output": {"output": "inner"}},
+        "parent_ids": ["1"],
+    },
+    {
+        "event": "on_chain_end",
+        "name": "AgentExecutor",
+        "data": {"output": {"output": "[\n    1\n]"}},
+        "parent_ids": [],
+    },
+]
+
+
+def test_agent_event_to_sse():
+    lines = [agent_event_to_sse(event) for event in EVENTS]
+    assert lines == [
+        None,
+        None,
+        'event: token\ndata: {"content": "好"}\n\n',
+        'event: action\ndata: {"tool": "pretty_print", "input": {"obj": "[1]"}}\n\n',
+        'event: step\ndata: {"tool": "pretty_print", "output": "处理完成"}\n\n',
+        None,
+        'event: output\ndata: {"output": "[\\n    1\\n]"}\n\n',
+    ]
+
+
+class CannedAgent:
+    """
+    按 EVENTS 输出事件, 中途转存一个 artifact, fail 时在事件后抛出异常
+    """
+
+    fail = False
+
+    async def astream_events(self, query):
+        for event in EVENTS[2:5]:
+            yield event
+        artifact_module.offload("x" * 20)
+        if CannedAgent.fail:
+            raise RuntimeError("upstream closed")
+        yield EVENTS[-1]
+
+
+@pytest.fixture
+def canned_stream(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path), threshold=10)
+    monkeypatch.setattr(artifact_module, "artifact_store", store)
+    monkeypatch.setattr(ai_agent, "artifact_store", store)
+    monkeypatch.setitem(
+        agent_pool_manager.pools, CannedAgent, AgentPool(CannedAgent, size=1)
+    )
+    CannedAgent.fail = False
+
+
+async def event_names(stream) -> List[str]:
+    return [sse.split("\n")[0][len("event: ") :] async for sse in stream]
+
+
+@pytest.mark.asyncio
+async def test_agent_event_stream(canned_stream):
+    names = await event_names(agent_event_stream(CannedAgent, {}))
+    assert names == ["start", "token", "action", "step", "output", "artifact"]
+
+
+@pytest.mark.asyncio
+async def test_agent_event_stream_error(canned_stream):
+    CannedAgent.fail = True
+    names = await event_names(agent_event_stream(CannedAgent, {}))
+    assert names == ["start", "token", "action", "step", "error"]
+
+
+def test_stream_pool_exhausted_is_http_error(scripted_pool):
+    scripted_pool.timeout = 0.01
+    with scripted_pool.acquire():
+        response = TestClient(ai_agent_app).post(
+            "/pretty-print-python-object/stream", json={"query": "please a"}
+        )
+    assert response.status_code == 503
+
+
+def requests_total(path: str, result: str) -> float:
+    for counter in metric_registry.to_json()["counters"].get(
+        PRETTY_PRINT_REQUESTS_TOTAL, []
+    ):
+        if counter["labels"] == {"path": path, "result": result}:
+            return counter["value"]
+    return 0
+
+
+def test_served_by_recorded_after_agent_returns(scripted_pool):
+    client = TestClient(ai_agent_app)
+    ok, error = requests_total("llm", "ok"), requests_total("llm", "error")
+
+    response = client.post("/pretty-print-python-object", json={"query": "please a"})
+    assert response.json() == "llm a"
+    assert response.headers["X-Lisco-Path"] == "llm"
+    assert requests_total("llm", "ok") == ok + 1
+
+    with pytest.raises(ValueError):
+        client.post("/pretty-print-python-object", json={"query": "please boom"})
+    assert requests_total("llm", "ok") == ok + 1
+    assert requests_total("llm", "error") == error + 1
+
+
+def test_stream_served_by_recorded_after_agent_returns(scripted_pool):
+    client = TestClient(ai_agent_app)
+    ok, error = requests_total("llm", "ok"), requests_total("llm", "error")
+
+    response = client.post(
+        "/pretty-print-python-object/stream", json={"query": "please boom"}
+    )
+    assert response.headers["X-Lisco-Path"] == "llm"
+    assert "event: error" in response.text
+    assert requests_total("llm", "error") == error + 1
+
+    client.post("/pretty-print-python-object/stream", json={"query": "please a"})
+    assert requests_total("llm", "ok") == ok + 1
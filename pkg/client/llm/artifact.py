@@ -0,0 +1,214 @@
+import itertools
+import os
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Iterable, Iterator, List, Optional, Union
+
+from pydantic import BaseModel, Field
+
+from pkg.util.metric.metric import metric_registry
+
+ARTIFACTS_STORED_TOTAL = "artifacts_stored_total"
+ARTIFACTS_EVICTED_TOTAL = "artifacts_evicted_total"
+
+metric_registry.describe(ARTIFACTS_STORED_TOTAL, "转存到 artifact 存储的工具结果数")
+metric_registry.describe(
+    ARTIFACTS_EVICTED_TOTAL, "artifact 被清理数, reason 为 expired 或 size"
+)
+
+# 读取时每块的字符数
+READ_CHUNK_SIZE = 64 * 1024
+
+_ARTIFACT_ID = re.compile(r"[0-9a-f]{32}")
+
+# 当前请求中工具转存的 artifact, 由 HTTP 层通过 start_collecting 开启
+collected_artifacts: ContextVar[Optional[List["Artifact"]]] = ContextVar(
+    "collected_artifacts", default=None
+)
+
+
+class Artifact(BaseModel):
+    id: str = Field(description="artifact id")
+    size: int = Field(description="字符数")
+    preview: str = Field("", description="开头的一小段内容")
+
+
+class ArtifactStore:
+    """
+    工具结果过大时转存到磁盘, LLM 只拿到摘要与 id, 完整内容由 HTTP 响应直接返回
+
+    每个 artifact 一个文件, 多个 worker 进程共用同一目录;
+    超过 ttl 秒的文件读取时视为不存在, 总大小超过 max_bytes 时从最早的开始删除
+    threshold 为 0 时不转存
+    """
+
+    # 每写入多少次扫描目录清理一次
+    PURGE_EVERY = 50
+    PREVIEW_SIZE = 200
+
+    def __init__(
+        self,
+        path: str = "./artifact_storage",
+        threshold: int = 0,
+        ttl: float = 3600,
+        max_bytes: int = 1024**3,
+    ):
+        self.configure(path, threshold, ttl, max_bytes)
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def configure(self, path: str, threshold: int, ttl: float, max_bytes: int):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    def should_offload(self, text: str) -> bool:
+        return self.threshold > 0 and len(text) >= self.threshold
+
+    def _file(self, artifact_id: str) -> str:
+        return os.path.join(self.path, artifact_id + ".txt")
+
+    def put(self, chunks: Iterable[str]) -> Artifact:
+        """
+        :param chunks: 完整文本或逐块的文本, 先写临时文件再改名, 读取方不会读到半个文件
+        """
+        os.makedirs(self.path, exist_ok=True)
+        artifact_id = uuid.uuid4().hex
+        path = self._file(artifact_id)
+        tmp_path = path + ".tmp"
+        size = 0
+        preview = ""
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for chunk in [chunks] if isinstance(chunks, str) else chunks:
+                    if len(preview) < self.PREVIEW_SIZE:
+                        preview += chunk[: self.PREVIEW_SIZE - len(preview)]
+                    size += len(chunk)
+                    f.write(chunk)
+        except BaseException:
+            # 逐块生成的内容可能中途出错, 不留下临时文件
+            os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+        metric_registry.inc(ARTIFACTS_STORED_TOTAL)
+
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            self.purge()
+        return Artifact(id=artifact_id, size=size, preview=preview)
+
+    def open(self, artifact_id: str) -> Optional[Iterator[str]]:
+        """
+        :return: 逐块读取内容的迭代器, 不存在或已过期时返回 None
+        """
+        if not _ARTIFACT_ID.fullmatch(artifact_id):
+            return None
+        path = self._file(artifact_id)
+        try:
+            f = open(path, encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        if self.ttl > 0 and os.fstat(f.fileno()).st_mtime + self.ttl < time.time():
+            f.close()
+            self._remove(path, "expired")
+            return None
+        return self._read(f)
+
+    @staticmethod
+    def _read(f) -> Iterator[str]:
+        with f:
+            while True:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+    def read(self, artifact_id: str) -> Optional[str]:
+        chunks = self.open(artifact_id)
+        return None if chunks is None else "".join(chunks)
+
+    @staticmethod
+    def _remove(path: str, reason: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        metric_registry.inc(ARTIFACTS_EVICTED_TOTAL, {"reason": reason})
+
+    def purge(self):
+        """
+        删除过期文件, 总大小仍超过 max_bytes 时从最早写入的开始删除
+        """
+        try:
+            entries = [e for e in os.scandir(self.path) if e.name.endswith(".txt")]
+        except FileNotFoundError:
+            return
+        now = time.time()
+        files = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if self.ttl > 0 and stat.st_mtime + self.ttl < now:
+                self._remove(entry.path, "expired")
+            else:
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._remove(path, "size")
+            total -= size
+
+
+artifact_store = ArtifactStore()
+
+
+def start_collecting() -> List[Artifact]:
+    """
+    在当前上下文中开始收集工具转存的 artifact, 返回收集用的列表
+    """
+    artifacts = []
+    collected_artifacts.set(artifacts)
+    return artifacts
+
+
+def _collect(artifact: Artifact) -> Artifact:
+    artifacts = collected_artifacts.get()
+    if artifacts is not None:
+        artifacts.append(artifact)
+    return artifact
+
+
+def offload(text: str) -> Optional[Artifact]:
+    """
+    text 超过阈值时转存并记录到当前请求, 否则返回 None
+    """
+    if not artifact_store.should_offload(text):
+        return None
+    return _collect(artifact_store.put(text))
+
+
+def offload_chunks(chunks: Iterable[str]) -> Union[str, Artifact]:
+    """
+    逐块生成的文本: 累计达到阈值后, 已读的与剩余的块直接写入文件, 不在内存中拼接完整文本;
+    未达到阈值(或不转存)时返回拼接后的文本
+    """
+    if artifact_store.threshold <= 0:
+        return "".join(chunks)
+    chunks = iter(chunks)
+    head = []
+    size = 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= artifact_store.threshold:
+            return _collect(artifact_store.put(itertools.chain(head, chunks)))
+    return "".join(head)
@@ -0,0 +1,230 @@
+"""
+agent 框架开销基准, 使用脚本化的离线模型, 不访问网络
+
+    python -m pkg.client.llm.benchmark --agent LiscoAgent --mode sync,async,stream -n 200
+
+输出各模式的吞吐、单请求 CPU 时间, 以及在 tracemalloc 下单独测得的内存分配情况
+
+只测框架本身的开销: 测量期间 sandbox 在当前进程内执行工具, 不计子进程往返的序列化与 IPC;
+time.process_time 也统计不到子进程的 CPU 时间
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Type
+
+from langchain_core.messages import AIMessage
+
+from pkg.client.llm.fake import ScriptedChatModel
+from pkg.client.llm.llm import BaseAIAgent, LiscoAgent, QwenAgent
+from pkg.client.llm.sandbox import sandbox
+
+MODES = ("sync", "async", "stream")
+
+AGENTS: Dict[str, Type[BaseAIAgent]] = {
+    "LiscoAgent": LiscoAgent,
+    "QwenAgent": QwenAgent,
+}
+
+# 各 agent 默认的回复脚本: 先调用一次工具, 再给出最终答案
+USAGE = {"input_tokens": 200, "output_tokens": 40, "total_tokens": 240}
+SCRIPTS: Dict[str, List[AIMessage]] = {
+    "LiscoAgent": [
+        AIMessage(
+            content="",
+            tool_calls=[
+                {
+                    "name": "pretty_print_python_object",
+                    "args": {
+                        "obj": "{'a': 1, 'b': [1, 2, 3]}",
+                        "input_format": "python_object",
+                        "output_format": "json",
+                    },
+                    "id": "call_1",
+                }
+            ],
+        ),
+        AIMessage(
+            content='{\n    "a": 1,\n    "b": [1, 2, 3]\n}', usage_metadata=USAGE
+        ),
+    ],
+    "QwenAgent": [
+        AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "magic_function", "args": {"input": 3}, "id": "call_1"}
+            ],
+        ),
+        AIMessage(content="magic_function(3) 的结果是 5", usage_metadata=USAGE),
+    ],
+}
+
+QUERY = {"input": "格式化 {'a': 1, 'b': [1, 2, 3]}"}
+
+
+def make_agent(
+    agent_name: str,
+    responses: List[AIMessage] = None,
+    latency: float = 0.0,
+    token_latency: float = 0.0,
+) -> BaseAIAgent:
+    llm = ScriptedChatModel(
+        responses=responses or SCRIPTS[agent_name],
+        latency=latency,
+        token_latency=token_latency,
+    )
+    return AGENTS[agent_name](llm=llm)
+
+
+async def _drain_events(agent, query: dict):
+    async for _ in agent.astream_events(query):
+        pass
+
+
+async def _run_async(agent, mode: str, query: dict, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one():
+        async with semaphore:
+            if mode == "async":
+                await agent.ainvoke(query)
+            else:
+                await _drain_events(agent, query)
+
+    await asyncio.gather(*(run_one() for _ in range(requests)))
+
+
+def _runner(agent, mode: str, query: dict, concurrency: int) -> Callable[[int], None]:
+    if mode == "sync":
+
+        def run(requests: int):
+            for _ in range(requests):
+                agent.invoke(query)
+
+    else:
+
+        def run(requests: int):
+            asyncio.run(_run_async(agent, mode, query, requests, concurrency))
+
+    return run
+
+
+@contextlib.contextmanager
+def _inline_sandbox():
+    """
+    临时让 sandbox 在当前进程内执行, 结束后恢复原配置(子进程按需重新启动)
+    """
+    settings = (
+        sandbox.workers,
+        sandbox.timeout,
+        sandbox.cpu_seconds,
+        sandbox.memory_bytes,
+        sandbox.max_input_chars,
+    )
+    sandbox.configure(0, *settings[1:])
+    try:
+        yield
+    finally:
+        sandbox.configure(*settings)
+
+
+def run_benchmark(
+    agent: BaseAIAgent,
+    mode: str,
+    requests: int = 100,
+    concurrency: int = 1,
+    warmup: int = 5,
+    query: dict = QUERY,
+    trace_allocations: bool = True,
+) -> dict:
+    """
+    :param mode: sync 逐个 invoke; async 以 concurrency 并发 ainvoke;
+        stream 以 concurrency 并发 astream_events, 与 SSE 接口的执行路径一致
+    :return: 吞吐(请求/秒)、单请求 CPU 毫秒数; trace_allocations 时另跑一轮,
+        给出单请求残留的内存块数与字节数, 以及峰值内存; 工具在当前进程内执行
+    """
+    if mode not in MODES:
+        raise ValueError(f"Invalid mode: {mode}")
+    run = _runner(agent, mode, query, concurrency)
+    # AgentExecutor 开启了 verbose, 输出丢弃, 避免终端 IO 影响计时
+    with _inline_sandbox(), contextlib.redirect_stdout(io.StringIO()):
+        if warmup:
+            run(warmup)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        run(requests)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        result = {
+            "agent": type(agent).__name__,
+            "mode": mode,
+            "requests": requests,
+            "concurrency": 1 if mode == "sync" else concurrency,
+            "seconds": round(wall, 4),
+            "throughput": round(requests / wall, 2),
+            "cpu_ms_per_request": round(cpu * 1000 / requests, 3),
+        }
+        if trace_allocations:
+            result.update(_trace_allocations(run, requests))
+    return result
+
+
+def _trace_allocations(run: Callable[[int], None], requests: int) -> dict:
+    """
+    CPython 没有累计分配次数的计数器, 以 tracemalloc 前后快照之差统计单请求残留的
+    内存块数与字节数(可发现泄漏与缓存膨胀), 峰值内存反映执行期间的分配量
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        run(requests)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    return {
+        "retained_blocks_per_request": round(
+            sum(s.count_diff for s in stats) / requests, 2
+        ),
+        "retained_kib_per_request": round(
+            sum(s.size_diff for s in stats) / 1024 / requests, 3
+        ),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="agent 框架开销基准(离线)")
+    parser.add_argument("--agent", choices=sorted(AGENTS), default="LiscoAgent")
+    parser.add_argument("--mode", default=",".join(MODES), help="逗号分隔")
+    parser.add_argument("-n", "--requests", type=int, default=100)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟首包耗时(秒)")
+    parser.add_argument(
+        "--token-latency", type=float, default=0.0, help="模拟分片间隔(秒)"
+    )
+    parser.add_argument("--no-alloc", action="store_true", help="不统计内存分配")
+    args = parser.parse_args(argv)
+
+    agent = make_agent(
+        args.agent, latency=args.latency, token_latency=args.token_latency
+    )
+    for mode in args.mode.split(","):
+        result = run_benchmark(
+            agent,
+            mode.strip(),
+            requests=args.requests,
+            concurrency=args.concurrency,
+            trace_allocations=not args.no_alloc,
+        )
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from pkg.util.cache.cache import LRUTTLCache
+from pkg.util.metric.metric import metric_registry
+
+LLM_CACHE_REQUESTS_TOTAL = "llm_cache_requests_total"
+
+metric_registry.describe(
+    LLM_CACHE_REQUESTS_TOTAL, "LLM 响应缓存查询数, result 为 memory/disk/miss/bypass"
+)
+
+# 为 True 时跳过缓存查询, 但仍写入最新响应; 由请求头控制, 只影响当前请求
+llm_cache_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    prompt 为序列化后的消息列表, llm_string 包含模型名、参数与绑定的工具
+    """
+    return hashlib.sha256((llm_string + "\0" + prompt).encode("utf-8")).hexdigest()
+
+
+class SQLiteLLMStore:
+    """
+    LLM 响应的磁盘存储, 重启后仍然有效; 多个 worker 进程可共用同一个文件
+
+    连接在首次使用时按进程创建, fork 前创建的连接不会被子进程复用
+    """
+
+    # 每写入多少次清理一次过期条目
+    PURGE_EVERY = 100
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT value FROM llm_cache WHERE key = ? "
+                    "AND (expires_at IS NULL OR expires_at > ?)",
+                    (key, time.time()),
+                )
+                .fetchone()
+            )
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: Optional[float]):
+        expires_at = time.time() + ttl if ttl and ttl > 0 else None
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                conn.execute(
+                    "DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)
+                )
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+
+
+class TieredLLMCache(BaseCache):
+    """
+    LLM 响应缓存, 进程内 LRU 在前, SQLite 在后
+
+    api:
+        - lookup 先查内存, 再查磁盘, 磁盘命中后回填内存
+        - update 同时写入内存与磁盘
+    ttl <= 0 时不缓存
+    """
+
+    def __init__(
+        self,
+        memory: LRUTTLCache,
+        store: Optional[SQLiteLLMStore] = None,
+        ttl: Optional[float] = None,
+        name: str = "default",
+    ):
+        self.memory = memory
+        self.store = store
+        self.ttl = ttl
+        self.name = name
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl is None or self.ttl > 0
+
+    def _record(self, result: str):
+        metric_registry.inc(
+            LLM_CACHE_REQUESTS_TOTAL, {"agent": self.name, "result": result}
+        )
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if not self.enabled:
+            return None
+        if llm_cache_bypass.get():
+            self._record("bypass")
+            return None
+        key = cache_key(prompt, llm_string)
+        value = self.memory.get(key)
+        if value is not None:
+            self._record("memory")
+            return value
+        if self.store is not None:
+            serialized = self.store.get(key)
+            if serialized is not None:
+                value = loads(serialized)
+                self.memory.set(key, value, ttl=self.ttl)
+                self._record("disk")
+                return value
+        self._record("miss")
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        if not self.enabled:
+            return
+        key = cache_key(prompt, llm_string)
+        self.memory.set(key, return_val, ttl=self.ttl)
+        if self.store is not None:
+            self.store.set(key, dumps(return_val), self.ttl)
+
+    def clear(self, **kwargs):
+        self.memory.clear()
+        if self.store is not None:
+            self.store.clear()
+
+
+_stores: Dict[str, SQLiteLLMStore] = {}
+_caches: Dict[str, TieredLLMCache] = {}
+_lock = threading.Lock()
+
+
+def get_llm_cache(
+    name: str, ttl: Optional[float], maxsize: int, path: Optional[str]
+) -> TieredLLMCache:
+    """
+    同名 agent 的各个实例共用一个缓存, 所有缓存共用同一个磁盘文件
+    :param path: 为空时只使用内存缓存
+    """
+    with _lock:
+        cache = _caches.get(name)
+        if cache is None:
+            store = None
+            if path:
+                store = _stores.setdefault(path, SQLiteLLMStore(path))
+            cache = TieredLLMCache(LRUTTLCache(maxsize, ttl), store, ttl, name)
+            _caches[name] = cache
+        return cache
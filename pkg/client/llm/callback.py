@@ -0,0 +1,171 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from pkg.util.metric.metric import MetricRegistry, metric_registry
+
+AGENT_RUN_DURATION_SECONDS = "agent_run_duration_seconds"
+AGENT_ITERATIONS = "agent_iterations"
+AGENT_LLM_DURATION_SECONDS = "agent_llm_duration_seconds"
+AGENT_LLM_TIME_TO_FIRST_TOKEN_SECONDS = "agent_llm_time_to_first_token_seconds"
+AGENT_LLM_TOKENS_TOTAL = "agent_llm_tokens_total"
+AGENT_LLM_ERRORS_TOTAL = "agent_llm_errors_total"
+AGENT_TOOL_DURATION_SECONDS = "agent_tool_duration_seconds"
+AGENT_TOOL_ERRORS_TOTAL = "agent_tool_errors_total"
+
+# agent 迭代次数(LLM 决定调用工具的轮数)分桶, AgentExecutor 默认最多 15 轮
+ITERATION_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15)
+
+metric_registry.describe(AGENT_RUN_DURATION_SECONDS, "agent 单次执行总耗时(秒)")
+metric_registry.describe(AGENT_ITERATIONS, "agent 单次执行中调用工具的轮数")
+metric_registry.describe(AGENT_LLM_DURATION_SECONDS, "LLM 单次调用耗时(秒)")
+metric_registry.describe(
+    AGENT_LLM_TIME_TO_FIRST_TOKEN_SECONDS, "流式调用 LLM 时首个 token 的耗时(秒)"
+)
+metric_registry.describe(
+    AGENT_LLM_TOKENS_TOTAL, "LLM 消耗 token 数, type 为 prompt/completion"
+)
+metric_registry.describe(AGENT_LLM_ERRORS_TOTAL, "LLM 调用失败数")
+metric_registry.describe(AGENT_TOOL_DURATION_SECONDS, "工具单次执行耗时(秒)")
+metric_registry.describe(AGENT_TOOL_ERRORS_TOTAL, "工具执行失败数")
+
+
+def token_usage(response: LLMResult) -> Dict[str, int]:
+    """
+    优先取消息上的 usage_metadata, 其次取 llm_output 中 openai 格式的 token_usage
+    """
+    prompt_tokens = completion_tokens = 0
+    found = False
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if usage:
+                found = True
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+    if not found:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+    return {"prompt": prompt_tokens, "completion": completion_tokens}
+
+
+class AgentMetricsCallbackHandler(BaseCallbackHandler):
+    """
+    记录 agent 执行过程中各阶段耗时与 token 消耗, 按 agent 类汇总到 metric_registry
+
+    需以 config callbacks 的方式传入, 才能被 LLM、工具等子运行继承
+    """
+
+    # 处理逻辑很轻, 异步执行时直接在事件循环中调用, 不切换线程
+    run_inline = True
+
+    def __init__(self, agent: str, registry: MetricRegistry = metric_registry):
+        self.agent = agent
+        self.registry = registry
+        self._lock = threading.Lock()
+        # run_id -> 开始时间等运行状态
+        self._runs: Dict[UUID, dict] = {}
+
+    def _start(self, run_id: UUID, **state):
+        with self._lock:
+            self._runs[run_id] = {"start": time.perf_counter(), **state}
+
+    def _finish(self, run_id: UUID) -> Optional[dict]:
+        with self._lock:
+            state = self._runs.pop(run_id, None)
+        if state is not None:
+            state["duration"] = time.perf_counter() - state["start"]
+        return state
+
+    def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ):
+        # 只统计最外层的 AgentExecutor 运行
+        if parent_run_id is None:
+            self._start(run_id, iterations=0)
+
+    def on_agent_action(self, action, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            state = self._runs.get(run_id)
+            if state is not None:
+                state["iterations"] += 1
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs: Any):
+        state = self._finish(run_id)
+        if state is None:
+            return
+        labels = {"agent": self.agent}
+        self.registry.observe(AGENT_RUN_DURATION_SECONDS, state["duration"], labels)
+        self.registry.observe(
+            AGENT_ITERATIONS, state["iterations"], labels, ITERATION_BUCKETS
+        )
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._start(run_id, first_token=None)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id, first_token=None)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            state = self._runs.get(run_id)
+            if state is not None and state["first_token"] is None:
+                state["first_token"] = time.perf_counter() - state["start"]
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        state = self._finish(run_id)
+        if state is None:
+            return
+        labels = {"agent": self.agent}
+        self.registry.observe(AGENT_LLM_DURATION_SECONDS, state["duration"], labels)
+        if state["first_token"] is not None:
+            self.registry.observe(
+                AGENT_LLM_TIME_TO_FIRST_TOKEN_SECONDS, state["first_token"], labels
+            )
+        for token_type, count in token_usage(response).items():
+            if count:
+                self.registry.inc(
+                    AGENT_LLM_TOKENS_TOTAL,
+                    {"agent": self.agent, "type": token_type},
+                    count,
+                )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id)
+        self.registry.inc(AGENT_LLM_ERRORS_TOTAL, {"agent": self.agent})
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id, tool=(serialized or {}).get("name") or kwargs.get("name"))
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs: Any):
+        state = self._finish(run_id)
+        if state is not None:
+            self.registry.observe(
+                AGENT_TOOL_DURATION_SECONDS,
+                state["duration"],
+                {"agent": self.agent, "tool": str(state["tool"])},
+            )
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        state = self._finish(run_id)
+        if state is not None:
+            self.registry.inc(
+                AGENT_TOOL_ERRORS_TOTAL,
+                {"agent": self.agent, "tool": str(state["tool"])},
+            )
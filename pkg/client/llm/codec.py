@@ -0,0 +1,37 @@
+"""
+基于 orjson 的 json 编解码, 输出布局与 json.dumps(indent=4, ensure_ascii=False) 一致;
+浮点数同为可无损还原的最短表示, 但写法可能不同, 如 1.5e-05 输出为 0.000015
+"""
+
+import re
+from typing import Any
+
+import orjson
+
+# orjson 只支持 2 个空格缩进, 每行的前导空格加倍得到 4 个空格缩进
+_INDENT = b"  "
+_LONG_DIGITS = re.compile(rb"\d{19}")
+
+
+def loads(data: bytes) -> Any:
+    """
+    :raise ValueError: 非法 json, 以及 orjson 不能无损解析的输入:
+        超过 64 位的整数会被 orjson 转为 float, 有 19 位以上的连续数字时直接拒绝
+    """
+    if _LONG_DIGITS.search(data):
+        raise ValueError("integer may exceed 64 bits")
+    return orjson.loads(data)
+
+
+def dumps(obj) -> bytes:
+    """
+    :raise TypeError: 含有 json 不支持的类型, 或超过 64 位的整数
+    """
+    indented = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    # 紧凑输出中连续的空格只可能出现在字符串内, 没有时可整体替换
+    if _INDENT not in orjson.dumps(obj):
+        return indented.replace(_INDENT, _INDENT * 2)
+    lines = indented.split(b"\n")
+    return b"\n".join(
+        [b" " * (len(line) - len(line.lstrip(b" "))) + line for line in lines]
+    )
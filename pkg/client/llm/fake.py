@@ -0,0 +1,95 @@
+import asyncio
+import json
+import time
+from typing import Any, List
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    按脚本回复的离线模型, 用于测试与基准, 不访问网络
+
+    第 n 轮回复取 responses[n](超出时取最后一条), 轮数按消息中已有的工具调用轮数计算,
+    同一实例可被并发请求与多次请求复用
+    """
+
+    responses: List[AIMessage] = Field(description="按轮次的回复, 可带 tool_calls")
+    # 模拟上游耗时: latency 为首个分片前的等待, token_latency 为之后每个分片的间隔
+    latency: float = 0.0
+    token_latency: float = 0.0
+    # 流式输出时每个分片的字符数
+    chunk_size: int = 4
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat-model"
+
+    def bind_tools(self, tools, **kwargs):
+        # 回复已由脚本决定, 工具定义只需满足 create_tool_calling_agent
+        return self
+
+    def _response(self, messages: List[BaseMessage]) -> AIMessage:
+        rounds = sum(1 for m in messages if isinstance(m, AIMessage) and m.tool_calls)
+        return self.responses[min(rounds, len(self.responses) - 1)]
+
+    def _chunks(self, message: AIMessage) -> List[AIMessageChunk]:
+        content = message.content
+        chunks = [
+            AIMessageChunk(content=content[i : i + self.chunk_size])
+            for i in range(0, len(content), self.chunk_size)
+        ]
+        if message.tool_calls:
+            chunks.append(
+                AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"]),
+                            "id": call["id"],
+                            "index": index,
+                        }
+                        for index, call in enumerate(message.tool_calls)
+                    ],
+                )
+            )
+        if not chunks:
+            chunks.append(AIMessageChunk(content=""))
+        chunks[-1].usage_metadata = message.usage_metadata
+        return chunks
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        if self.latency:
+            time.sleep(self.latency)
+        message = self._response(messages)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = self._response(messages)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        if self.latency:
+            time.sleep(self.latency)
+        for index, chunk in enumerate(self._chunks(self._response(messages))):
+            if index and self.token_latency:
+                time.sleep(self.token_latency)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=chunk)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for index, chunk in enumerate(self._chunks(self._response(messages))):
+            if index and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=chunk)
+            yield ChatGenerationChunk(message=chunk)
@@ -0,0 +1,582 @@
+"""
+流式格式化: 逐块解析 json 文本为事件流, 再按输出格式逐块输出, 内存占用与输入大小无关
+
+事件为 (类型, 值, 原文) 三元组, 类型见 START_MAP 等常量; 原文只在 json 输入时有,
+json 输出时直接使用原文, 数字与字符串转义保持不变
+"""
+
+import json
+import re
+from json.decoder import scanstring
+from typing import Iterable, Iterator, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+START_MAP = "start_map"
+END_MAP = "end_map"
+START_ARRAY = "start_array"
+END_ARRAY = "end_array"
+KEY = "key"
+SCALAR = "scalar"
+
+Event = Tuple[str, object, object]
+
+# 嵌套层数上限, 输出时按层递归
+MAX_DEPTH = 256
+# 每次读取的最小字符数, 保证数字、字面量不会被截断在缓冲区末尾
+LOOKAHEAD = 64
+# 输出时合并小片段, 每块约 64K 字符
+OUTPUT_CHUNK_SIZE = 64 * 1024
+
+INDENT = "    "
+
+_TOKEN = re.compile(
+    r"[ \t\n\r]*(?:"
+    r"([{}\[\]:,])"
+    r'|("[^"\\\x00-\x1f]*(?:\\.[^"\\\x00-\x1f]*)*")'
+    r"|(-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)"
+    r"|(true|false|null))"
+)
+_STRING_PREFIX = re.compile(r'"[^"\\\x00-\x1f]*(?:\\.[^"\\\x00-\x1f]*)*')
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_LITERALS = {"true": True, "false": False, "null": None}
+
+# 解析状态
+_VALUE, _FIRST_VALUE, _FIRST_KEY, _KEY, _COLON, _NEXT, _DONE = range(7)
+
+
+def iter_chunks(text: str, size: int = OUTPUT_CHUNK_SIZE) -> Iterator[str]:
+    for i in range(0, len(text), size):
+        yield text[i : i + size]
+
+
+class _Buffer:
+    def __init__(self, chunks: Iterable[str]):
+        self.chunks = iter(chunks)
+        self.text = ""
+        self.pos = 0
+        # 已丢弃的字符数, 用于报错位置
+        self.offset = 0
+        self.eof = False
+
+    def fill(self):
+        """
+        丢弃已解析部分并至少读入与剩余部分等长的数据, 长字符串跨多块时总开销仍为线性
+        """
+        rest = self.text[self.pos :]
+        self.offset += self.pos
+        self.pos = 0
+        parts = [rest]
+        size = 0
+        while size < max(len(rest), LOOKAHEAD):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.eof = True
+                break
+            parts.append(chunk)
+            size += len(chunk)
+        self.text = "".join(parts)
+
+    def error(self, message: str, pos: int = None) -> ValueError:
+        pos = self.pos if pos is None else pos
+        return ValueError(f"{message} at char {self.offset + pos}")
+
+    def incomplete(self) -> bool:
+        """
+        未匹配到 token 时, 判断是否可能只是被截断的字符串
+        """
+        match = _STRING_PREFIX.match(self.text, self.pos)
+        return match is not None and match.end() >= len(self.text) - 1
+
+
+def _decode_string(raw: str, buffer: _Buffer) -> str:
+    if "\\" not in raw:
+        return raw[1:-1]
+    try:
+        return scanstring(raw, 1)[0]
+    except ValueError as e:
+        raise buffer.error(f"invalid string {raw[:32]!r}: {e}")
+
+
+def iter_json_events(chunks: Iterable[str]) -> Iterator[Event]:
+    """
+    逐块解析 json 文本, 只保留当前 token 与嵌套路径, 输入不合法时抛出 ValueError
+    """
+    buffer = _Buffer(chunks)
+    stack = []
+    state = _VALUE
+    while True:
+        if not buffer.eof and len(buffer.text) - buffer.pos < LOOKAHEAD:
+            buffer.fill()
+        text = buffer.text
+        match = _TOKEN.match(text, buffer.pos)
+        if match is None or (not buffer.eof and match.end() > len(text) - 4):
+            end = _WHITESPACE.match(text, buffer.pos).end()
+            if not buffer.eof and (
+                match is not None or end == len(text) or buffer.incomplete()
+            ):
+                buffer.fill()
+                continue
+            if match is None:
+                if end < len(text):
+                    raise buffer.error("invalid token", end)
+                if state != _DONE:
+                    raise buffer.error("unexpected end of input", end)
+                return
+        if state == _DONE:
+            raise buffer.error("extra data")
+
+        punct, string, number, literal = match.groups()
+        buffer.pos = match.end()
+        if punct is None:
+            if string is not None:
+                value = _decode_string(string, buffer)
+                if state in (_FIRST_KEY, _KEY):
+                    yield KEY, value, string
+                    state = _COLON
+                    continue
+                raw = string
+            elif number is not None:
+                value = int(number) if number.lstrip("-").isdigit() else float(number)
+                raw = number
+            else:
+                value = _LITERALS[literal]
+                raw = literal
+            if state not in (_VALUE, _FIRST_VALUE):
+                raise buffer.error(f"unexpected {raw[:32]}")
+            yield SCALAR, value, raw
+        elif punct in "{[":
+            if state not in (_VALUE, _FIRST_VALUE):
+                raise buffer.error(f"unexpected {punct}")
+            if len(stack) >= MAX_DEPTH:
+                raise buffer.error("nesting too deep")
+            if punct == "{":
+                stack.append(END_MAP)
+                yield START_MAP, None, None
+                state = _FIRST_KEY
+            else:
+                stack.append(END_ARRAY)
+                yield START_ARRAY, None, None
+                state = _FIRST_VALUE
+            continue
+        elif punct in "}]":
+            closing = END_MAP if punct == "}" else END_ARRAY
+            first = _FIRST_KEY if punct == "}" else _FIRST_VALUE
+            if not stack or stack[-1] != closing or state not in (first, _NEXT):
+                raise buffer.error(f"unexpected {punct}")
+            stack.pop()
+            yield closing, None, None
+        elif punct == ":":
+            if state != _COLON:
+                raise buffer.error("unexpected :")
+            state = _VALUE
+            continue
+        else:
+            if state != _NEXT:
+                raise buffer.error("unexpected ,")
+            state = _KEY if stack[-1] == END_MAP else _VALUE
+            continue
+        # 一个值结束
+        state = _NEXT if stack else _DONE
+
+
+def iter_object_events(obj, depth: int = 0) -> Iterator[Event]:
+    """
+    已解析的 python 对象转为事件流, tuple 与 set 按数组处理
+    """
+    if depth > MAX_DEPTH:
+        raise ValueError("nesting too deep")
+    if isinstance(obj, dict):
+        yield START_MAP, None, None
+        for key, value in obj.items():
+            yield KEY, key, None
+            yield from iter_object_events(value, depth + 1)
+        yield END_MAP, None, None
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        yield START_ARRAY, None, None
+        for value in obj:
+            yield from iter_object_events(value, depth + 1)
+        yield END_ARRAY, None, None
+    else:
+        yield SCALAR, obj, None
+
+
+def _closing(kind: str) -> str:
+    return END_MAP if kind == START_MAP else END_ARRAY
+
+
+# ---------------------------------------------------------------- json / text
+
+
+def _json_scalar(value, raw) -> str:
+    # 非 ascii 字符原样输出, 与 json 输入时保留原文一致
+    if raw is not None:
+        return raw
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return json.dumps(value, ensure_ascii=False)
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+def _json_key(key, raw) -> str:
+    if raw is not None:
+        return raw
+    if not isinstance(key, str):
+        key = json.dumps(key) if isinstance(key, (int, float, bool)) else str(key)
+    return json.dumps(key, ensure_ascii=False)
+
+
+def _text_repr(value, raw) -> str:
+    return repr(value)
+
+
+def _indented(events, event, level, scalar, key) -> Iterator[str]:
+    """
+    json 与 text 共用: 每个元素一行, 每层缩进 4 个空格, 与 json.dumps(indent=4) 一致
+    """
+    kind, value, raw = event
+    if kind == SCALAR:
+        yield scalar(value, raw)
+        return
+    opening, closing = "{}" if kind == START_MAP else "[]"
+    end = _closing(kind)
+    child = next(events)
+    if child[0] == end:
+        yield opening + closing
+        return
+    yield opening
+    separator = "\n" + INDENT * (level + 1)
+    first = True
+    while child[0] != end:
+        yield separator if first else "," + separator
+        first = False
+        if kind == START_MAP:
+            yield key(child[1], child[2]) + ": "
+            child = next(events)
+        yield from _indented(events, child, level + 1, scalar, key)
+        child = next(events)
+    yield "\n" + INDENT * level + closing
+
+
+def emit_json(events: Iterator[Event]) -> Iterator[str]:
+    yield from _indented(events, next(events), 0, _json_scalar, _json_key)
+
+
+def emit_text(events: Iterator[Event]) -> Iterator[str]:
+    """
+    python 字面量, 每个元素一行
+    """
+    yield from _indented(events, next(events), 0, _text_repr, _text_repr)
+
+
+# ---------------------------------------------------------------- yaml
+
+_YAML_PLAIN = re.compile(r"[^\W\d][\w .\-/@]*")
+_YAML_RESERVED = {"y", "n", "yes", "no", "on", "off", "true", "false", "null"}
+# yaml 不允许直接出现的字符, 以及会被当作换行的字符
+_YAML_UNPRINTABLE = re.compile("[\x7f-\x9f\u2028\u2029\ud800-\udfff\ufeff\ufffe\uffff]")
+
+
+def _yaml_scalar(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if value != value:
+            return ".nan"
+        if value in (float("inf"), float("-inf")):
+            return ".inf" if value > 0 else "-.inf"
+        text = repr(value)
+        # yaml 1.1 的浮点数必须带小数点, 否则 1e+300 会被当作字符串
+        if "e" in text and "." not in text:
+            text = text.replace("e", ".0e")
+        return text
+    if not isinstance(value, str):
+        value = str(value)
+    if (
+        _YAML_PLAIN.fullmatch(value)
+        and not value.endswith(" ")
+        and value.lower() not in _YAML_RESERVED
+    ):
+        return value
+    # json 字符串即合法的 yaml 双引号字符串
+    return _YAML_UNPRINTABLE.sub(
+        lambda m: "\\u%04x" % ord(m.group()), json.dumps(value, ensure_ascii=False)
+    )
+
+
+def _yaml_entries(events, kind, child, indent, prefix) -> Iterator[str]:
+    """
+    输出非空的映射或序列, 首行以 prefix 开头(可能跟在 "- " 之后), 其余行缩进 indent
+    """
+    end = _closing(kind)
+    pad = " " * indent
+    while child[0] != end:
+        if kind == START_MAP:
+            yield prefix + _yaml_scalar(child[1]) + ":"
+            child = next(events)
+            nested, nested_prefix = indent + 2, "\n" + " " * (indent + 2)
+        else:
+            yield prefix + "-"
+            nested, nested_prefix = indent + 2, " "
+        prefix = pad
+        if child[0] == SCALAR:
+            yield " " + _yaml_scalar(child[1]) + "\n"
+        else:
+            first = next(events)
+            if first[0] == _closing(child[0]):
+                yield " {}\n" if child[0] == START_MAP else " []\n"
+            else:
+                yield from _yaml_entries(events, child[0], first, nested, nested_prefix)
+        child = next(events)
+
+
+def emit_yaml(events: Iterator[Event]) -> Iterator[str]:
+    event = next(events)
+    if event[0] == SCALAR:
+        yield _yaml_scalar(event[1]) + "\n"
+        return
+    first = next(events)
+    if first[0] == _closing(event[0]):
+        yield "{}\n" if event[0] == START_MAP else "[]\n"
+        return
+    yield from _yaml_entries(events, event[0], first, 0, "")
+
+
+# ---------------------------------------------------------------- toml
+
+_TOML_BARE_KEY = re.compile(r"[A-Za-z0-9_-]+")
+_INT64 = 2**63
+
+
+def _toml_string(value: str) -> str:
+    return json.dumps(value, ensure_ascii=False).replace("\x7f", "\\u007f")
+
+
+def _toml_key(key) -> str:
+    key = key if isinstance(key, str) else str(key)
+    return key if _TOML_BARE_KEY.fullmatch(key) else _toml_string(key)
+
+
+def _toml_scalar(value) -> str:
+    if value is None:
+        raise ValueError("toml does not support null")
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        if not -_INT64 <= value < _INT64:
+            raise ValueError(f"integer {value} out of toml range")
+        return str(value)
+    if isinstance(value, float):
+        if value != value:
+            return "nan"
+        if value in (float("inf"), float("-inf")):
+            return "inf" if value > 0 else "-inf"
+        return repr(value)
+    return _toml_string(value if isinstance(value, str) else str(value))
+
+
+def _toml_inline(events, event) -> Iterator[str]:
+    """
+    数组元素只能是行内值, 表输出为行内表 { k = v }
+    """
+    kind, value, _ = event
+    if kind == SCALAR:
+        yield _toml_scalar(value)
+        return
+    end = _closing(kind)
+    yield "{ " if kind == START_MAP else "["
+    child = next(events)
+    first = True
+    while child[0] != end:
+        if not first:
+            yield ", "
+        first = False
+        if kind == START_MAP:
+            yield _toml_key(child[1]) + " = "
+            child = next(events)
+        yield from _toml_inline(events, child)
+        child = next(events)
+    yield " }" if kind == START_MAP else "]"
+
+
+def _toml_table(events, path: str, child) -> Iterator[str]:
+    """
+    以完整的点分键输出, 不依赖表头, 子表与普通键值的先后顺序可以任意
+    """
+    while child[0] != END_MAP:
+        key = path + _toml_key(child[1])
+        value = next(events)
+        if value[0] == SCALAR:
+            yield key + " = " + _toml_scalar(value[1]) + "\n"
+        elif value[0] == START_MAP:
+            first = next(events)
+            if first[0] == END_MAP:
+                yield key + " = {}\n"
+            else:
+                yield from _toml_table(events, key + ".", first)
+        else:
+            first = next(events)
+            if first[0] == END_ARRAY:
+                yield key + " = []\n"
+            else:
+                yield key + " = ["
+                while first[0] != END_ARRAY:
+                    yield "\n" + INDENT
+                    yield from _toml_inline(events, first)
+                    yield ","
+                    first = next(events)
+                yield "\n]\n"
+        child = next(events)
+
+
+def emit_toml(events: Iterator[Event]) -> Iterator[str]:
+    if next(events)[0] != START_MAP:
+        raise ValueError("toml output requires a top-level table")
+    yield from _toml_table(events, "", next(events))
+
+
+# ---------------------------------------------------------------- xml
+
+_XML_NAME = re.compile(r"[A-Za-z_][\w.\-]*")
+_XML_INVALID_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _xml_text(value) -> str:
+    if isinstance(value, bool):
+        value = "true" if value else "false"
+    return escape(_XML_INVALID_CHARS.sub("\ufffd", str(value)))
+
+
+def _xml_tag(key):
+    """
+    :return: (开始标签, 结束标签), 不是合法元素名的键放在 key 属性中
+    """
+    key = key if isinstance(key, str) else str(key)
+    if _XML_NAME.fullmatch(key) and not key.lower().startswith("xml"):
+        return key, key
+    return "item key=" + quoteattr(_XML_INVALID_CHARS.sub("\ufffd", key)), "item"
+
+
+def _xml_element(events, event, tag, level) -> Iterator[str]:
+    opening, closing = tag
+    pad = INDENT * level
+    kind, value, _ = event
+    if kind == SCALAR:
+        if value is None:
+            yield f"{pad}<{opening}/>\n"
+        else:
+            yield f"{pad}<{opening}>{_xml_text(value)}</{closing}>\n"
+        return
+    end = _closing(kind)
+    child = next(events)
+    if child[0] == end:
+        yield f"{pad}<{opening}/>\n"
+        return
+    yield f"{pad}<{opening}>\n"
+    while child[0] != end:
+        child_tag = ("item", "item")
+        if kind == START_MAP:
+            child_tag = _xml_tag(child[1])
+            child = next(events)
+        yield from _xml_element(events, child, child_tag, level + 1)
+        child = next(events)
+    yield f"{pad}</{closing}>\n"
+
+
+def emit_xml(events: Iterator[Event]) -> Iterator[str]:
+    """
+    根元素为 root, 映射的键作为元素名, 数组元素为 item
+    """
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield from _xml_element(events, next(events), ("root", "root"), 0)
+
+
+# ---------------------------------------------------------------- markdown
+
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_\[\]<>#|])")
+
+
+def _markdown_text(value) -> str:
+    if not isinstance(value, str):
+        return (
+            json.dumps(value)
+            if value is None or isinstance(value, bool)
+            else str(value)
+        )
+    return _MARKDOWN_SPECIAL.sub(r"\\\1", value).replace("\n", "<br>")
+
+
+def _markdown_items(events, kind, child, level) -> Iterator[str]:
+    """
+    嵌套列表, 映射为 "- **键**: 值", 数组中的标量为 "- 值", 容器为 "- **[下标]**"
+    """
+    end = _closing(kind)
+    pad = "  " * level
+    index = 0
+    while child[0] != end:
+        label = f"**[{index}]**"
+        if kind == START_MAP:
+            label = f"**{_markdown_text(child[1])}**"
+            child = next(events)
+        if child[0] == SCALAR:
+            text = _markdown_text(child[1])
+            if kind == START_MAP:
+                yield f"{pad}- {label}: {text}\n"
+            else:
+                yield f"{pad}- {text}\n"
+        else:
+            first = next(events)
+            if first[0] == _closing(child[0]):
+                empty = "`{}`" if child[0] == START_MAP else "`[]`"
+                yield f"{pad}- {label}: {empty}\n"
+            else:
+                yield f"{pad}- {label}\n"
+                yield from _markdown_items(events, child[0], first, level + 1)
+        index += 1
+        child = next(events)
+
+
+def emit_markdown(events: Iterator[Event]) -> Iterator[str]:
+    event = next(events)
+    if event[0] == SCALAR:
+        yield _markdown_text(event[1]) + "\n"
+        return
+    first = next(events)
+    if first[0] == _closing(event[0]):
+        yield "`{}`\n" if event[0] == START_MAP else "`[]`\n"
+        return
+    yield from _markdown_items(events, event[0], first, 0)
+
+
+EMITTERS = {
+    "json": emit_json,
+    "text": emit_text,
+    "yaml": emit_yaml,
+    "toml": emit_toml,
+    "xml": emit_xml,
+    "markdown": emit_markdown,
+}
+
+
+def format_events(
+    events: Iterable[Event], output_format: str, chunk_size: int = OUTPUT_CHUNK_SIZE
+) -> Iterator[str]:
+    """
+    按输出格式逐块输出, 小片段合并为约 chunk_size 个字符的块
+    """
+    emitter = EMITTERS.get(output_format)
+    if emitter is None:
+        raise ValueError(f"Invalid output_format: {output_format}")
+    parts = []
+    size = 0
+    for part in emitter(iter(events)):
+        parts.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield "".join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield "".join(parts)
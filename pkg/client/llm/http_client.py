@@ -0,0 +1,95 @@
+import importlib.util
+import os
+import threading
+from typing import Optional
+
+import httpx
+
+from pkg.util.config.config import config_manager
+from pkg.util.log.log import logger
+
+
+class HttpClientRegistry:
+    """
+    进程内共享的 httpx 客户端, 所有 ChatOpenAI 复用同一个连接池, 保持到上游的长连接
+
+    api:
+        - get_client / get_async_client 同步与异步客户端, 首次使用时创建
+        - close / aclose 关闭客户端, 释放连接
+    客户端按进程创建, fork 前创建的客户端不会被子进程复用
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30,
+        connect_timeout: float = 5,
+        read_timeout: float = 60,
+        http2: bool = False,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("http2 requires the h2 package, falling back to http/1.1")
+            http2 = False
+        self.http2 = http2
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._client = self._async_client = None
+            self._pid = os.getpid()
+
+    def get_client(self) -> httpx.Client:
+        with self._lock:
+            self._check_pid()
+            if self._client is None:
+                self._client = httpx.Client(
+                    limits=self.limits, timeout=self.timeout, http2=self.http2
+                )
+            return self._client
+
+    def get_async_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            self._check_pid()
+            if self._async_client is None:
+                self._async_client = httpx.AsyncClient(
+                    limits=self.limits, timeout=self.timeout, http2=self.http2
+                )
+            return self._async_client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+
+    async def aclose(self):
+        with self._lock:
+            client = self._async_client if self._pid == os.getpid() else None
+            self._async_client = None
+        if client is not None:
+            await client.aclose()
+
+
+def create_http_client_registry() -> HttpClientRegistry:
+    config = config_manager.get_config().llm
+    return HttpClientRegistry(
+        max_connections=config.max_connections,
+        max_keepalive_connections=config.max_keepalive_connections,
+        keepalive_expiry=config.keepalive_expiry,
+        connect_timeout=config.connect_timeout,
+        read_timeout=config.read_timeout,
+        http2=config.http2,
+    )
+
+
+http_client_registry = create_http_client_registry()
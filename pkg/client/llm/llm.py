@@ -1,15 +1,40 @@
+import asyncio
+import random
+import threading
+import time
 from enum import Enum
+from typing import Dict, List, Optional
 
 from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import ChatResult, LLMResult
 from langchain_core.tools import StructuredTool
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from pkg.client.llm.api_tool import HttpAPI, HttpFunction, Function, Parameters, ArgProperty, HttpAPIManager
+from pkg.client.llm.artifact import start_collecting
+from pkg.client.llm.cache import get_llm_cache
+from pkg.client.llm.callback import AgentMetricsCallbackHandler, token_usage
+from pkg.client.llm.http_client import http_client_registry
+from pkg.client.llm.rate_limit import UpstreamOverloaded, UpstreamRateLimiter, get_rate_limiter
 from pkg.client.llm.tool import pretty_print_python_object_tool
 from pkg.util.config.config import config_manager
+from pkg.util.metric.metric import metric_registry
+
+LLM_BACKEND_LATENCY_SECONDS = "llm_backend_latency_seconds"
+LLM_BACKEND_HEALTHY = "llm_backend_healthy"
+LLM_BACKEND_FAILOVER_TOTAL = "llm_backend_failover_total"
+
+metric_registry.describe(
+    LLM_BACKEND_LATENCY_SECONDS, "各模型后端调用耗时的滑动平均(秒)"
+)
+metric_registry.describe(LLM_BACKEND_HEALTHY, "各模型后端是否可用, 熔断中为 0")
+metric_registry.describe(
+    LLM_BACKEND_FAILOVER_TOTAL, "模型后端调用失败后切换到下一个后端的次数"
+)
 
 
 class ModelEnum(str, Enum):
@@ -19,9 +44,310 @@ class ModelEnum(str, Enum):
     QWEN_PLUS = "qwen-plus"
 
 
-class BaseAIAgent:
+def estimate_tokens(messages) -> int:
+    # 粗略按 4 个字符 1 个 token 预估, 请求结束后按实际用量修正
+    return sum(len(str(message.content)) for message in messages) // 4 + 1
+
+
+def used_tokens(result: ChatResult) -> Optional[int]:
+    usage = token_usage(
+        LLMResult(generations=[result.generations], llm_output=result.llm_output)
+    )
+    return usage["prompt"] + usage["completion"] or None
+
+
+class LiscoChatOpenAI(ChatOpenAI):
+    """
+    请求上游前先经过限流器; 缓存命中时不会调用这里的方法, 不占用额度
+    """
+
+    _upstream_limiter: Optional[UpstreamRateLimiter] = PrivateAttr(default=None)
+
+    def set_upstream_limiter(self, limiter: UpstreamRateLimiter):
+        self._upstream_limiter = limiter
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter = self._upstream_limiter
+        if limiter is None:
+            return super()._generate(messages, stop, run_manager, **kwargs)
+        estimate = estimate_tokens(messages)
+        limiter.acquire(estimate)
+        result = super()._generate(messages, stop, run_manager, **kwargs)
+        limiter.record((used_tokens(result) or estimate) - estimate)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter = self._upstream_limiter
+        if limiter is None:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        estimate = estimate_tokens(messages)
+        await limiter.aacquire(estimate)
+        result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+        limiter.record((used_tokens(result) or estimate) - estimate)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter = self._upstream_limiter
+        if limiter is None:
+            yield from super()._stream(messages, stop, run_manager, **kwargs)
+            return
+        estimate = estimate_tokens(messages)
+        limiter.acquire(estimate)
+        used = estimate
+        try:
+            for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+                used = self._stream_usage(chunk, used)
+                yield chunk
+        finally:
+            limiter.record(used - estimate)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        limiter = self._upstream_limiter
+        if limiter is None:
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                yield chunk
+            return
+        estimate = estimate_tokens(messages)
+        await limiter.aacquire(estimate)
+        used = estimate
+        try:
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                used = self._stream_usage(chunk, used)
+                yield chunk
+        finally:
+            limiter.record(used - estimate)
+
+    @staticmethod
+    def _stream_usage(chunk, used: int) -> int:
+        # 带 usage 的分片给出实际用量, 否则按输出字符数累加预估
+        usage = getattr(chunk.message, "usage_metadata", None)
+        if usage and usage.get("total_tokens"):
+            return usage["total_tokens"]
+        return used + len(chunk.text) // 4
+
+
+class BackendStats:
+    """
+    单个模型后端的滚动统计: 耗时滑动平均、连续失败次数与熔断截止时间
+    """
+
+    EWMA_ALPHA = 0.3
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.open_until
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            "latency": self.latency,
+            "calls": self.calls,
+            "errors": self.errors,
+            "healthy": self.healthy(now),
+        }
+
+
+class ModelRouter:
+    """
+    在多个模型后端之间路由, 按耗时滑动平均选择最快的可用后端
+
+    - 未调用过的后端优先, 以便尽快得到耗时数据; 另有小概率随机选择其它可用后端, 持续刷新统计
+    - 连续失败 FAILURE_THRESHOLD 次后熔断, 熔断时长从 COOLDOWN 开始逐次翻倍, 最长 MAX_COOLDOWN;
+      熔断到期后重新参与路由, 再次失败则继续熔断, 成功则恢复
+    - 所有后端都熔断时按熔断到期先后依次尝试, 不直接拒绝
+    """
+
+    FAILURE_THRESHOLD = 3
+    COOLDOWN = 5.0
+    MAX_COOLDOWN = 60.0
+    EXPLORE_RATIO = 0.05
+
     def __init__(self):
-        self.llm = None
+        self.stats: Dict[str, BackendStats] = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, model: str) -> BackendStats:
+        stats = self.stats.get(model)
+        if stats is None:
+            stats = self.stats[model] = BackendStats()
+        return stats
+
+    def candidates(self, models: List[str]) -> List[str]:
+        """
+        按尝试顺序返回后端
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [m for m in models if self._stats(m).healthy(now)]
+            broken = [m for m in models if not self._stats(m).healthy(now)]
+            # 未调用过的后端排在最前
+            healthy.sort(key=lambda m: self.stats[m].latency or -1)
+            broken.sort(key=lambda m: self.stats[m].open_until)
+        if len(healthy) > 1 and random.random() < self.EXPLORE_RATIO:
+            healthy.insert(0, healthy.pop(random.randrange(1, len(healthy))))
+        return healthy + broken
+
+    def record_success(self, model: str, duration: float):
+        with self._lock:
+            stats = self._stats(model)
+            stats.calls += 1
+            stats.consecutive_failures = 0
+            stats.open_until = 0.0
+            if stats.latency is None:
+                stats.latency = duration
+            else:
+                stats.latency += stats.EWMA_ALPHA * (duration - stats.latency)
+            latency = stats.latency
+        metric_registry.set_gauge(
+            LLM_BACKEND_LATENCY_SECONDS, latency, {"model": model}
+        )
+        metric_registry.set_gauge(LLM_BACKEND_HEALTHY, 1, {"model": model})
+
+    def record_failure(self, model: str):
+        with self._lock:
+            stats = self._stats(model)
+            stats.calls += 1
+            stats.errors += 1
+            stats.consecutive_failures += 1
+            opened = stats.consecutive_failures >= self.FAILURE_THRESHOLD
+            if opened:
+                times = stats.consecutive_failures - self.FAILURE_THRESHOLD
+                cooldown = min(self.COOLDOWN * 2**times, self.MAX_COOLDOWN)
+                stats.open_until = time.monotonic() + cooldown
+        if opened:
+            metric_registry.set_gauge(LLM_BACKEND_HEALTHY, 0, {"model": model})
+
+    def record_failover(self, model: str):
+        """
+        model 调用失败后切换到了下一个后端
+        """
+        metric_registry.inc(LLM_BACKEND_FAILOVER_TOTAL, {"model": model})
+
+    def snapshot(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        with self._lock:
+            return {model: stats.to_dict(now) for model, stats in self.stats.items()}
+
+
+model_router = ModelRouter()
+
+
+class RoutedChatOpenAI(ChatOpenAI):
+    """
+    对外与 ChatOpenAI 一致, 每次调用由 ModelRouter 选择后端, 出错时依次切换到下一个后端;
+    流式调用只在输出第一个分片前切换
+    """
+
+    _backends: Dict[str, ChatOpenAI] = PrivateAttr(default_factory=dict)
+    _router: Optional[ModelRouter] = PrivateAttr(default=None)
+
+    def set_backends(self, backends: Dict[str, ChatOpenAI], router: ModelRouter):
+        self._backends = backends
+        self._router = router
+
+    def _on_error(self, model: str, error: Exception, failover: bool):
+        """
+        本地限流拒绝(UpstreamOverloaded)不是后端故障, 不计入熔断, 直接尝试下一个后端
+        :param failover: 是否会切换到下一个后端
+        """
+        if not isinstance(error, UpstreamOverloaded):
+            self._router.record_failure(model)
+        if failover:
+            self._router.record_failover(model)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        error = None
+        models = self._router.candidates(list(self._backends))
+        for index, model in enumerate(models):
+            start = time.perf_counter()
+            try:
+                result = self._backends[model]._generate(
+                    messages, stop, run_manager, **kwargs
+                )
+            except Exception as e:
+                self._on_error(model, e, index + 1 < len(models))
+                error = e
+                continue
+            self._router.record_success(model, time.perf_counter() - start)
+            return result
+        raise error
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        error = None
+        models = self._router.candidates(list(self._backends))
+        for index, model in enumerate(models):
+            start = time.perf_counter()
+            try:
+                result = await self._backends[model]._agenerate(
+                    messages, stop, run_manager, **kwargs
+                )
+            except Exception as e:
+                self._on_error(model, e, index + 1 < len(models))
+                error = e
+                continue
+            self._router.record_success(model, time.perf_counter() - start)
+            return result
+        raise error
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        error = None
+        models = self._router.candidates(list(self._backends))
+        for index, model in enumerate(models):
+            start = time.perf_counter()
+            started = False
+            try:
+                for chunk in self._backends[model]._stream(
+                    messages, stop, run_manager, **kwargs
+                ):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self._on_error(model, e, not started and index + 1 < len(models))
+                if started:
+                    raise
+                error = e
+                continue
+            self._router.record_success(model, time.perf_counter() - start)
+            return
+        raise error
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        error = None
+        models = self._router.candidates(list(self._backends))
+        for index, model in enumerate(models):
+            start = time.perf_counter()
+            started = False
+            try:
+                async for chunk in self._backends[model]._astream(
+                    messages, stop, run_manager, **kwargs
+                ):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self._on_error(model, e, not started and index + 1 < len(models))
+                if started:
+                    raise
+                error = e
+                continue
+            self._router.record_success(model, time.perf_counter() - start)
+            return
+        raise error
+
+
+class BaseAIAgent:
+    # LLM 响应缓存过期时间(秒), None 使用配置中的 cache_ttl, 0 为不缓存
+    llm_cache_ttl = None
+    # 除配置的主模型外, 还允许路由到的模型(取与配置 models 的交集), 需与主模型共用 base_url
+    allowed_models = ()
+
+    def __init__(self, llm: Optional[BaseChatModel] = None):
+        # 传入 llm 时不再按配置创建, 用于测试与基准
+        self.llm = llm
         self.agent_executor = None
         self.agent = None
         self.model = None
@@ -41,11 +367,66 @@ class BaseAIAgent:
         self.init_agent_executor()
 
     def init_llm(self, api_key, base_url, model, app_code=None):
+        if self.llm is not None:
+            return
         query = None
         if app_code:
             query = dict(bk_app_code=app_code, bk_app_secret=api_key)
-        self.llm = ChatOpenAI(
-            api_key=api_key, base_url=base_url, model=model, default_query=query
+        kwargs = dict(
+            api_key=api_key,
+            base_url=base_url,
+            model=model,
+            default_query=query,
+            cache=self.get_llm_cache(),
+            # 共享连接池; openai 按请求传入超时, 会覆盖 httpx 客户端上的超时
+            http_client=http_client_registry.get_client(),
+            http_async_client=http_client_registry.get_async_client(),
+            timeout=http_client_registry.timeout,
+        )
+        llm = LiscoChatOpenAI(**kwargs)
+        llm.set_upstream_limiter(self.get_rate_limiter(model, api_key))
+        models = self.routed_models(model)
+        if len(models) == 1:
+            self.llm = llm
+            return
+
+        # 各后端只负责请求上游, 缓存在外层按主模型统一处理
+        backends = {}
+        for name in models:
+            backend = llm.model_copy(update={"model_name": name, "cache": False})
+            backend.set_upstream_limiter(self.get_rate_limiter(name, api_key))
+            backends[name] = backend
+        self.llm = RoutedChatOpenAI(**kwargs)
+        self.llm.set_backends(backends, model_router)
+
+    def routed_models(self, model) -> List[str]:
+        allowed = {
+            m.value if isinstance(m, ModelEnum) else m for m in self.allowed_models
+        }
+        models = [model]
+        for name in config_manager.get_config().llm.models:
+            if name in allowed and name not in models:
+                models.append(name)
+        return models
+
+    def get_rate_limiter(self, model, api_key) -> UpstreamRateLimiter:
+        config = config_manager.get_config()
+        # 配置为整个服务的额度, 由各 worker 进程均分
+        workers = max(config.server.workers, 1)
+        return get_rate_limiter(
+            model,
+            api_key,
+            requests_per_minute=config.llm.rate_limit_rpm / workers,
+            tokens_per_minute=config.llm.rate_limit_tpm / workers,
+            max_waiting=config.llm.rate_limit_max_waiting,
+            max_wait=config.llm.rate_limit_max_wait,
+        )
+
+    def get_llm_cache(self):
+        config = config_manager.get_config().llm
+        ttl = config.cache_ttl if self.llm_cache_ttl is None else self.llm_cache_ttl
+        return get_llm_cache(
+            type(self).__name__, ttl, config.cache_size, config.cache_path
         )
 
     def init_agent(self):
@@ -68,12 +449,17 @@ class BaseAIAgent:
         )
 
     def init_agent_executor(self):
+        # stream 调用不经过 LLM 缓存, 关闭 stream_runnable 使每步调用走 invoke;
+        # astream_events 下 LLM 仍会在缓存未命中时逐 token 输出
+        # 指标回调以 config callbacks 传入, LLM 与工具等子运行才会继承
         self.agent_executor = AgentExecutor(
-            agent=self.agent, tools=self.tools, verbose=True
-        )
+            agent=self.agent, tools=self.tools, verbose=True, stream_runnable=False
+        ).with_config(callbacks=[AgentMetricsCallbackHandler(type(self).__name__)])
 
 
 class QwenAgent(BaseAIAgent):
+    allowed_models = (ModelEnum.QWEN_TURBO, ModelEnum.QWEN_PLUS)
+
     def init(self):
         self.init_llm(
             api_key=config_manager.get_config().llm.api_key,
@@ -109,6 +495,9 @@ class QwenAgent(BaseAIAgent):
     def invoke(self, query):
         return self.agent_executor.invoke(query)
 
+    async def ainvoke(self, query):
+        return await self.agent_executor.ainvoke(query)
+
     def stream(self, query):
         return self.agent_executor.stream(query)
 
@@ -116,6 +505,39 @@ class QwenAgent(BaseAIAgent):
         async for chunk in self.agent_executor.astream(query):
             yield chunk
 
+    async def abatch_as_completed(self, queries, max_concurrency: int):
+        """
+        并发执行多个请求, 按完成先后返回 (下标, 结果, 转存的 artifact 列表), 单个请求失败时结果为异常
+
+        每个请求在各自的任务中执行, 工具转存的 artifact 按请求分别收集
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(index, query):
+            async with semaphore:
+                artifacts = start_collecting()
+                try:
+                    result = await self.agent_executor.ainvoke(query)
+                except Exception as e:
+                    result = e
+                return index, result, artifacts
+
+        tasks = [asyncio.create_task(run(index, query)) for index, query in enumerate(queries)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # 调用方提前结束迭代(如客户端断开)时取消未完成的请求
+            for task in tasks:
+                task.cancel()
+
+    async def astream_events(self, query):
+        """
+        与 astream 相同的执行过程, 额外包含 LLM 逐 token 输出、工具调用开始与结束等事件
+        """
+        async for event in self.agent_executor.astream_events(query, version="v2"):
+            yield event
+
 
 class LiscoAgent(QwenAgent):
     def init_tools(self):
@@ -123,6 +545,9 @@ class LiscoAgent(QwenAgent):
 
 
 class HttpApiAgent(QwenAgent):
+    # 工具查询的是实时数据, 不缓存
+    llm_cache_ttl = 0
+
     def init_tools(self):
         manager = HttpAPIManager()
         manager.load_openapi_json("/opt/test/openapi.json", "/", "http://localhost:18000/metric")
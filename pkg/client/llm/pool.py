@@ -0,0 +1,206 @@
+import asyncio
+import queue
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Deque, Dict, Optional, Tuple, Type
+
+from anyio import to_thread
+
+from pkg.client.llm.llm import BaseAIAgent, HttpApiAgent, LiscoAgent, QwenAgent
+from pkg.util.log.log import logger
+
+DEFAULT_AGENT_CLASSES = (LiscoAgent, QwenAgent, HttpApiAgent)
+
+
+class AgentPoolExhausted(Exception):
+    """
+    等待超时仍没有空闲 agent
+    """
+
+
+class AgentPool:
+    """
+    预先构建的 agent 池, 同一个 agent 同一时刻只借给一个调用方
+
+    api:
+        - warm_up 启动时构建满 size 个 agent, 避免首个请求承担构建开销
+        - acquire / aacquire 借出 agent, 退出上下文时归还;
+          池中无空闲且未满时现场构建, 已满时最多等待 timeout 秒
+    """
+
+    def __init__(
+        self, agent_class: Type[BaseAIAgent], size: int = 4, timeout: float = 30
+    ):
+        self.agent_class = agent_class
+        self.size = size
+        self.timeout = timeout
+        # 后进先出, 优先复用刚归还的 agent, 其连接更可能仍然存活
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        # 协程等待方, 归还时直接交给最早的等待方, 不占用线程等待
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    @property
+    def name(self) -> str:
+        return self.agent_class.__name__
+
+    def _reserve(self) -> bool:
+        with self._lock:
+            if self._created >= self.size:
+                return False
+            self._created += 1
+            return True
+
+    def _build(self) -> BaseAIAgent:
+        try:
+            return self.agent_class()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _create(self) -> Optional[BaseAIAgent]:
+        if not self._reserve():
+            return None
+        return self._build()
+
+    def warm_up(self):
+        while True:
+            agent = self._create()
+            if agent is None:
+                return
+            self._idle.put(agent)
+
+    def _get(self, timeout: Optional[float] = None) -> BaseAIAgent:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        agent = self._create()
+        if agent is not None:
+            return agent
+        try:
+            return self._idle.get(timeout=self.timeout if timeout is None else timeout)
+        except queue.Empty:
+            raise self._exhausted()
+
+    async def _aget(self, timeout: Optional[float] = None) -> BaseAIAgent:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            build = self._created < self.size
+            if build:
+                self._created += 1
+            else:
+                waiter = (loop, loop.create_future())
+                self._waiters.append(waiter)
+        if build:
+            # 只有构建 agent 放到线程中执行, 等待空闲 agent 不占用线程
+            return await to_thread.run_sync(self._build)
+        future = waiter[1]
+        try:
+            return await asyncio.wait_for(
+                future, self.timeout if timeout is None else timeout
+            )
+        except BaseException as e:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            if future.done() and not future.cancelled():
+                # 超时与交付同时发生, 已交付的 agent 归还给其他调用方
+                self._release(future.result())
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._exhausted() from None
+            raise
+
+    def _release(self, agent: BaseAIAgent):
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                if future.done():
+                    continue
+                try:
+                    loop.call_soon_threadsafe(self._hand_over, future, agent)
+                    return
+                except RuntimeError:
+                    # 等待方所在事件循环已关闭
+                    continue
+            # 在锁内放回, 避免与正在登记的协程等待方错过
+            self._idle.put(agent)
+
+    def _hand_over(self, future: asyncio.Future, agent: BaseAIAgent):
+        if future.done():
+            # 等待方已超时或取消
+            self._release(agent)
+        else:
+            future.set_result(agent)
+
+    def _exhausted(self) -> AgentPoolExhausted:
+        return AgentPoolExhausted(
+            "no idle {} in pool (size {})".format(self.name, self.size)
+        )
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        agent = self._get(timeout)
+        try:
+            yield agent
+        finally:
+            self._release(agent)
+
+    @asynccontextmanager
+    async def aacquire(self, timeout: Optional[float] = None):
+        agent = await self._aget(timeout)
+        try:
+            yield agent
+        finally:
+            self._release(agent)
+
+    def stats(self) -> dict:
+        return {"size": self.size, "created": self._created, "idle": self._idle.qsize()}
+
+
+class AgentPoolManager:
+    """
+    按 agent 类管理 AgentPool, 每个 worker 进程各自持有一份
+    """
+
+    def __init__(self):
+        self.pools: Dict[Type[BaseAIAgent], AgentPool] = {}
+        self.size = 4
+        self.timeout = 30
+        self._lock = threading.Lock()
+
+    def init_pools(
+        self, size: int, timeout: float, agent_classes=DEFAULT_AGENT_CLASSES
+    ):
+        self.size = size
+        self.timeout = timeout
+        for agent_class in agent_classes:
+            pool = self.get_pool(agent_class)
+            try:
+                pool.warm_up()
+            except Exception as e:
+                # 构建失败(如 HttpApiAgent 依赖的 openapi 文件不存在)不影响服务启动,
+                # 该池在首次使用时再尝试构建
+                logger.warning("warm up agent pool {} failed: {}".format(pool.name, e))
+
+    def get_pool(self, agent_class: Type[BaseAIAgent]) -> AgentPool:
+        pool = self.pools.get(agent_class)
+        if pool is None:
+            with self._lock:
+                pool = self.pools.setdefault(
+                    agent_class, AgentPool(agent_class, self.size, self.timeout)
+                )
+        return pool
+
+    def stats(self) -> Dict[str, dict]:
+        return {pool.name: pool.stats() for pool in self.pools.values()}
+
+
+agent_pool_manager = AgentPoolManager()
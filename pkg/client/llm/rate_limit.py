@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from pkg.util.metric.metric import metric_registry
+
+LLM_RATE_LIMIT_WAIT_SECONDS = "llm_rate_limit_wait_seconds"
+LLM_RATE_LIMIT_REJECTED_TOTAL = "llm_rate_limit_rejected_total"
+
+metric_registry.describe(
+    LLM_RATE_LIMIT_WAIT_SECONDS, "请求 LLM 前在限流器中等待的时间(秒)"
+)
+metric_registry.describe(
+    LLM_RATE_LIMIT_REJECTED_TOTAL, "限流器排队已满或等待过长被拒绝的请求数"
+)
+
+
+class UpstreamOverloaded(Exception):
+    """
+    限流器排队已满或需等待过久, 请求被直接拒绝
+    """
+
+
+class TokenBucket:
+    """
+    令牌桶, 按 rate(每秒)补充, 最多 capacity; 余额可以为负, 表示后续请求需等待的欠账
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        扣除 amount, 返回需要等待的秒数
+        """
+        self._refill(now)
+        # 单次超过容量的请求按容量计, 否则永远无法通过
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+    def consume(self, amount: float):
+        """
+        事后按实际用量补扣(amount 为负时退还), 不等待
+        """
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class UpstreamRateLimiter:
+    """
+    上游 LLM 限流, 同时限制每分钟请求数与每分钟 token 数, 为 0 表示不限制
+
+    api:
+        - acquire / aacquire 请求前调用, 额度不足时等待;
+          等待中的请求数达到 max_waiting 或需等待超过 max_wait 秒时抛出 UpstreamOverloaded
+        - record 请求结束后按实际 token 用量修正预估值
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_waiting: int = 32,
+        max_wait: float = 10,
+        name: str = "default",
+    ):
+        self.request_bucket = None
+        self.token_bucket = None
+        if requests_per_minute > 0:
+            self.request_bucket = TokenBucket(
+                requests_per_minute / 60, requests_per_minute
+            )
+        if tokens_per_minute > 0:
+            self.token_bucket = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.name = name
+        self.waiting = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.request_bucket is not None or self.token_bucket is not None
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self.request_bucket is not None:
+                wait = max(wait, self.request_bucket.reserve(1, now))
+            if self.token_bucket is not None:
+                wait = max(wait, self.token_bucket.reserve(tokens, now))
+            if wait <= 0:
+                return 0.0
+            if self.waiting >= self.max_waiting or wait > self.max_wait:
+                if self.request_bucket is not None:
+                    self.request_bucket.refund(1)
+                if self.token_bucket is not None:
+                    self.token_bucket.refund(tokens)
+                metric_registry.inc(LLM_RATE_LIMIT_REJECTED_TOTAL, {"model": self.name})
+                raise UpstreamOverloaded(
+                    "upstream {} overloaded: {} waiting, need to wait {:.1f}s".format(
+                        self.name, self.waiting, wait
+                    )
+                )
+            self.waiting += 1
+            return wait
+
+    def _done_waiting(self, wait: float):
+        with self._lock:
+            self.waiting -= 1
+        metric_registry.observe(LLM_RATE_LIMIT_WAIT_SECONDS, wait, {"model": self.name})
+
+    def acquire(self, tokens: int = 0):
+        if not self.enabled:
+            return
+        wait = self._reserve(tokens)
+        if wait:
+            try:
+                time.sleep(wait)
+            finally:
+                self._done_waiting(wait)
+
+    async def aacquire(self, tokens: int = 0):
+        if not self.enabled:
+            return
+        wait = self._reserve(tokens)
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._done_waiting(wait)
+
+    def record(self, tokens: int):
+        """
+        :param tokens: 实际用量与 acquire 时预估值之差
+        """
+        if self.token_bucket is not None and tokens:
+            with self._lock:
+                self.token_bucket.consume(tokens)
+
+
+_limiters: Dict[Tuple[str, str], UpstreamRateLimiter] = {}
+_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    model: str,
+    api_key: Optional[str],
+    requests_per_minute: float,
+    tokens_per_minute: float,
+    max_waiting: int,
+    max_wait: float,
+) -> UpstreamRateLimiter:
+    """
+    同一模型与 api key 的所有 agent 共用一个限流器, api key 只保存摘要
+    """
+    key_digest = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    with _lock:
+        limiter = _limiters.get((model, key_digest))
+        if limiter is None:
+            limiter = UpstreamRateLimiter(
+                requests_per_minute, tokens_per_minute, max_waiting, max_wait, model
+            )
+            _limiters[(model, key_digest)] = limiter
+        return limiter
@@ -0,0 +1,424 @@
+"""
+容错的 json 解析: 尽量修复常见格式问题, 并记录每处修复的位置
+
+支持缺少或多余的逗号、缺少的引号与括号、单引号、python 字面量(True/None、元组、集合)、
+注释与 markdown 代码块等; 无法修复时抛出 ValueError
+"""
+
+import bisect
+import re
+from typing import List, Tuple
+
+from pydantic import BaseModel, Field
+
+# 嵌套层数上限, 按层递归解析
+MAX_DEPTH = 256
+
+# 这些修复说明输入很可能不是数据而是自然语言, 调用方可据此决定是否采用修复结果
+UNCERTAIN_FIXES = {
+    "unquoted_string",
+    "missing_colon",
+    "unexpected_char",
+    "trailing_text",
+}
+
+_QUOTES = {'"': '"', "'": "'", "“": "”", "‘": "’"}
+_CLOSERS = "]})"
+_WHITESPACE = re.compile("[ \t\r\n\ufeff\xa0]*")
+_INLINE_WHITESPACE = re.compile("[ \t\r\xa0]*")
+_CODE_FENCE = re.compile(r"\A\s*```[\w-]*[ \t]*\n(.*?)\n?```\s*\Z", re.S)
+_NUMBER = re.compile(
+    r"[-+]?(?:0[xX][0-9a-fA-F]+|(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?)"
+)
+_JSON_NUMBER = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?")
+_WORD = re.compile(r"-?[^\W\d][\w$.-]*")
+_UNQUOTED_END = re.compile(r"[,\]})\n]")
+# 字符串内需要特殊处理的字符: 结束引号、反斜杠与换行
+_STRING_SPECIAL = {
+    closing: re.compile("[%s\\\\\n]" % re.escape(closing))
+    for closing in set(_QUOTES.values())
+}
+# 数字之后紧跟这些字符时才按数字处理, 否则整体作为未加引号的字符串, 如 2024-01-01
+_AFTER_NUMBER = set(",]}): \t\r\n/#")
+_LITERALS = {"true": True, "false": False, "null": None}
+_PYTHON_LITERALS = {"True": True, "False": False, "None": None}
+_JS_LITERALS = {"undefined": None, "NaN": None, "Infinity": None, "-Infinity": None}
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "'": "'",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class RepairFix(BaseModel):
+    code: str = Field(description="修复类型, 如 trailing_comma, missing_quote")
+    pos: int = Field(description="在原文中的位置(字符下标)")
+    line: int = Field(0, description="行号, 从 1 开始")
+    column: int = Field(0, description="列号, 从 1 开始")
+    message: str = Field(description="修复说明")
+
+    def __str__(self):
+        return f"line {self.line} column {self.column}: {self.message}"
+
+
+class _Parser:
+    def __init__(self, text: str, offset: int):
+        self.text = text
+        self.pos = 0
+        # 去掉代码块标记后, 与原文的偏移
+        self.offset = offset
+        self.fixes: List[RepairFix] = []
+        # 外层容器期望的结束符
+        self.closers: List[str] = []
+
+    def fix(self, code: str, message: str, pos: int = None):
+        pos = self.pos if pos is None else pos
+        self.fixes.append(RepairFix(code=code, pos=pos + self.offset, message=message))
+
+    def eof(self) -> bool:
+        return self.pos >= len(self.text)
+
+    def skip(self):
+        """
+        跳过空白与注释(//, /* */, #)
+        """
+        text = self.text
+        while True:
+            self.pos = _WHITESPACE.match(text, self.pos).end()
+            if text.startswith("//", self.pos) or text.startswith("#", self.pos):
+                end = text.find("\n", self.pos)
+                end = len(text) if end < 0 else end
+            elif text.startswith("/*", self.pos):
+                end = text.find("*/", self.pos + 2)
+                end = len(text) if end < 0 else end + 2
+            else:
+                return
+            self.fix("comment", "removed comment")
+            self.pos = end
+
+    def value(self, depth: int):
+        if depth > MAX_DEPTH:
+            raise ValueError("nesting too deep")
+        while True:
+            self.skip()
+            if self.eof():
+                self.fix("missing_value", "missing value, null used")
+                return None
+            c = self.text[self.pos]
+            if c == "{":
+                return self.object(depth)
+            if c == "[":
+                return self.array(depth, "]", [])
+            if c == "(":
+                self.fix("tuple", "tuple converted to array")
+                return self.array(depth, ")", [])
+            if c in _QUOTES:
+                return self.string()
+            if c in ",]})":
+                self.fix("missing_value", "missing value, null used")
+                return None
+            if c in "-+.0123456789":
+                number = self.number()
+                if number is not None:
+                    return number[0]
+            word = _WORD.match(self.text, self.pos)
+            if word is not None or c in "-+.0123456789":
+                return self.word()
+            self.fix("unexpected_char", f"removed unexpected character {c!r}")
+            self.pos += 1
+
+    def number(self):
+        """
+        :return: (数字,), 后面紧跟其它字符时返回 None, 由调用方按字符串处理
+        """
+        match = _NUMBER.match(self.text, self.pos)
+        if match is None:
+            return None
+        end = match.end()
+        if end < len(self.text) and self.text[end] not in _AFTER_NUMBER:
+            return None
+        raw = match.group()
+        if not _JSON_NUMBER.fullmatch(raw):
+            self.fix("number", f"normalized number {raw}")
+        self.pos = end
+        if raw.lstrip("+-")[:2] in ("0x", "0X"):
+            return (int(raw, 16),)
+        if "." in raw or "e" in raw or "E" in raw:
+            return (float(raw),)
+        return (int(raw),)
+
+    def word(self):
+        start = self.pos
+        match = _WORD.match(self.text, self.pos)
+        word = match.group() if match else ""
+        end = match.end() if match else start
+        # 字面量须独立成词, 如 nullable 不是 null
+        if word and (end >= len(self.text) or self.text[end] in _AFTER_NUMBER):
+            if word in _LITERALS:
+                self.pos = end
+                return _LITERALS[word]
+            if word in _PYTHON_LITERALS:
+                self.fix("python_literal", f"python literal {word} converted")
+                self.pos = end
+                return _PYTHON_LITERALS[word]
+            if word in _JS_LITERALS:
+                self.fix("js_literal", f"{word} converted to null")
+                self.pos = end
+                return None
+        match = _UNQUOTED_END.search(self.text, start)
+        end = len(self.text) if match is None else match.start()
+        value = self.text[start:end].rstrip()
+        self.fix("unquoted_string", "added missing quotes around string", start)
+        self.pos = start + len(value)
+        return value
+
+    def key(self, depth: int):
+        """
+        对象的键: 引号字符串、未加引号的标识符, 或 python 字典中的数字等
+        """
+        c = self.text[self.pos]
+        if c in _QUOTES:
+            return self.string(key=True)
+        match = _WORD.match(self.text, self.pos)
+        if match is not None and match.group() not in _PYTHON_LITERALS:
+            self.fix("unquoted_key", f"added missing quotes around key {match.group()}")
+            self.pos = match.end()
+            return match.group()
+        return self.value(depth)
+
+    def string(self, key: bool = False) -> str:
+        text = self.text
+        start = self.pos
+        quote = text[start]
+        closing = _QUOTES[quote]
+        if quote != '"':
+            self.fix("quote", f"replaced {quote}{closing} quotes with double quotes")
+        special = _STRING_SPECIAL[closing]
+        parts = []
+        # 最近一个按未转义处理的引号: (位置, parts 长度, fixes 长度)
+        inner = None
+        i = start + 1
+        while True:
+            match = special.search(text, i)
+            if match is None or match.group() == "\n":
+                # 缺少结束引号, 到行尾为止, 末尾的逗号与括号仍作为结构符
+                end = len(text) if match is None else match.start()
+                tail = end
+                while tail > i and text[tail - 1] in " \t\r,]}":
+                    tail -= 1
+                parts.append(text[i:tail])
+                self.fix("missing_quote", "added missing closing quote", tail)
+                self.pos = tail
+                return "".join(parts)
+            parts.append(text[i : match.start()])
+            if match.group() == "\\":
+                i = self.escape(match.start(), parts)
+                continue
+            after = _INLINE_WHITESPACE.match(text, match.end()).end()
+            if after < len(text) and text[after] == ":" and not key and inner:
+                # 值后面跟着冒号, 说明之前的引号其实是下一个键的开始, 值缺少结束引号
+                return self.unterminated(inner, parts)
+            # 隔着空白的下一个引号视为缺少逗号的下一个字符串, 紧挨着的视为内容
+            if (
+                after >= len(text)
+                or text[after] in ",:]})\n"
+                or (text[after] in _QUOTES and after > match.end())
+            ):
+                self.pos = match.end()
+                return "".join(parts)
+            # 后面不是结构符, 视为字符串内未转义的引号
+            inner = (match.start(), len(parts), len(self.fixes))
+            self.fix("unescaped_quote", "escaped quote inside string", match.start())
+            parts.append(match.group())
+            i = match.end()
+
+    def unterminated(self, inner: tuple, parts: List[str]) -> str:
+        quote_pos, count, fix_count = inner
+        del self.fixes[fix_count:]
+        value = "".join(parts[:count])
+        # 去掉末尾的空白与逗号, 逗号仍作为分隔符解析
+        content = value.rstrip(" \t")
+        if content.endswith(","):
+            content = content[:-1].rstrip(" \t")
+        self.pos = quote_pos - (len(value) - len(content))
+        self.fix("missing_quote", "added missing closing quote")
+        return content
+
+    def escape(self, pos: int, parts: List[str]) -> int:
+        """
+        :return: 转义序列之后的位置
+        """
+        text = self.text
+        c = text[pos + 1 : pos + 2]
+        if c in _ESCAPES and c:
+            parts.append(_ESCAPES[c])
+            return pos + 2
+        if c == "\n":
+            # python 的续行
+            return pos + 2
+        size = {"u": 4, "x": 2}.get(c)
+        digits = text[pos + 2 : pos + 2 + size] if size else ""
+        if (
+            size
+            and len(digits) == size
+            and all(d in "0123456789abcdefABCDEF" for d in digits)
+        ):
+            code = int(digits, 16)
+            end = pos + 2 + size
+            # 代理对
+            if 0xD800 <= code < 0xDC00 and text[end : end + 2] == "\\u":
+                low = text[end + 2 : end + 6]
+                if len(low) == 4 and 0xDC00 <= int(low, 16) < 0xE000:
+                    code = 0x10000 + ((code - 0xD800) << 10) + int(low, 16) - 0xDC00
+                    end += 6
+            parts.append(chr(code))
+            return end
+        self.fix("invalid_escape", f"kept invalid escape \\{c} as text", pos)
+        parts.append("\\")
+        return pos + 1
+
+    def after_element(self):
+        """
+        元素之后: 跳过逗号, 检查多余或缺少的逗号
+        """
+        self.skip()
+        if self.eof():
+            return
+        c = self.text[self.pos]
+        if c == ",":
+            comma = self.pos
+            self.pos += 1
+            self.skip()
+            if not self.eof() and self.text[self.pos] in _CLOSERS:
+                self.fix("trailing_comma", "removed trailing comma", comma)
+        elif c not in _CLOSERS:
+            self.fix("missing_comma", "added missing comma")
+
+    def close(self, closer: str) -> bool:
+        """
+        遇到结束符或输入结束时返回 True; 结束符不匹配时按外层容器的需要处理
+        """
+        self.skip()
+        if self.eof():
+            self.fix("missing_bracket", f"added missing {closer}")
+            return True
+        c = self.text[self.pos]
+        if c == closer:
+            self.pos += 1
+            return True
+        if c not in _CLOSERS:
+            return False
+        if c in self.closers[:-1]:
+            # 属于外层容器, 当前容器缺少结束符
+            self.fix("missing_bracket", f"added missing {closer}")
+        else:
+            self.fix("mismatched_bracket", f"replaced {c} with {closer}")
+            self.pos += 1
+        return True
+
+    def array(self, depth: int, closer: str, items: list) -> list:
+        """
+        :param items: 非空时为集合转换而来, 当前位于第一个元素之后
+        """
+        if items:
+            self.after_element()
+        else:
+            self.pos += 1
+        self.closers.append(closer)
+        while not self.close(closer):
+            if self.text[self.pos] == ",":
+                self.fix("extra_comma", "removed extra comma")
+                self.pos += 1
+                continue
+            items.append(self.value(depth + 1))
+            self.after_element()
+        self.closers.pop()
+        return items
+
+    def object(self, depth: int):
+        self.pos += 1
+        result = {}
+        self.closers.append("}")
+        while not self.close("}"):
+            if self.text[self.pos] == ",":
+                self.fix("extra_comma", "removed extra comma")
+                self.pos += 1
+                continue
+            key_pos = self.pos
+            key = self.key(depth + 1)
+            self.skip()
+            c = self.text[self.pos : self.pos + 1]
+            if not result and c in (",", "}"):
+                # python 集合
+                self.fix("set", "set converted to array", key_pos)
+                self.closers.pop()
+                return self.array(depth, "}", [key])
+            if c == ":":
+                self.pos += 1
+            elif c == "=":
+                self.fix("missing_colon", "replaced = with :")
+                self.pos += 1
+            else:
+                self.fix("missing_colon", "added missing colon")
+            if not isinstance(key, str):
+                self.fix("key", f"key {key!r} converted to string", key_pos)
+                key = _key_text(key)
+            result[key] = self.value(depth + 1)
+            self.after_element()
+        self.closers.pop()
+        return result
+
+
+def _key_text(key) -> str:
+    if key is None:
+        return "null"
+    if isinstance(key, bool):
+        return "true" if key else "false"
+    return str(key)
+
+
+def repair_json(text: str) -> Tuple[object, List[RepairFix]]:
+    """
+    :return: (解析结果, 修复列表), 修复列表为空时输入本身即合法
+    """
+    offset = 0
+    fixes = []
+    fence = _CODE_FENCE.match(text)
+    if fence is not None:
+        offset = fence.start(1)
+        fixes.append(RepairFix(code="code_fence", pos=0, message="removed code fence"))
+        text = fence.group(1)
+    if not text.strip():
+        raise ValueError("empty input")
+
+    parser = _Parser(text, offset)
+    value = parser.value(0)
+    parser.skip()
+    if not parser.eof():
+        parser.fix("trailing_text", "ignored trailing text")
+    fixes.extend(parser.fixes)
+
+    source = text if fence is None else fence.string
+    newlines = [m.start() for m in re.finditer("\n", source)]
+    for fix in fixes:
+        line = bisect.bisect_left(newlines, fix.pos)
+        fix.line = line + 1
+        fix.column = fix.pos - (newlines[line - 1] + 1 if line else 0) + 1
+    return value, fixes
+
+
+def is_confident(fixes: List[RepairFix]) -> bool:
+    return not any(fix.code in UNCERTAIN_FIXES for fix in fixes)
+
+
+def format_fixes(fixes: List[RepairFix], limit: int = 20) -> str:
+    lines = [str(fix) for fix in fixes[:limit]]
+    if len(fixes) > limit:
+        lines.append(f"... {len(fixes) - limit} more")
+    return "\n".join(lines)
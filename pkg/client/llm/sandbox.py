@@ -0,0 +1,300 @@
+import asyncio
+import concurrent.futures
+import importlib
+import math
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Sequence, TypeVar
+
+from pkg.util.log.log import logger
+from pkg.util.metric.metric import metric_registry
+
+try:
+    import resource
+except ImportError:  # 非 Unix 平台只有超时与输入大小限制
+    resource = None
+
+SANDBOX_TASKS_TOTAL = "sandbox_tasks_total"
+
+metric_registry.describe(
+    SANDBOX_TASKS_TOTAL,
+    "沙箱任务数, result 为 ok、error、timeout、crashed 或 too_large",
+)
+
+T = TypeVar("T")
+
+
+class SandboxError(Exception):
+    """
+    沙箱任务未能完成: 超时、超出资源限制导致进程退出
+    """
+
+
+class SandboxTimeout(SandboxError):
+    pass
+
+
+class SandboxInputTooLarge(SandboxError):
+    pass
+
+
+def _init_worker(preload: Sequence[str]):
+    for module in preload:
+        importlib.import_module(module)
+
+
+def _vm_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _set_soft_limit(kind: int, value: int):
+    _, hard = resource.getrlimit(kind)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    resource.setrlimit(kind, (value, hard))
+
+
+def _call(cpu_seconds: float, memory_bytes: int, func: Callable, args: tuple):
+    """
+    在子进程中执行, 限制以当前用量为基准, 只约束本次任务:
+    CPU 超限时进程收到 SIGXCPU 退出, 内存超限时分配失败抛出 MemoryError
+    """
+    if resource is not None:
+        if cpu_seconds:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = usage.ru_utime + usage.ru_stime
+            _set_soft_limit(resource.RLIMIT_CPU, math.ceil(used + cpu_seconds))
+        vm_bytes = _vm_bytes()
+        if memory_bytes and vm_bytes is not None:
+            _set_soft_limit(resource.RLIMIT_AS, vm_bytes + memory_bytes)
+    return func(*args)
+
+
+def _ping():
+    return os.getpid()
+
+
+class _Task:
+    def __init__(self, func: Callable, args: tuple):
+        self.func = func
+        self.args = args
+        self.future = concurrent.futures.Future()
+
+
+class Sandbox:
+    """
+    在独立进程中执行不可信输入的解析与格式化, 避免深层嵌套或超大字面量
+    占满请求线程、递归过深导致 worker 进程崩溃
+
+    每个子进程由一个调度线程独占, 从共享队列中取任务; 每个任务受 timeout(墙钟, 从子进程
+    开始执行时计时, 不含排队时间)、cpu_seconds、memory_bytes 限制, 输入超过 max_input_chars
+    直接拒绝; 超时或崩溃时只结束并替换执行该任务的子进程, 其他任务不受影响, 以 SandboxError 返回
+    workers 为 0 时在当前线程执行, 只检查输入大小
+
+    func 与参数、返回值需可序列化, func 需定义在模块顶层
+    """
+
+    def __init__(
+        self,
+        workers: int = 0,
+        timeout: float = 5,
+        cpu_seconds: float = 5,
+        memory_bytes: int = 512 * 1024 * 1024,
+        max_input_chars: int = 1000000,
+        preload: Sequence[str] = (),
+    ):
+        self._tasks: "queue.Queue[Optional[_Task]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._ready: List[threading.Event] = []
+        self._lock = threading.Lock()
+        self.configure(workers, timeout, cpu_seconds, memory_bytes, max_input_chars)
+        self.preload = tuple(preload)
+
+    def configure(
+        self,
+        workers: int,
+        timeout: float,
+        cpu_seconds: float,
+        memory_bytes: int,
+        max_input_chars: int,
+    ):
+        self.shutdown()
+        self.workers = workers
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.max_input_chars = max_input_chars
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: 请求处理进程中有多个线程, fork 可能复制持有中的锁
+        executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.preload,),
+        )
+        # 启动子进程并完成预加载后再接任务, 启动开销不计入任务的超时
+        executor.submit(_ping).result()
+        return executor
+
+    @staticmethod
+    def _kill(executor: ProcessPoolExecutor):
+        # 正在执行的任务无法取消, 只能结束子进程
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                ready = threading.Event()
+                thread = threading.Thread(
+                    target=self._serve,
+                    args=(ready,),
+                    name="sandbox-{}".format(index),
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+                self._ready.append(ready)
+
+    def _start_executor(self) -> Optional[ProcessPoolExecutor]:
+        try:
+            return self._new_executor()
+        except Exception as e:
+            logger.warning("start sandbox worker failed: {}".format(e))
+            return None
+
+    def _serve(self, ready: threading.Event):
+        """
+        调度线程: 独占一个单进程执行器, 逐个执行队列中的任务;
+        子进程被结束后先启动新的子进程, 再取下一个任务
+        """
+        executor = None
+        while True:
+            if executor is None:
+                executor = self._start_executor()
+            ready.set()
+            task = self._tasks.get()
+            if task is None:
+                if executor is not None:
+                    executor.shutdown(wait=True)
+                return
+            if not task.future.set_running_or_notify_cancel():
+                continue
+            if executor is None:
+                metric_registry.inc(SANDBOX_TASKS_TOTAL, {"result": "crashed"})
+                task.future.set_exception(
+                    SandboxError("sandbox worker failed to start")
+                )
+                continue
+            try:
+                result = executor.submit(
+                    _call, self.cpu_seconds, self.memory_bytes, task.func, task.args
+                ).result(timeout=self.timeout)
+            except concurrent.futures.TimeoutError:
+                self._kill(executor)
+                executor = None
+                metric_registry.inc(SANDBOX_TASKS_TOTAL, {"result": "timeout"})
+                task.future.set_exception(
+                    SandboxTimeout(
+                        "sandbox task timed out after {}s".format(self.timeout)
+                    )
+                )
+            except BrokenProcessPool:
+                executor.shutdown(wait=False)
+                executor = None
+                metric_registry.inc(SANDBOX_TASKS_TOTAL, {"result": "crashed"})
+                task.future.set_exception(
+                    SandboxError("sandbox worker exited, resource limit exceeded")
+                )
+            except Exception as e:
+                metric_registry.inc(SANDBOX_TASKS_TOTAL, {"result": "error"})
+                task.future.set_exception(e)
+            else:
+                metric_registry.inc(SANDBOX_TASKS_TOTAL, {"result": "ok"})
+                task.future.set_result(result)
+
+    def warm_up(self, wait: bool = True):
+        """
+        启动全部子进程并完成预加载, 避免首个任务承担启动开销
+        """
+        if not self.workers:
+            return
+        self._ensure_started()
+        if wait:
+            for ready in self._ready:
+                ready.wait()
+
+    def shutdown(self):
+        with self._lock:
+            threads, self._threads, self._ready = self._threads, [], []
+        if not threads:
+            return
+        # 未开始的任务直接失败, 正在执行的任务完成后调度线程退出
+        while True:
+            try:
+                task = self._tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is not None and task.future.set_running_or_notify_cancel():
+                task.future.set_exception(SandboxError("sandbox shut down"))
+        for _ in threads:
+            self._tasks.put(None)
+        for thread in threads:
+            # 等待执行器退出, 避免进程退出时向已关闭的管道写入
+            thread.join()
+
+    def _check_input(self, text: str):
+        if self.max_input_chars and len(text) > self.max_input_chars:
+            metric_registry.inc(SANDBOX_TASKS_TOTAL, {"result": "too_large"})
+            raise SandboxInputTooLarge(
+                "input too large: {} chars, limit {}".format(
+                    len(text), self.max_input_chars
+                )
+            )
+
+    def _submit(self, func: Callable, args: tuple) -> concurrent.futures.Future:
+        self._ensure_started()
+        task = _Task(func, args)
+        self._tasks.put(task)
+        return task.future
+
+    def run(self, func: Callable[..., T], text: str, *args) -> T:
+        """
+        执行 func(text, *args), text 为需检查大小的不可信输入
+        """
+        self._check_input(text)
+        if not self.workers:
+            return self._record(func, (text, *args))
+        return self._submit(func, (text, *args)).result()
+
+    async def arun(self, func: Callable[..., T], text: str, *args) -> T:
+        self._check_input(text)
+        if not self.workers:
+            return self._record(func, (text, *args))
+        return await asyncio.wrap_future(self._submit(func, (text, *args)))
+
+    @staticmethod
+    def _record(func: Callable[..., T], args: tuple) -> T:
+        try:
+            result = func(*args)
+        except Exception:
+            metric_registry.inc(SANDBOX_TASKS_TOTAL, {"result": "error"})
+            raise
+        metric_registry.inc(SANDBOX_TASKS_TOTAL, {"result": "ok"})
+        return result
+
+
+# 解析与格式化所需模块在子进程启动时预先导入
+sandbox = Sandbox(preload=("pkg.client.llm.tool",))
@@ -0,0 +1,105 @@
+import json
+import os
+import time
+
+import pytest
+
+from pkg.client.llm import artifact as artifact_module
+from pkg.client.llm.artifact import Artifact, ArtifactStore, start_collecting
+from pkg.client.llm.tool import pretty_print_python_object
+from pkg.client.llm.util import ToolUtils
+
+
+def test_put_and_open(tmp_path):
+    store = ArtifactStore(str(tmp_path), threshold=10)
+    text = "值" * (artifact_module.READ_CHUNK_SIZE + 10)
+    artifact = store.put(text)
+    assert artifact.size == len(text)
+    assert artifact.preview == text[: ArtifactStore.PREVIEW_SIZE]
+    chunks = list(store.open(artifact.id))
+    assert len(chunks) == 2
+    assert "".join(chunks) == text
+    assert store.read(artifact.id) == text
+
+
+def test_threshold(tmp_path):
+    assert not ArtifactStore(str(tmp_path)).should_offload("x" * 100000)
+    store = ArtifactStore(str(tmp_path), threshold=10)
+    assert not store.should_offload("x" * 9)
+    assert store.should_offload("x" * 10)
+
+
+@pytest.mark.parametrize("artifact_id", ["../secret", "A" * 32, "0" * 31, ""])
+def test_open_invalid_id(tmp_path, artifact_id):
+    assert ArtifactStore(str(tmp_path)).open(artifact_id) is None
+
+
+def test_ttl(tmp_path):
+    store = ArtifactStore(str(tmp_path), threshold=10, ttl=60)
+    artifact = store.put("hello")
+    path = store._file(artifact.id)
+    past = time.time() - 120
+    os.utime(path, (past, past))
+    assert store.open(artifact.id) is None
+    assert not os.path.exists(path)
+
+
+def test_purge_evicts_oldest(tmp_path):
+    store = ArtifactStore(str(tmp_path), threshold=10, max_bytes=25)
+    artifacts = [store.put("x" * 10) for _ in range(3)]
+    for offset, artifact in enumerate(artifacts):
+        mtime = time.time() - 10 + offset
+        os.utime(store._file(artifact.id), (mtime, mtime))
+    store.purge()
+    assert store.open(artifacts[0].id) is None
+    assert store.read(artifacts[1].id) == "x" * 10
+    assert store.read(artifacts[2].id) == "x" * 10
+
+
+def test_tool_result_offload(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path), threshold=10)
+    monkeypatch.setattr(artifact_module, "artifact_store", store)
+    artifacts = start_collecting()
+
+    assert ToolUtils.tool_result_with_artifact("处理完成", "short") == (
+        "处理完成",
+        "short",
+    )
+    content, stored = ToolUtils.tool_result_with_artifact("处理完成", "x" * 20)
+    assert isinstance(stored, Artifact)
+    assert stored.id in content and "x" not in content
+    assert artifacts == [stored]
+    assert store.read(stored.id) == "x" * 20
+
+    assert ToolUtils.tool_result_with_artifact(
+        "请处理", "x" * 20, offloadable=False
+    ) == ("请处理", "x" * 20)
+    assert len(artifacts) == 1
+
+
+def test_offload_chunks(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path), threshold=10)
+    monkeypatch.setattr(artifact_module, "artifact_store", store)
+    artifacts = start_collecting()
+
+    assert artifact_module.offload_chunks(iter(["abc", "def"])) == "abcdef"
+    stored = artifact_module.offload_chunks(iter(["x" * 6] * 5))
+    assert isinstance(stored, Artifact) and artifacts == [stored]
+    assert store.read(stored.id) == "x" * 30
+
+    def failing():
+        yield "x" * 20
+        raise ValueError("bad json")
+
+    with pytest.raises(ValueError):
+        artifact_module.offload_chunks(failing())
+    assert sorted(os.listdir(tmp_path)) == [stored.id + ".txt"]
+
+
+def test_tool_streams_json_text_into_artifact(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path), threshold=100)
+    monkeypatch.setattr(artifact_module, "artifact_store", store)
+    obj = json.dumps({"items": list(range(200))})
+    content, stored = pretty_print_python_object(obj, "json_text", "json")
+    assert isinstance(stored, Artifact) and stored.id in content
+    assert store.read(stored.id) == json.dumps(json.loads(obj), indent=4)
@@ -0,0 +1,41 @@
+import pytest
+
+from pkg.client.llm.benchmark import MODES, make_agent, run_benchmark
+from pkg.client.llm.sandbox import sandbox
+
+
+@pytest.fixture
+def lisco_agent():
+    return make_agent("LiscoAgent")
+
+
+def test_scripted_agent_calls_tool(lisco_agent):
+    chunks = list(lisco_agent.stream({"input": "x"}))
+    [step] = [step for chunk in chunks for step in chunk.get("steps", [])]
+    assert step.action.tool == "pretty_print_python_object"
+    assert chunks[-1]["output"].startswith("{")
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_run_benchmark(lisco_agent, mode):
+    result = run_benchmark(lisco_agent, mode, requests=3, concurrency=2, warmup=1)
+    assert result["mode"] == mode
+    assert result["throughput"] > 0
+    assert result["cpu_ms_per_request"] > 0
+    assert "retained_blocks_per_request" in result
+
+
+def test_invalid_mode(lisco_agent):
+    with pytest.raises(ValueError):
+        run_benchmark(lisco_agent, "batch")
+
+
+def test_sandbox_inline_during_benchmark(lisco_agent, monkeypatch):
+    def submit(func, args):
+        raise AssertionError("tool should run in-process")
+
+    monkeypatch.setattr(sandbox, "workers", 2)
+    monkeypatch.setattr(sandbox, "_submit", submit)
+    run_benchmark(lisco_agent, "sync", requests=2, warmup=0, trace_allocations=False)
+    # 结束后恢复原配置
+    assert sandbox.workers == 2
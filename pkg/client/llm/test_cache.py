@@ -0,0 +1,76 @@
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from pkg.client.llm.cache import (
+    SQLiteLLMStore,
+    TieredLLMCache,
+    get_llm_cache,
+    llm_cache_bypass,
+)
+from pkg.util.config.config import LLM
+from pkg.util.cache.cache import LRUTTLCache
+
+
+class CountingChatModel(GenericFakeChatModel):
+    calls: int = 0
+
+    def _generate(self, *args, **kwargs):
+        self.calls += 1
+        return super()._generate(*args, **kwargs)
+
+
+def make_model(cache, answers=("first", "second", "third")):
+    return CountingChatModel(
+        messages=iter(AIMessage(content=answer) for answer in answers), cache=cache
+    )
+
+
+def test_memory_hit(tmp_path):
+    cache = TieredLLMCache(LRUTTLCache(10, 60), SQLiteLLMStore(str(tmp_path / "c.db")))
+    model = make_model(cache)
+    assert model.invoke("hi").content == "first"
+    assert model.invoke("hi").content == "first"
+    assert model.invoke("other").content == "second"
+    assert model.calls == 2
+
+
+def test_disk_survives_restart(tmp_path):
+    path = str(tmp_path / "c.db")
+    make_model(TieredLLMCache(LRUTTLCache(10, 60), SQLiteLLMStore(path))).invoke("hi")
+
+    model = make_model(TieredLLMCache(LRUTTLCache(10, 60), SQLiteLLMStore(path)))
+    assert model.invoke("hi").content == "first"
+    assert model.calls == 0
+    assert model.cache.memory.stats()["size"] == 1
+
+
+def test_default_is_memory_only():
+    path = LLM(api_key="", base_url="", model="", app_code=None).cache_path
+    cache = get_llm_cache("test_default_is_memory_only", 60, 10, path)
+    assert cache.store is None
+
+
+def test_ttl_zero_disables_cache():
+    model = make_model(TieredLLMCache(LRUTTLCache(10), ttl=0))
+    model.invoke("hi")
+    assert model.invoke("hi").content == "second"
+
+
+def test_bypass_refreshes_entry():
+    model = make_model(TieredLLMCache(LRUTTLCache(10)))
+    model.invoke("hi")
+    token = llm_cache_bypass.set(True)
+    try:
+        assert model.invoke("hi").content == "second"
+    finally:
+        llm_cache_bypass.reset(token)
+    assert model.invoke("hi").content == "second"
+    assert model.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_async_lookup(tmp_path):
+    model = make_model(TieredLLMCache(LRUTTLCache(10)))
+    assert (await model.ainvoke("hi")).content == "first"
+    assert (await model.ainvoke("hi")).content == "first"
@@ -0,0 +1,80 @@
+import pytest
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from pkg.client.llm.callback import AgentMetricsCallbackHandler
+from pkg.client.llm.tool import pretty_print_python_object_tool
+from pkg.util.metric.metric import MetricRegistry
+
+
+class ToolCallingFakeChatModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+TOOL_CALL = {
+    "name": "pretty_print_python_object",
+    "args": {"obj": "[1]", "input_format": "json_text", "output_format": "json"},
+    "id": "call_1",
+}
+USAGE = {"input_tokens": 12, "output_tokens": 3, "total_tokens": 15}
+TOOL_CALLING_MESSAGES = [
+    AIMessage(content="", tool_calls=[TOOL_CALL]),
+    AIMessage(content="done", usage_metadata=USAGE),
+]
+
+
+def make_executor(registry, messages=TOOL_CALLING_MESSAGES):
+    llm = ToolCallingFakeChatModel(messages=iter(messages))
+    prompt = ChatPromptTemplate.from_messages(
+        [("human", "{input}"), ("placeholder", "{agent_scratchpad}")]
+    )
+    tools = [pretty_print_python_object_tool]
+    agent = create_tool_calling_agent(llm, tools, prompt)
+    handler = AgentMetricsCallbackHandler("FakeAgent", registry)
+    return AgentExecutor(agent=agent, tools=tools, stream_runnable=False).with_config(
+        callbacks=[handler]
+    )
+
+
+def histogram(registry, name):
+    return registry.to_json()["histograms"][name]
+
+
+def assert_recorded(registry):
+    assert histogram(registry, "agent_run_duration_seconds")[0]["count"] == 1
+    assert histogram(registry, "agent_iterations")[0]["sum"] == 1
+    assert histogram(registry, "agent_llm_duration_seconds")[0]["count"] == 2
+    tool = histogram(registry, "agent_tool_duration_seconds")[0]
+    assert tool["labels"] == {
+        "agent": "FakeAgent",
+        "tool": "pretty_print_python_object",
+    }
+    tokens = {
+        item["labels"]["type"]: item["value"]
+        for item in registry.to_json()["counters"]["agent_llm_tokens_total"]
+    }
+    assert tokens == {"prompt": 12, "completion": 3}
+
+
+def test_invoke_records_metrics():
+    registry = MetricRegistry()
+    assert make_executor(registry).invoke({"input": "x"})["output"] == "done"
+    assert_recorded(registry)
+    assert (
+        "agent_llm_time_to_first_token_seconds" not in registry.to_json()["histograms"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_astream_events_records_time_to_first_token():
+    # 流式输出时 fake 模型不会带上 tool_calls, 只验证最终回答
+    registry = MetricRegistry()
+    executor = make_executor(registry, [AIMessage(content="streamed answer")])
+    async for _ in executor.astream_events({"input": "x"}, version="v2"):
+        pass
+    assert histogram(registry, "agent_iterations")[0]["sum"] == 0
+    ttft = histogram(registry, "agent_llm_time_to_first_token_seconds")
+    assert ttft[0]["count"] == 1
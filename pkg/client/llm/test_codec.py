@@ -0,0 +1,24 @@
+import json
+
+import pytest
+
+from pkg.client.llm import codec
+
+OBJ = {
+    "a": [1, 2.5, {"b": None, "c": [], "d": {}}],
+    "é": "x\ny",
+    "s": "two  spaces",
+    "t": True,
+}
+
+
+@pytest.mark.parametrize("obj", [OBJ, {"a": [1, {"b": 2}]}, [], "a", 1])
+def test_dumps(obj):
+    assert codec.dumps(obj).decode() == json.dumps(obj, indent=4, ensure_ascii=False)
+
+
+def test_loads():
+    assert codec.loads(json.dumps(OBJ).encode()) == OBJ
+    for data in (b'{"a": 1,', b"[1e400]", b"[12345678901234567890]"):
+        with pytest.raises(ValueError):
+            codec.loads(data)
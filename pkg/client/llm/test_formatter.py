@@ -0,0 +1,108 @@
+import ast
+import json
+import xml.dom.minidom
+
+import pytest
+import yaml
+
+from pkg.client.llm.formatter import (
+    MAX_DEPTH,
+    format_events,
+    iter_chunks,
+    iter_json_events,
+    iter_object_events,
+)
+
+OBJ = {
+    "id": 1,
+    "name": "lisco",
+    "ratio": 1e300,
+    "enable": True,
+    "owner": None,
+    "tags": ["a b", "yes", "- x", "多行\n文本", 'q"uote\\'],
+    "nested": {"empty": {}, "list": [], "x.y": [[1, 2], {"k": -0.5}]},
+    "1": "# comment",
+}
+
+
+def render(obj, output_format, chunk_size=5):
+    text = json.dumps(obj, ensure_ascii=False)
+    events = iter_json_events(iter_chunks(text, chunk_size))
+    return "".join(format_events(events, output_format))
+
+
+def render_text(text, output_format="json"):
+    return "".join(format_events(iter_json_events(iter_chunks(text, 3)), output_format))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1024])
+def test_json_events_independent_of_chunk_size(chunk_size):
+    text = json.dumps(OBJ, indent=2)
+    expected = list(iter_json_events([text]))
+    assert list(iter_json_events(iter_chunks(text, chunk_size))) == expected
+
+
+def test_json_matches_json_dumps():
+    assert render(OBJ, "json") == json.dumps(OBJ, indent=4, ensure_ascii=False)
+
+
+def test_json_keeps_number_text():
+    assert (
+        render_text("[1.0E+2, 10000000000000000000001]")
+        == "[\n    1.0E+2,\n    10000000000000000000001\n]"
+    )
+
+
+def test_text():
+    assert ast.literal_eval(render(OBJ, "text")) == OBJ
+
+
+def test_yaml():
+    assert yaml.safe_load(render(OBJ, "yaml")) == OBJ
+
+
+def test_toml():
+    tomllib = pytest.importorskip("tomllib")
+    obj = {k: v for k, v in OBJ.items() if v is not None}
+    assert tomllib.loads(render(obj, "toml")) == obj
+    with pytest.raises(ValueError):
+        render(OBJ, "toml")
+    with pytest.raises(ValueError):
+        render([1], "toml")
+
+
+def test_xml():
+    document = xml.dom.minidom.parseString(render(OBJ, "xml").encode("utf-8"))
+    assert document.documentElement.tagName == "root"
+    assert document.getElementsByTagName("name")[0].firstChild.data == "lisco"
+
+
+def test_markdown():
+    assert render({"a": [1, {"b": []}], "c": "*x*"}, "markdown") == (
+        "- **a**\n  - 1\n  - **[1]**\n    - **b**: `[]`\n- **c**: \\*x\\*\n"
+    )
+
+
+def test_object_events_same_as_json_events():
+    text = json.dumps(OBJ)
+    expected = [event[:2] for event in iter_json_events([text])]
+    assert [event[:2] for event in iter_object_events(OBJ)] == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["", "[1,]", '{"a" 1}', "[1 2]", '{"a": 1}}', "[tru]", '"\\x"', "[1] x", "01"],
+)
+def test_invalid_json(text):
+    with pytest.raises(ValueError):
+        list(iter_json_events(iter_chunks(text, 2)))
+
+
+def test_nesting_too_deep():
+    with pytest.raises(ValueError):
+        list(iter_json_events(["[" * (MAX_DEPTH + 1)]))
+
+
+def test_invalid_output_format():
+    with pytest.raises(ValueError):
+        list(format_events(iter_object_events([1]), "latex"))
@@ -0,0 +1,29 @@
+import pytest
+
+from pkg.client.llm.http_client import HttpClientRegistry
+
+
+def test_clients_are_shared():
+    registry = HttpClientRegistry(max_connections=3)
+    assert registry.get_client() is registry.get_client()
+    assert registry.get_client()._transport._pool._max_connections == 3
+    registry.close()
+
+
+def test_clients_recreated_after_fork():
+    registry = HttpClientRegistry()
+    client = registry.get_client()
+    registry._pid = -1
+    assert registry.get_client() is not client
+    client.close()
+    registry.close()
+
+
+@pytest.mark.asyncio
+async def test_async_client():
+    registry = HttpClientRegistry(read_timeout=7)
+    client = registry.get_async_client()
+    assert client is registry.get_async_client()
+    assert client.timeout.read == 7
+    await registry.aclose()
+    assert client.is_closed
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+
+import pytest
+
+from pkg.client.llm import pool as pool_module
+from pkg.client.llm.pool import AgentPool, AgentPoolExhausted, AgentPoolManager
+
+
+class CountingAgent:
+    created = 0
+
+    def __init__(self):
+        CountingAgent.created += 1
+
+
+class BrokenAgent:
+    def __init__(self):
+        raise FileNotFoundError("openapi.json")
+
+
+@pytest.fixture(autouse=True)
+def reset_counter():
+    CountingAgent.created = 0
+
+
+def test_warm_up_builds_size_agents():
+    pool = AgentPool(CountingAgent, size=3)
+    pool.warm_up()
+    assert CountingAgent.created == 3
+    assert pool.stats() == {"size": 3, "created": 3, "idle": 3}
+
+
+def test_acquire_is_exclusive_and_reuses_agents():
+    pool = AgentPool(CountingAgent, size=2, timeout=0.05)
+    with pool.acquire() as first:
+        with pool.acquire() as second:
+            assert first is not second
+            with pytest.raises(AgentPoolExhausted):
+                with pool.acquire():
+                    pass
+    with pool.acquire() as agent:
+        assert agent in (first, second)
+    assert CountingAgent.created == 2
+
+
+def test_acquire_waits_for_release():
+    pool = AgentPool(CountingAgent, size=1, timeout=1)
+    with pool.acquire() as agent:
+        holder = {}
+
+        def borrow():
+            with pool.acquire() as other:
+                holder["agent"] = other
+
+        thread = threading.Thread(target=borrow)
+        thread.start()
+    thread.join()
+    assert holder["agent"] is agent
+
+
+@pytest.mark.asyncio
+async def test_aacquire():
+    pool = AgentPool(CountingAgent, size=1, timeout=0.05)
+    async with pool.aacquire() as agent:
+        with pytest.raises(AgentPoolExhausted):
+            async with pool.aacquire():
+                pass
+    async with pool.aacquire() as again:
+        assert again is agent
+
+
+def test_manager_tolerates_broken_agent():
+    manager = AgentPoolManager()
+    manager.init_pools(size=2, timeout=0.05, agent_classes=(CountingAgent, BrokenAgent))
+    assert manager.stats()["CountingAgent"]["idle"] == 2
+    assert manager.stats()["BrokenAgent"]["created"] == 0
+    with pytest.raises(FileNotFoundError):
+        with manager.get_pool(BrokenAgent).acquire():
+            pass
+    assert manager.get_pool(BrokenAgent).stats()["created"] == 0
+
+
+@pytest.mark.asyncio
+async def test_aacquire_waits_without_thread(monkeypatch):
+    pool = AgentPool(CountingAgent, size=1, timeout=1)
+    async with pool.aacquire() as agent:
+
+        async def no_thread(*args):
+            raise AssertionError("waiting must not use a thread")
+
+        monkeypatch.setattr(pool_module.to_thread, "run_sync", no_thread)
+
+        async def borrow():
+            async with pool.aacquire() as other:
+                return other
+
+        waiters = [asyncio.create_task(borrow()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert not any(waiter.done() for waiter in waiters)
+    assert await asyncio.gather(*waiters) == [agent] * 3
+    assert pool.stats() == {"size": 1, "created": 1, "idle": 1}
+
+
+@pytest.mark.asyncio
+async def test_aacquire_woken_by_sync_release():
+    pool = AgentPool(CountingAgent, size=1, timeout=1)
+    released = threading.Event()
+
+    def hold():
+        with pool.acquire():
+            released.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    while pool.stats()["created"] == 0:
+        await asyncio.sleep(0.001)
+    waiter = asyncio.create_task(pool._aget())
+    await asyncio.sleep(0.01)
+    released.set()
+    agent = await waiter
+    thread.join()
+    pool._release(agent)
+    assert pool.stats()["idle"] == 1
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+
+from pkg.client.llm.rate_limit import (
+    TokenBucket,
+    UpstreamOverloaded,
+    UpstreamRateLimiter,
+    get_rate_limiter,
+)
+
+
+def test_token_bucket_wait_and_refill():
+    bucket = TokenBucket(rate=10, capacity=10)
+    now = bucket.updated
+    assert bucket.reserve(10, now) == 0
+    assert bucket.reserve(5, now) == pytest.approx(0.5)
+    # 0.5 秒后欠账还清
+    assert bucket.reserve(0, now + 0.5) == 0
+
+
+def test_oversized_request_is_capped():
+    bucket = TokenBucket(rate=1, capacity=5)
+    assert bucket.reserve(100, bucket.updated) == 0
+    assert bucket.tokens == 0
+
+
+def test_disabled_limiter_never_waits():
+    limiter = UpstreamRateLimiter()
+    assert not limiter.enabled
+    for _ in range(1000):
+        limiter.acquire(10**6)
+
+
+def test_requests_per_minute_wait():
+    limiter = UpstreamRateLimiter(requests_per_minute=600)
+    for _ in range(600):
+        limiter.acquire()
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start == pytest.approx(0.1, abs=0.05)
+
+
+def test_reject_when_wait_too_long():
+    limiter = UpstreamRateLimiter(tokens_per_minute=60, max_wait=1)
+    limiter.acquire(60)
+    with pytest.raises(UpstreamOverloaded):
+        limiter.acquire(10)
+    # 被拒绝的请求退还额度
+    assert limiter.token_bucket.tokens == pytest.approx(0, abs=0.1)
+
+
+def test_record_adjusts_estimate():
+    limiter = UpstreamRateLimiter(tokens_per_minute=600)
+    limiter.acquire(100)
+    limiter.record(-100)
+    assert limiter.token_bucket.tokens == pytest.approx(600)
+
+
+@pytest.mark.asyncio
+async def test_reject_when_queue_full():
+    limiter = UpstreamRateLimiter(requests_per_minute=60, max_waiting=2, max_wait=5)
+    for _ in range(60):
+        await limiter.aacquire()
+    waiters = [asyncio.create_task(limiter.aacquire()) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert limiter.waiting == 2
+    with pytest.raises(UpstreamOverloaded):
+        await limiter.aacquire()
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    assert limiter.waiting == 0
+
+
+def test_limiter_shared_per_model_and_key():
+    first = get_rate_limiter("m", "key-1", 60, 0, 32, 10)
+    assert get_rate_limiter("m", "key-1", 60, 0, 32, 10) is first
+    assert get_rate_limiter("m", "key-2", 60, 0, 32, 10) is not first
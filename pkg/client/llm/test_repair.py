@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from pkg.client.llm.repair import is_confident, repair_json
+
+
+@pytest.mark.parametrize(
+    "text, expected, codes",
+    [
+        ('{"a": [1, 2,],}', {"a": [1, 2]}, ["trailing_comma", "trailing_comma"]),
+        ('{"a": 1 "b": 2}', {"a": 1, "b": 2}, ["missing_comma"]),
+        ("{a: 1}", {"a": 1}, ["unquoted_key"]),
+        ("{'a': 'it\\'s'}", {"a": "it's"}, ["quote", "quote"]),
+        ('{"a": "x\n, "b": 2}', {"a": "x", "b": 2}, ["missing_quote"]),
+        ('{"a": "x, "b": 2}', {"a": "x", "b": 2}, ["missing_quote"]),
+        ('{"a": "say "hi""}', {"a": 'say "hi"'}, ["unescaped_quote"] * 2),
+        ('[1, {"a": 2]', [1, {"a": 2}], ["missing_bracket"]),
+        ('{"a": [1', {"a": [1]}, ["missing_bracket", "missing_bracket"]),
+        ("[,1,,2]", [1, 2], ["extra_comma", "extra_comma"]),
+        ('{"a": 1, // c\n}', {"a": 1}, ["comment", "trailing_comma"]),
+        ('```json\n{"a": 1}\n```', {"a": 1}, ["code_fence"]),
+        (
+            "{'a': True, 'b': None, 'c': (1,), 'd': {2}}",
+            {"a": True, "b": None, "c": [1], "d": [2]},
+            ["quote", "python_literal", "quote", "python_literal", "quote"]
+            + ["tuple", "trailing_comma", "quote", "set"],
+        ),
+        ("{1: .5}", {"1": 0.5}, ["key", "number"]),
+    ],
+)
+def test_repair_json(text, expected, codes):
+    value, fixes = repair_json(text)
+    assert value == expected
+    assert [fix.code for fix in fixes] == codes
+
+
+def test_valid_json_needs_no_fix():
+    text = json.dumps({"a": [1, 2.5, None, True], "b": {"c": 'q"\\'}}, indent=2)
+    assert repair_json(text) == (json.loads(text), [])
+
+
+def test_fix_location():
+    _, [fix] = repair_json('{\n  "a": 1,\n  "b": 2,\n}')
+    assert (fix.line, fix.column) == (3, 9)
+    assert str(fix) == "line 3 column 9: removed trailing comma"
+
+
+def test_natural_language_not_confident():
+    _, fixes = repair_json("{ please format this }")
+    assert not is_confident(fixes)
+
+
+@pytest.mark.parametrize("text", ["", "  ", "[" * 1000])
+def test_unrecoverable(text):
+    with pytest.raises(ValueError):
+        repair_json(text)
@@ -0,0 +1,101 @@
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from pkg.client.llm.llm import (
+    LLM_BACKEND_FAILOVER_TOTAL,
+    ModelRouter,
+    RoutedChatOpenAI,
+)
+from pkg.client.llm.rate_limit import UpstreamOverloaded
+from pkg.util.metric.metric import metric_registry
+
+
+class FailingChatModel(GenericFakeChatModel):
+    def _generate(self, *args, **kwargs):
+        raise RuntimeError("upstream error")
+
+
+class OverloadedChatModel(GenericFakeChatModel):
+    def _generate(self, *args, **kwargs):
+        raise UpstreamOverloaded("local rate limit")
+
+
+def failovers(model):
+    series = metric_registry.to_json()["counters"].get(LLM_BACKEND_FAILOVER_TOTAL, [])
+    return sum(s["value"] for s in series if s["labels"] == {"model": model})
+
+
+def make_llm(backends, router):
+    llm = RoutedChatOpenAI(api_key="x", model="qwen-plus")
+    llm.set_backends(backends, router)
+    return llm
+
+
+def test_candidates_prefer_untried_then_fastest():
+    router = ModelRouter()
+    router.EXPLORE_RATIO = 0
+    router.record_success("slow", 2.0)
+    router.record_success("fast", 0.5)
+    assert router.candidates(["slow", "fast", "new"]) == ["new", "fast", "slow"]
+
+
+def test_circuit_opens_after_consecutive_failures():
+    router = ModelRouter()
+    router.EXPLORE_RATIO = 0
+    router.record_success("a", 0.1)
+    router.record_success("b", 1.0)
+    for _ in range(router.FAILURE_THRESHOLD):
+        router.record_failure("a")
+    assert router.candidates(["a", "b"]) == ["b", "a"]
+    assert router.snapshot()["a"]["healthy"] is False
+
+    router.stats["a"].open_until = 0
+    router.record_success("a", 0.1)
+    assert router.snapshot()["a"]["healthy"] is True
+
+
+def test_fails_over_to_next_backend():
+    router = ModelRouter()
+    router.EXPLORE_RATIO = 0
+    router.record_success("broken", 0.1)
+    router.record_success("ok", 1.0)
+    backends = {
+        "broken": FailingChatModel(messages=iter([])),
+        "ok": GenericFakeChatModel(messages=iter([AIMessage(content="done")])),
+    }
+    result = make_llm(backends, router).invoke([HumanMessage(content="x")])
+    assert result.content == "done"
+    assert router.snapshot()["broken"]["errors"] == 1
+    assert router.snapshot()["ok"]["calls"] == 2
+
+
+def test_raises_when_all_backends_fail():
+    router = ModelRouter()
+    backends = {"a": FailingChatModel(messages=iter([]))}
+    with pytest.raises(RuntimeError):
+        make_llm(backends, router).invoke([HumanMessage(content="x")])
+
+
+def test_local_overload_is_not_a_backend_failure():
+    router = ModelRouter()
+    router.EXPLORE_RATIO = 0
+    router.record_success("limited", 0.1)
+    router.record_success("spare", 1.0)
+    backends = {
+        "limited": OverloadedChatModel(messages=iter([])),
+        "spare": GenericFakeChatModel(messages=iter([AIMessage(content="done")])),
+    }
+    result = make_llm(backends, router).invoke([HumanMessage(content="x")])
+    assert result.content == "done"
+    assert router.snapshot()["limited"]["errors"] == 0
+    assert failovers("limited") == 1
+
+
+def test_failover_counted_only_when_moving_on():
+    router = ModelRouter()
+    backends = {"last_one": FailingChatModel(messages=iter([]))}
+    with pytest.raises(RuntimeError):
+        make_llm(backends, router).invoke([HumanMessage(content="x")])
+    assert router.snapshot()["last_one"]["errors"] == 1
+    assert failovers("last_one") == 0
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from pkg.client.llm.sandbox import (
+    Sandbox,
+    SandboxError,
+    SandboxInputTooLarge,
+    SandboxTimeout,
+)
+from pkg.client.llm.tool import pretty_print_text
+
+
+def sleep_then_echo(text: str, seconds: float) -> str:
+    time.sleep(seconds)
+    return text
+
+
+def busy_loop(text: str):
+    while True:
+        pass
+
+
+def exit_worker(text: str):
+    os._exit(1)
+
+
+def allocate(text: str, size: int) -> int:
+    return len(bytearray(size))
+
+
+@pytest.fixture
+def pool():
+    sandbox = Sandbox(workers=1, timeout=10, preload=("pkg.client.llm.tool",))
+    sandbox.warm_up()
+    yield sandbox
+    sandbox.shutdown()
+
+
+def test_inline():
+    sandbox = Sandbox(max_input_chars=10)
+    assert sandbox.run(pretty_print_text, "[1]", "json") == "[\n    1\n]"
+    with pytest.raises(SandboxInputTooLarge):
+        sandbox.run(pretty_print_text, "[" + "1," * 10 + "1]", "json")
+
+
+def test_run(pool):
+    assert pool.run(pretty_print_text, "{'a': (1, 2)}", "json") == (
+        '{\n    "a": [\n        1,\n        2\n    ]\n}'
+    )
+    assert pool.run(pretty_print_text, "not an object", "json") is None
+    with pytest.raises(ValueError):
+        pool.run(allocate, "", -1)
+
+
+def test_timeout_resets_pool(pool):
+    pool.timeout = 0.5
+    with pytest.raises(SandboxTimeout):
+        pool.run(sleep_then_echo, "a", 30)
+    pool.timeout = 10
+    assert pool.run(sleep_then_echo, "b", 0) == "b"
+
+
+def test_async_timeout(pool):
+    pool.timeout = 0.5
+    with pytest.raises(SandboxTimeout):
+        asyncio.run(pool.arun(sleep_then_echo, "a", 30))
+    pool.timeout = 10
+    assert asyncio.run(pool.arun(sleep_then_echo, "b", 0)) == "b"
+
+
+def test_crash_resets_pool(pool):
+    with pytest.raises(SandboxError):
+        pool.run(exit_worker, "")
+    assert pool.run(sleep_then_echo, "b", 0) == "b"
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="linux only")
+def test_resource_limits(pool):
+    pool.cpu_seconds = 1
+    pool.memory_bytes = 64 * 1024 * 1024
+    with pytest.raises(MemoryError):
+        pool.run(allocate, "", 256 * 1024 * 1024)
+    assert pool.run(allocate, "", 1024) == 1024
+    with pytest.raises(SandboxError):
+        pool.run(busy_loop, "")
+
+
+def test_timeout_spares_concurrent_task():
+    sandbox = Sandbox(workers=2, timeout=1, preload=("pkg.client.llm.tool",))
+    sandbox.warm_up()
+
+    async def run_both():
+        return await asyncio.gather(
+            sandbox.arun(sleep_then_echo, "hostile", 30),
+            sandbox.arun(sleep_then_echo, "healthy", 0.5),
+            return_exceptions=True,
+        )
+
+    try:
+        hostile, healthy = asyncio.run(run_both())
+        assert isinstance(hostile, SandboxTimeout)
+        assert healthy == "healthy"
+        assert sandbox.run(sleep_then_echo, "after", 0) == "after"
+    finally:
+        sandbox.shutdown()
+
+
+def test_queue_wait_not_counted_in_timeout(pool):
+    pool.timeout = 1
+
+    async def run_queued():
+        return await asyncio.gather(
+            *[pool.arun(sleep_then_echo, str(index), 0.6) for index in range(3)]
+        )
+
+    # 单个子进程依次执行, 总耗时超过 timeout, 每个任务的执行时间不超过
+    assert asyncio.run(run_queued()) == ["0", "1", "2"]
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from langchain_core.tools import ToolException
+
+from pkg.client.llm.formatter import iter_chunks
+from pkg.client.llm.sandbox import sandbox
+from pkg.client.llm.tool import (
+    format_python_object,
+    iter_pretty_print,
+    pretty_print_python_object,
+    pretty_print_text,
+    try_parse_python_object,
+    try_repair_python_object,
+)
+
+
+@pytest.mark.parametrize(
+    "obj, expected, input_format",
+    [
+        ('{"a": [1, 2]}', {"a": [1, 2]}, "json_text"),
+        ("{'a': True, 'b': None}", {"a": True, "b": None}, "python_object"),
+        (" [1, 2, 3] ", [1, 2, 3], "json_text"),
+        ("{1, 2}", {1, 2}, "python_object"),
+    ],
+)
+def test_try_parse_python_object(obj, expected, input_format):
+    assert try_parse_python_object(obj) == (expected, input_format)
+
+
+@pytest.mark.parametrize(
+    "obj", ["", "42", '"text"', '{"a": 1', "帮我解析 {'a': 1}", "[" * 100000]
+)
+def test_try_parse_python_object_fallback(obj):
+    assert try_parse_python_object(obj) == (None, None)
+
+
+def test_format_python_object():
+    assert format_python_object([1], "json") == "[\n    1\n]"
+    assert format_python_object({"a": 1}, "text") == "{\n    'a': 1\n}"
+    assert (
+        format_python_object({"中": {1}}, "json")
+        == '{\n    "中": [\n        1\n    ]\n}'
+    )
+    with pytest.raises(ValueError):
+        format_python_object([1], "latex")
+    assert format_python_object({"a": [1]}, "yaml") == "a:\n  - 1\n"
+
+
+@pytest.mark.parametrize("output_format", ["json", "text", "yaml", "toml", "xml"])
+def test_same_output_for_json_text_and_python_object(output_format):
+    data = {"名称": "中文", "items": [1, 2.5, True], "nested": {"k": "v"}}
+    _, from_json = pretty_print_python_object(
+        json.dumps(data, ensure_ascii=False), "json_text", output_format
+    )
+    _, from_object = pretty_print_python_object(
+        repr(data), "python_object", output_format
+    )
+    assert from_json == from_object
+    assert pretty_print_text(repr(data), output_format) == from_json
+    assert pretty_print_text(json.dumps(data), output_format) is not None
+
+
+@pytest.mark.parametrize(
+    "obj, input_format, output_format, expected",
+    [
+        (
+            '{"a": [1, 2]}',
+            "json_text",
+            "json",
+            '{\n    "a": [\n        1,\n        2\n    ]\n}',
+        ),
+        ("{'a': (1,)}", "python_object", "yaml", "a:\n  - 1\n"),
+        ('{"a": {"b": true}}', "json_text", "toml", "a.b = true\n"),
+    ],
+)
+def test_iter_pretty_print(obj, input_format, output_format, expected):
+    chunks = iter_chunks(obj, 3)
+    assert "".join(iter_pretty_print(chunks, input_format, output_format)) == expected
+
+
+def test_pretty_print_like_json_text():
+    content, result = pretty_print_python_object('{"a": 1,}', "like_json_text", "json")
+    assert result == '{\n    "a": 1\n}'
+    assert "trailing comma" in content
+
+
+def test_pretty_print_like_json_text_uncertain():
+    obj = '{"a": please fix this}'
+    content, result = pretty_print_python_object(obj, "like_json_text", "json")
+    assert result == obj
+    assert "line 1 column 7: added missing quotes" in content
+
+
+def test_pretty_print_json_text_not_limited(monkeypatch):
+    monkeypatch.setattr(sandbox, "max_input_chars", 10)
+    content, result = pretty_print_python_object("[" + "1, " * 10 + "1]", "json_text")
+    assert result == json.dumps([1] * 11, indent=4)
+    with pytest.raises(ToolException, match="input too large"):
+        pretty_print_python_object("[" + "1, " * 10 + "1]", "python_object")
+
+
+def test_pretty_print_like_json_text_input_limit(monkeypatch):
+    monkeypatch.setattr(sandbox, "max_input_chars", 10)
+    with pytest.raises(ToolException, match="input too large"):
+        pretty_print_python_object("[" + "'a' 1 " * 10 + "]", "like_json_text")
+
+
+@pytest.mark.parametrize(
+    "obj, expected",
+    [("{'a': 1,}", {"a": 1}), ("{ please format }", None), ("say {}", None)],
+)
+def test_try_repair_python_object(obj, expected):
+    assert try_repair_python_object(obj)[0] == expected
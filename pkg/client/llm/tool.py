@@ -1,12 +1,20 @@
 import ast
 import json
 from enum import Enum
-from pprint import pformat
 from random import randint
+from typing import Iterable, Iterator, Optional
 
 from langchain_core.tools import StructuredTool, ToolException
 from pydantic import BaseModel, Field, ValidationError
 
+from pkg.client.llm.formatter import (
+    format_events,
+    iter_chunks,
+    iter_json_events,
+    iter_object_events,
+)
+from pkg.client.llm.repair import format_fixes, is_confident, repair_json
+from pkg.client.llm.sandbox import sandbox
 from pkg.client.llm.util import ToolUtils, exception_to_tool_exception
 
 
@@ -27,31 +35,130 @@ class InputFormatEnum(Enum):
     LIKE_JSON_TEXT = "like_json_text"
 
 
+def format_python_object(parsed_obj, output_format: str) -> str:
+    """
+    与 json 文本逐块格式化共用输出方式, 同样的数据无论由哪种解析得到, 输出都相同;
+    tuple 与 set 按数组输出
+    """
+    return "".join(format_events(iter_object_events(parsed_obj), output_format))
+
+
+def iter_pretty_print(
+    chunks: Iterable[str], input_format: str, output_format: str
+) -> Iterator[str]:
+    """
+    json_text 逐块解析并逐块输出, 内存占用与输入大小无关;
+    python_object 需读入全部内容后解析
+    """
+    if input_format == InputFormatEnum.JSON_TEXT.value:
+        events = iter_json_events(chunks)
+    elif input_format == InputFormatEnum.PYTHON_OBJECT.value:
+        events = iter_object_events(ast.literal_eval("".join(chunks)))
+    else:
+        raise ValueError(f"Invalid input_format: {input_format}")
+    return format_events(events, output_format)
+
+
+def try_parse_python_object(obj: str):
+    """
+    依次尝试按 json 文本、python 对象解析, 仅接受容器类型(dict, list, tuple, set);
+    均失败时返回 (None, None)
+    :return: (解析结果, 输入格式)
+    """
+    text = obj.strip()
+    if not text or text[0] not in "{[(":
+        return None, None
+    for input_format, parse in (
+        (InputFormatEnum.JSON_TEXT.value, json.loads),
+        (InputFormatEnum.PYTHON_OBJECT.value, ast.literal_eval),
+    ):
+        try:
+            parsed_obj = parse(text)
+        except (ValueError, SyntaxError, TypeError, RecursionError, MemoryError):
+            continue
+        if isinstance(parsed_obj, (dict, list, tuple, set)):
+            return parsed_obj, input_format
+    return None, None
+
+
+def try_repair_python_object(obj: str):
+    """
+    按容错解析修复常见格式问题, 仅在结果为容器且修复可信时返回, 否则返回 (None, [])
+    :return: (解析结果, 修复列表)
+    """
+    text = obj.strip()
+    if not text or text[0] not in "{[(":
+        return None, []
+    try:
+        parsed_obj, fixes = repair_json(text)
+    except (ValueError, RecursionError):
+        return None, []
+    if not isinstance(parsed_obj, (dict, list)) or not is_confident(fixes):
+        return None, []
+    return parsed_obj, fixes
+
+
+def pretty_print_text(text: str, output_format: str) -> Optional[str]:
+    """
+    text 能直接解析或在本地修复时格式化输出, 否则返回 None; 在沙箱中执行
+    """
+    parsed_obj, _ = try_parse_python_object(text)
+    if parsed_obj is None:
+        parsed_obj, _ = try_repair_python_object(text)
+    if parsed_obj is None:
+        return None
+    try:
+        return format_python_object(parsed_obj, output_format)
+    except ValueError:
+        # 如嵌套过深或输出格式不支持
+        return None
+
+
+def repair_and_format(text: str, output_format: str):
+    """
+    容错解析后格式化, 无法解析或修复不可信时格式化结果为 None; 在沙箱中执行
+    :return: (格式化结果, 修复列表)
+    """
+    try:
+        parsed_obj, fixes = repair_json(text)
+    except (ValueError, RecursionError):
+        return None, []
+    if not is_confident(fixes):
+        return None, fixes
+    return format_python_object(parsed_obj, output_format), fixes
+
+
+def pretty_print(obj: str, input_format: str, output_format: str) -> str:
+    """
+    iter_pretty_print 的完整输出, python_object 输入在沙箱中执行
+    """
+    return "".join(iter_pretty_print(iter_chunks(obj), input_format, output_format))
+
+
 @exception_to_tool_exception
 def pretty_print_python_object(
     obj: str,
     input_format: str = InputFormatEnum.JSON_TEXT.value,
     output_format: str = OutputFormatEnum.JSON.value,
 ) -> str:
-    if input_format == InputFormatEnum.PYTHON_OBJECT.value:
-        parsed_obj = ast.literal_eval(obj)
-    elif input_format == InputFormatEnum.JSON_TEXT.value:
-        parsed_obj = json.loads(obj)
-    elif input_format == InputFormatEnum.LIKE_JSON_TEXT.value:
-        return ToolUtils.tool_result_with_artifact(
-            "这是一个有些许错误的json文本，将数据展开每行一条数据，为错误的格式的行做注释",
-            obj,
+    if input_format == InputFormatEnum.LIKE_JSON_TEXT.value:
+        result, fixes = sandbox.run(repair_and_format, obj, output_format)
+        if result is None:
+            content = "这是一个有些许错误的json文本，将数据展开每行一条数据，为错误的格式的行做注释"
+            if fixes:
+                content += "\n本地解析发现的疑似问题:\n{}".format(format_fixes(fixes))
+            return ToolUtils.tool_result_with_artifact(content, obj, offloadable=False)
+        content = "处理完成, 修复了 {} 处格式问题:\n{}".format(
+            len(fixes), format_fixes(fixes)
         )
-    else:
-        raise ValueError(f"Invalid input_format: {input_format}")
-
-    if output_format == OutputFormatEnum.JSON.value:
-        result = json.dumps(parsed_obj, indent=4)
-    elif output_format == OutputFormatEnum.TEXT.value:
-        result = pformat(parsed_obj)
-    else:
-        raise ValueError(f"Invalid output_format: {output_format}")
-
+        return ToolUtils.tool_result_with_artifact(content, result)
+
+    if input_format == InputFormatEnum.JSON_TEXT.value:
+        # 逐块的非递归解析, 不调用 literal_eval, 无需进程隔离, 也不受沙箱输入大小限制;
+        # 输出逐块写入 artifact, 内存占用与输出大小无关
+        chunks = iter_pretty_print(iter_chunks(obj), input_format, output_format)
+        return ToolUtils.tool_result_with_chunks("处理完成", chunks)
+    result = sandbox.run(pretty_print, obj, input_format, output_format)
     return ToolUtils.tool_result_with_artifact("处理完成", result)
 
 
@@ -2,11 +2,13 @@ import base64
 import functools
 import json
 from enum import Enum
-from typing import Dict, Any
+from typing import Any, Dict, Iterable
 
 from langchain_core.tools import ToolException
 from pydantic import BaseModel, Field
 
+from pkg.client.llm.artifact import Artifact, offload, offload_chunks
+
 
 def exception_to_tool_exception(func):
     @functools.wraps(func)
@@ -69,12 +71,34 @@ class ToolUtils:
             return cls.tool_result_wrap(tool_error)
 
     @classmethod
-    def tool_result_with_artifact(cls, content, artifact):
+    def tool_result_with_artifact(cls, content, artifact, offloadable: bool = True):
         """
         带有查询结果的 tool 使用带有 artifact(工件) 的返回, 这种形式更有利于 LLM tool 之间的信息传递
+
+        offloadable 时, 过大的文本结果转存到 artifact 存储, 由 HTTP 层直接返回给用户, LLM 只拿到摘要
         """
+        if offloadable and isinstance(artifact, str):
+            stored = offload(artifact)
+            if stored is not None:
+                return cls._offloaded_content(content, stored), stored
         return content, artifact
 
+    @classmethod
+    def tool_result_with_chunks(cls, content, chunks: Iterable[str]):
+        """
+        结果逐块生成时使用, 超过阈值的部分边生成边转存, 完整文本不在内存中拼接
+        """
+        result = offload_chunks(chunks)
+        if isinstance(result, Artifact):
+            return cls._offloaded_content(content, result), result
+        return content, result
+
+    @staticmethod
+    def _offloaded_content(content, stored: Artifact) -> str:
+        return "{}, 结果共 {} 个字符, 已保存为 artifact {} 并直接返回给用户, 无需复述结果".format(
+            content, stored.size, stored.id
+        )
+
     @staticmethod
     def parse_json_response(response_text: str) -> dict:
         """
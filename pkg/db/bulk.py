@@ -0,0 +1,117 @@
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import delete, inspect, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+# (请求中的下标, 行数据) 与 (请求中的下标, 错误信息)
+IndexedRow = Tuple[int, Dict[str, Any]]
+ItemError = Tuple[int, str]
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _chunks(items: list, chunk_size: int):
+    for start in range(0, len(items), chunk_size):
+        yield items[start: start + chunk_size]
+
+
+def _error_message(err: Exception) -> str:
+    if isinstance(err, SQLAlchemyError) and getattr(err, "orig", None) is not None:
+        return str(err.orig)
+    return str(err)
+
+
+def _existing_ids(session: Session, model, ids: List[int]) -> set:
+    pk = inspect(model).primary_key[0]
+    return set(session.execute(select(pk).where(pk.in_(ids))).scalars().all())
+
+
+def bulk_insert(
+    session: Session, model, rows: List[IndexedRow], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> List[ItemError]:
+    """
+    按块 executemany 插入, 每块提交一次;
+    某块失败时回滚并逐行重试, 以定位出错的具体条目
+    """
+    errors = []
+    for chunk in _chunks(rows, chunk_size):
+        try:
+            session.execute(insert(model), [row for _, row in chunk])
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            for index, row in chunk:
+                try:
+                    session.execute(insert(model), [row])
+                    session.commit()
+                except SQLAlchemyError as err:
+                    session.rollback()
+                    errors.append((index, _error_message(err)))
+    return errors
+
+
+def bulk_update(
+    session: Session, model, rows: List[IndexedRow], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> List[ItemError]:
+    """
+    按主键批量更新, 行数据中必须包含主键; 不存在的主键按条目报错
+    """
+    pk = inspect(model).primary_key[0]
+    errors = []
+    for chunk in _chunks(rows, chunk_size):
+        existing = _existing_ids(session, model, [row[pk.key] for _, row in chunk])
+        found = []
+        for index, row in chunk:
+            if row[pk.key] in existing:
+                found.append((index, row))
+            else:
+                errors.append((index, "Not found"))
+        if not found:
+            continue
+        try:
+            session.execute(update(model), [row for _, row in found])
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            for index, row in found:
+                try:
+                    session.execute(update(model), [row])
+                    session.commit()
+                except SQLAlchemyError as err:
+                    session.rollback()
+                    errors.append((index, _error_message(err)))
+    return errors
+
+
+def bulk_delete(
+    session: Session, model, ids: List[int], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> List[ItemError]:
+    """
+    按主键批量删除, 每块一条 DELETE ... WHERE id IN (...); 不存在的主键按条目报错,
+    重复的主键只有首次出现的条目计为成功, 其余按条目报错
+    """
+    pk = inspect(model).primary_key[0]
+    errors = []
+    seen = set()
+    unique_ids = []
+    for index, _id in enumerate(ids):
+        if _id in seen:
+            errors.append((index, "Duplicate id"))
+        else:
+            seen.add(_id)
+            unique_ids.append((index, _id))
+    for chunk in _chunks(unique_ids, chunk_size):
+        existing = _existing_ids(session, model, [_id for _, _id in chunk])
+        errors.extend((index, "Not found") for index, _id in chunk if _id not in existing)
+        if not existing:
+            continue
+        try:
+            session.execute(delete(model).where(pk.in_(existing)))
+            session.commit()
+        except SQLAlchemyError as err:
+            session.rollback()
+            errors.extend(
+                (index, _error_message(err)) for index, _id in chunk if _id in existing
+            )
+    return errors
@@ -1,16 +1,28 @@
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
 
 from fastapi import Depends
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-from pkg.util.config.config import config_manager
-
 Base = declarative_base()
 
 
 class DBManager:
-    def __init__(self, db_name, db_host, db_port, db_user, db_password):
+    def __init__(
+        self,
+        db_name,
+        db_host,
+        db_port,
+        db_user,
+        db_password,
+        pool_size=10,
+        max_overflow=20,
+        pool_recycle=3600,
+        pool_pre_ping=True,
+        enable_async=False,
+    ):
         self.db_name = db_name
         self.db_host = db_host
         self.db_port = db_port
@@ -23,19 +35,53 @@ class DBManager:
             f"{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
         )
 
-        # 创建数据库引擎
-        self.engine = create_engine(connection_string)
+        # 创建数据库引擎, 连接池在进程内复用, 避免每次请求重新握手
+        self.engine = create_engine(
+            connection_string,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+        )
 
         # 初始化会话工厂
         self.SessionLocal = sessionmaker(
             autocommit=False, autoflush=False, bind=self.engine
         )
 
+        # 异步模式: 使用 aiomysql 驱动, 请求在事件循环内完成 I/O, 不占用线程池
+        self.async_engine = None
+        self.AsyncSessionLocal = None
+        if enable_async:
+            async_connection_string = (
+                f"mysql+aiomysql://"
+                f"{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
+            )
+            self.async_engine = create_async_engine(
+                async_connection_string,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_recycle=pool_recycle,
+                pool_pre_ping=pool_pre_ping,
+            )
+            self.AsyncSessionLocal = async_sessionmaker(
+                bind=self.async_engine, autoflush=False, expire_on_commit=False
+            )
+
     def init_db(self):
         Base.metadata.create_all(bind=self.engine)
 
     def connect(self):
-        self.engine.connect()
+        # 预热一条连接并归还连接池
+        with self.engine.connect():
+            pass
+
+    def dispose(self):
+        self.engine.dispose()
+
+    async def async_dispose(self):
+        if self.async_engine is not None:
+            await self.async_engine.dispose()
 
     @contextmanager
     def get_db_session(self):
@@ -49,18 +95,43 @@ class DBManager:
         finally:
             session.close()
 
+    @asynccontextmanager
+    async def get_async_db_session(self):
+        if self.AsyncSessionLocal is None:
+            raise RuntimeError("DBManager async mode not enabled")
+        session = self.AsyncSessionLocal()
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+
+# 进程内共享的 DBManager, 由 init_webserver 创建后注入
+_db_manager: Optional[DBManager] = None
+
+
+def set_db_manager(db_manager: DBManager):
+    global _db_manager
+    _db_manager = db_manager
+
+
+def get_db_manager() -> DBManager:
+    if _db_manager is None:
+        raise RuntimeError("DBManager not initialized")
+    return _db_manager
+
 
 # 为FastAPI创建一个依赖函数来提供数据库会话
-def get_db(
-    db_manager: DBManager = Depends(
-        lambda: DBManager(
-            config_manager.get_config().db.db_name,
-            config_manager.get_config().db.host,
-            config_manager.get_config().db.port,
-            config_manager.get_config().db.user,
-            config_manager.get_config().db.password,
-        ),
-    )
-):
+def get_db(db_manager: DBManager = Depends(get_db_manager)):
     with db_manager.get_db_session() as session:
         yield session
+
+
+# 异步路由使用的数据库会话依赖
+async def get_async_db(db_manager: DBManager = Depends(get_db_manager)):
+    async with db_manager.get_async_db_session() as session:
+        yield session
@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+from typing import Iterator, List
+
+from sqlalchemy import select
+
+from pkg.db.db import DBManager
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def stream_rows(db_manager: DBManager, model, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[dict]]:
+    """
+    服务端游标逐批读取整表, 内存占用只与 batch_size 有关
+
+    会话在生成器内部创建: StreamingResponse 在依赖退出后才开始迭代,
+    不能复用请求级的 get_db 会话
+    """
+    columns = model.__table__.columns
+    pk = model.__table__.primary_key.columns.values()
+    stmt = (
+        select(*columns)
+        .order_by(*pk)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    with db_manager.get_db_session() as session:
+        result = session.execute(stmt)
+        for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+
+
+def ndjson_chunks(batches: Iterator[List[dict]]) -> Iterator[str]:
+    for batch in batches:
+        yield "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in batch)
+
+
+def csv_chunks(batches: Iterator[List[dict]], fieldnames: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
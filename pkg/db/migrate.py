@@ -0,0 +1,155 @@
+"""
+为已有的表补齐模型中声明的索引与外键, create_all 只建新表, 不修改已有的表
+
+    python -m pkg.db.migrate                    # 执行
+    python -m pkg.db.migrate --sql              # 只打印待执行的 DDL
+    python -m pkg.db.migrate --delete-orphans   # 删除 CASCADE 外键下的孤儿行
+
+只做新增, 不删除或修改已有的列、索引与约束, 可重复执行; 添加外键前按其 ondelete 处理引用不存在的
+孤儿行: SET NULL 的引用列置空, CASCADE 的孤儿行默认报错, 由 --delete-orphans 决定是否删除
+"""
+
+import argparse
+from typing import List, Tuple
+
+from sqlalchemy import ForeignKeyConstraint, Index, delete, inspect, select, update
+from sqlalchemy.engine import Connection, Dialect, Engine
+from sqlalchemy.schema import AddConstraint, CreateIndex
+
+import pkg.db.model.model  # noqa: F401 注册模型
+from pkg.db.db import Base, DBManager
+from pkg.util.config.config import config_manager
+from pkg.util.log.log import logger
+
+
+class MigrationError(Exception):
+    pass
+
+
+def _column_names(columns) -> Tuple[str, ...]:
+    return tuple(column.name for column in columns)
+
+
+def plan(engine: Engine) -> Tuple[List[Index], List[ForeignKeyConstraint]]:
+    """
+    :return: 已有的表上缺少的索引与外键, 按列比较, 不要求名称一致
+    """
+    inspector = inspect(engine)
+    indexes, foreign_keys = [], []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_indexes = {
+            tuple(index["column_names"]) for index in inspector.get_indexes(table.name)
+        }
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if _column_names(index.columns) not in existing_indexes:
+                indexes.append(index)
+        existing_foreign_keys = {
+            (tuple(fk["constrained_columns"]), fk["referred_table"])
+            for fk in inspector.get_foreign_keys(table.name)
+        }
+        for fk in table.foreign_key_constraints:
+            key = (_column_names(fk.columns), fk.referred_table.name)
+            if key not in existing_foreign_keys:
+                foreign_keys.append(fk)
+    return indexes, foreign_keys
+
+
+def ddl(
+    indexes: List[Index], foreign_keys: List[ForeignKeyConstraint], dialect: Dialect
+) -> List[str]:
+    statements = [CreateIndex(index) for index in indexes]
+    statements += [AddConstraint(fk) for fk in foreign_keys]
+    return [str(statement.compile(dialect=dialect)).strip() for statement in statements]
+
+
+def _orphans(fk: ForeignKeyConstraint):
+    [element] = fk.elements
+    return element.parent.isnot(None) & element.parent.not_in(select(element.column))
+
+
+def fix_orphans(
+    conn: Connection, foreign_keys: List[ForeignKeyConstraint], delete_orphans: bool
+):
+    """
+    按外键的 ondelete 处理引用不存在的行, 否则添加外键会失败
+    """
+    for fk in foreign_keys:
+        [element] = fk.elements
+        table, where = fk.table, _orphans(fk)
+        if fk.ondelete == "SET NULL":
+            result = conn.execute(
+                update(table).where(where).values({element.parent.name: None})
+            )
+            action = "set null"
+        elif delete_orphans:
+            result = conn.execute(delete(table).where(where))
+            action = "deleted"
+        else:
+            count = len(
+                conn.execute(select(table.primary_key.columns[0]).where(where)).all()
+            )
+            if not count:
+                continue
+            raise MigrationError(
+                "{} rows in {} reference missing {}, rerun with --delete-orphans".format(
+                    count, table.name, fk.referred_table.name
+                )
+            )
+        if result.rowcount:
+            logger.warning(
+                "{} {} orphan rows: {}.{}".format(
+                    action, result.rowcount, table.name, element.parent.name
+                )
+            )
+
+
+def migrate(engine: Engine, delete_orphans: bool = False) -> List[str]:
+    """
+    :return: 已执行的 DDL
+    """
+    indexes, foreign_keys = plan(engine)
+    if foreign_keys and engine.dialect.name == "sqlite":
+        # SQLite 不支持为已有的表添加外键, 仅用于开发与测试
+        logger.warning("sqlite: skip adding foreign keys to existing tables")
+        foreign_keys = []
+    statements = ddl(indexes, foreign_keys, engine.dialect)
+    with engine.begin() as conn:
+        fix_orphans(conn, foreign_keys, delete_orphans)
+        for index in indexes:
+            index.create(conn)
+        for fk in foreign_keys:
+            conn.execute(AddConstraint(fk))
+    return statements
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="为已有的表补齐索引与外键")
+    parser.add_argument("--sql", action="store_true", help="只打印 DDL, 不执行")
+    parser.add_argument(
+        "--delete-orphans", action="store_true", help="删除 CASCADE 外键下的孤儿行"
+    )
+    args = parser.parse_args(argv)
+
+    config = config_manager.get_config()
+    db_manager = DBManager(
+        db_name=config.db.db_name,
+        db_host=config.db.host,
+        db_port=config.db.port,
+        db_user=config.db.user,
+        db_password=config.db.password,
+    )
+    try:
+        if args.sql:
+            statements = ddl(*plan(db_manager.engine), db_manager.engine.dialect)
+        else:
+            statements = migrate(db_manager.engine, args.delete_orphans)
+    finally:
+        db_manager.dispose()
+    for statement in statements:
+        print(statement + ";")
+
+
+if __name__ == "__main__":
+    main()
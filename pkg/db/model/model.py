@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, ForeignKey, Integer, String
 
 from pkg.db.db import Base
 
@@ -20,7 +20,9 @@ class Image(Base):
     name = Column(String(63), index=True)
     title_type = Column(String(31))
     title = Column(String(63))
-    create_user_id = Column(Integer)
+    create_user_id = Column(
+        Integer, ForeignKey("user.id", ondelete="SET NULL"), index=True
+    )
     path = Column(String(255))
     description = Column(String(255))
 
@@ -40,7 +42,9 @@ class InstanceAttr(Base):
     name = Column(String(63), index=True)
     attr_id = Column(Integer)
     attr_value = Column(String(255))
-    instance_id = Column(Integer)
+    instance_id = Column(
+        Integer, ForeignKey("instance.id", ondelete="CASCADE"), index=True
+    )
 
 
 class Quote(Base):
@@ -50,7 +54,9 @@ class Quote(Base):
     name = Column(String(63), index=True)
     location = Column(String(255))
     content = Column(String(255))
-    create_user_id = Column(Integer)
+    create_user_id = Column(
+        Integer, ForeignKey("user.id", ondelete="SET NULL"), index=True
+    )
 
 
 class QuoteFile(Base):
@@ -60,7 +66,7 @@ class QuoteFile(Base):
     name = Column(String(63), index=True)
     quote_type = Column(String(31))
     suffix = Column(String(31))
-    quote_id = Column(Integer)
+    quote_id = Column(Integer, ForeignKey("quote.id", ondelete="CASCADE"), index=True)
     path = Column(String(255))
     urls = Column(String(255))
     description = Column(String(255))
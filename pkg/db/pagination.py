@@ -0,0 +1,117 @@
+import base64
+import binascii
+import json
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import and_, inspect, or_, select
+
+# 列表接口通过响应头返回下一页游标, 保持响应体仍为列表, 兼容旧客户端
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(order_by: str, values: List[Any]) -> str:
+    raw = json.dumps({"o": order_by, "k": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, List[Any]]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        order_by, values = data["o"], data["k"]
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("Invalid cursor")
+    return order_by, values
+
+
+class KeysetPage:
+    """
+    基于主键(可附加一个排序列)的游标分页, 深分页与首页代价一致
+
+    排序规则为 (sort_column, id), id 作为唯一的决胜列;
+    sort_column 仅允许主键或带索引的列, 否则游标分页同样会退化为全表扫描
+    order_by 形如 "name" 或 "-name"(降序), 默认为 "id"
+    """
+
+    def __init__(
+        self,
+        model,
+        limit: int,
+        cursor: Optional[str] = None,
+        order_by: Optional[str] = None,
+    ):
+        self.model = model
+        self.limit = limit
+        self.order_by = order_by or "id"
+        self.descending = self.order_by.startswith("-")
+        self.pk = inspect(model).primary_key[0]
+        self.column = self._sort_column(self.order_by.lstrip("-"))
+        self.after = None
+        if cursor:
+            cursor_order_by, self.after = decode_cursor(cursor)
+            if cursor_order_by != self.order_by:
+                raise ValueError("Cursor does not match order_by")
+
+    def _sort_column(self, name: str):
+        column = self.model.__table__.columns.get(name)
+        if column is None or not (column.primary_key or column.index):
+            raise ValueError(f"Unsupported order_by column: {name}")
+        return column
+
+    def _order_clauses(self):
+        if self.column is self.pk:
+            return [self.pk.desc() if self.descending else self.pk.asc()]
+        if self.descending:
+            return [self.column.desc(), self.pk.desc()]
+        return [self.column.asc(), self.pk.asc()]
+
+    def _after_clause(self):
+        value, last_id = self.after
+        if self.column is self.pk:
+            return self.pk < last_id if self.descending else self.pk > last_id
+        # mysql 中 NULL 在升序时排最前, 降序时排最后
+        if self.descending:
+            if value is None:
+                return and_(self.column.is_(None), self.pk < last_id)
+            return or_(
+                self.column < value,
+                and_(self.column == value, self.pk < last_id),
+                self.column.is_(None),
+            )
+        if value is None:
+            return or_(
+                and_(self.column.is_(None), self.pk > last_id),
+                self.column.isnot(None),
+            )
+        return or_(self.column > value, and_(self.column == value, self.pk > last_id))
+
+    def statement(self, skip: int = 0, where=None):
+        """
+        生成查询语句, 多取一条用于判断是否还有下一页
+        :param skip: 无游标时兼容旧的 offset 分页
+        :param where: 额外过滤条件, 如按外键查询子资源
+        """
+        stmt = select(self.model).order_by(*self._order_clauses())
+        if where is not None:
+            stmt = stmt.where(where)
+        if self.after is not None:
+            stmt = stmt.where(self._after_clause())
+        elif skip:
+            stmt = stmt.offset(skip)
+        return stmt.limit(max(self.limit, 0) + 1)
+
+    def page(self, rows) -> Tuple[list, Optional[str]]:
+        """
+        截取当前页并生成下一页游标, 没有下一页时游标为 None
+        """
+        rows = list(rows)
+        if self.limit <= 0:
+            return [], None
+        if len(rows) <= self.limit:
+            return rows, None
+        rows = rows[: self.limit]
+        last = rows[-1]
+        values = [getattr(last, self.column.key), getattr(last, self.pk.key)]
+        return rows, encode_cursor(self.order_by, values)
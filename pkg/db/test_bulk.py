@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
+
+from pkg.db.bulk import bulk_delete, bulk_insert, bulk_update
+from pkg.db.db import Base
+from pkg.db.model.model import Image, User
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def enable_foreign_keys(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([User(id=1, name="a"), User(id=2, name="b")])
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def names(session, model):
+    return session.execute(select(model.name).order_by(model.id)).scalars().all()
+
+
+def test_insert_bad_row_in_chunk(session):
+    rows = [
+        (0, {"name": "x", "create_user_id": 1}),
+        (1, {"name": "y", "create_user_id": 999}),
+        (2, {"name": "z", "create_user_id": 2}),
+        (3, {"name": "w", "create_user_id": 1}),
+    ]
+    errors = bulk_insert(session, Image, rows, chunk_size=3)
+    assert [index for index, _ in errors] == [1]
+    assert "FOREIGN KEY" in errors[0][1]
+    assert names(session, Image) == ["x", "z", "w"]
+
+
+def test_insert_duplicate_primary_key(session):
+    rows = [(0, {"id": 3, "name": "c"}), (1, {"id": 1, "name": "dup"})]
+    errors = bulk_insert(session, User, rows)
+    assert [index for index, _ in errors] == [1]
+    assert names(session, User) == ["a", "b", "c"]
+
+
+def test_update_missing_and_bad_rows(session):
+    session.add_all([Image(id=1, name="i1"), Image(id=2, name="i2")])
+    session.commit()
+    rows = [
+        (0, {"id": 1, "name": "new1", "create_user_id": 1}),
+        (1, {"id": 404, "name": "missing", "create_user_id": 1}),
+        (2, {"id": 2, "name": "new2", "create_user_id": 999}),
+    ]
+    errors = bulk_update(session, Image, rows, chunk_size=2)
+    assert errors[0] == (1, "Not found")
+    assert [index for index, _ in errors] == [1, 2]
+    assert "FOREIGN KEY" in errors[1][1]
+    assert names(session, Image) == ["new1", "i2"]
+
+
+def test_delete_missing_and_duplicate_ids(session):
+    errors = bulk_delete(session, User, [1, 404, 1, 2], chunk_size=2)
+    assert sorted(errors) == [(1, "Not found"), (2, "Duplicate id")]
+    assert names(session, User) == []
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from pkg.db.db import DBManager
+from pkg.db.export import csv_chunks, ndjson_chunks, stream_rows
+
+Base = declarative_base()
+
+
+class Event(Base):
+    __tablename__ = "event"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(63))
+    created_at = Column(DateTime)
+
+
+ROWS = [
+    {"id": 1, "name": "a,b", "created_at": datetime(2024, 1, 2, 3, 4, 5)},
+    {"id": 2, "name": 'say "hi"', "created_at": None},
+    {"id": 3, "name": "line1\nline2", "created_at": None},
+    {"id": 4, "name": None, "created_at": datetime(2024, 1, 3)},
+    {"id": 5, "name": "值", "created_at": None},
+]
+FIELDNAMES = ["id", "name", "created_at"]
+
+
+@pytest.fixture
+def db_manager():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # 乱序写入, 导出按主键排序
+        conn.execute(Event.__table__.insert(), list(reversed(ROWS)))
+    # 只替换会话来源, 使用 DBManager 自身的 get_db_session
+    manager = DBManager.__new__(DBManager)
+    manager.SessionLocal = sessionmaker(bind=engine)
+    yield manager
+    engine.dispose()
+
+
+def test_stream_rows_batches(db_manager):
+    batches = list(stream_rows(db_manager, Event, batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [row for batch in batches for row in batch] == ROWS
+
+
+def test_ndjson(db_manager):
+    chunks = list(ndjson_chunks(stream_rows(db_manager, Event, batch_size=2)))
+    assert len(chunks) == 3
+    lines = "".join(chunks).splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"id": 1, "name": "a,b", "created_at": "2024-01-02 03:04:05"},
+        {"id": 2, "name": 'say "hi"', "created_at": None},
+        {"id": 3, "name": "line1\nline2", "created_at": None},
+        {"id": 4, "name": None, "created_at": "2024-01-03 00:00:00"},
+        {"id": 5, "name": "值", "created_at": None},
+    ]
+
+
+def test_csv(db_manager):
+    chunks = list(csv_chunks(stream_rows(db_manager, Event, batch_size=2), FIELDNAMES))
+    # 表头单独一块, 之后每批一块
+    assert chunks[0] == "id,name,created_at\r\n"
+    assert len(chunks) == 4
+    text = "".join(chunks)
+    assert '"a,b"' in text and '"say ""hi"""' in text and '"line1\nline2"' in text
+    assert list(csv.DictReader(io.StringIO(text, newline=""))) == [
+        {"id": "1", "name": "a,b", "created_at": "2024-01-02 03:04:05"},
+        {"id": "2", "name": 'say "hi"', "created_at": ""},
+        {"id": "3", "name": "line1\nline2", "created_at": ""},
+        {"id": "4", "name": "", "created_at": "2024-01-03 00:00:00"},
+        {"id": "5", "name": "值", "created_at": ""},
+    ]
+
+
+def test_csv_empty_table(db_manager):
+    with db_manager.get_db_session() as session:
+        session.query(Event).delete()
+    chunks = list(csv_chunks(stream_rows(db_manager, Event), FIELDNAMES))
+    assert chunks == ["id,name,created_at\r\n"]
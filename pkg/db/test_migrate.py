@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import Column, MetaData, Table, create_engine, inspect, select
+from sqlalchemy.dialects import mysql
+
+from pkg.db.db import Base
+from pkg.db.migrate import MigrationError, ddl, fix_orphans, migrate, plan
+
+
+@pytest.fixture
+def engine():
+    """
+    模拟已部署的旧表: 只有列与主键, 没有后来加入的索引与外键
+    """
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        Table(
+            table.name,
+            metadata,
+            *[
+                Column(column.name, column.type, primary_key=column.primary_key)
+                for column in table.columns
+            ]
+        )
+    metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_plan_ddl(engine):
+    indexes, foreign_keys = plan(engine)
+    assert "ix_quote_file_quote_id" in [index.name for index in indexes]
+    assert ddl([], foreign_keys, mysql.dialect()) == [
+        "ALTER TABLE image ADD FOREIGN KEY(create_user_id) "
+        "REFERENCES user (id) ON DELETE SET NULL",
+        "ALTER TABLE instance_attr ADD FOREIGN KEY(instance_id) "
+        "REFERENCES instance (id) ON DELETE CASCADE",
+        "ALTER TABLE quote ADD FOREIGN KEY(create_user_id) "
+        "REFERENCES user (id) ON DELETE SET NULL",
+        "ALTER TABLE quote_file ADD FOREIGN KEY(quote_id) "
+        "REFERENCES quote (id) ON DELETE CASCADE",
+    ]
+
+
+def test_migrate_adds_indexes_once(engine):
+    statements = migrate(engine)
+    assert "CREATE INDEX ix_image_create_user_id ON image (create_user_id)" in (
+        statements
+    )
+    names = {index["name"] for index in inspect(engine).get_indexes("quote_file")}
+    assert "ix_quote_file_quote_id" in names
+    assert migrate(engine) == []
+
+
+def test_fix_orphans(engine):
+    tables = Base.metadata.tables
+    _, foreign_keys = plan(engine)
+    with engine.begin() as conn:
+        conn.execute(tables["user"].insert(), [{"id": 1}])
+        conn.execute(
+            tables["image"].insert(),
+            [{"id": 1, "create_user_id": 1}, {"id": 2, "create_user_id": 2}],
+        )
+        conn.execute(tables["quote_file"].insert(), [{"id": 1, "quote_id": 9}])
+
+    # CASCADE 的孤儿行默认不删除, 已做的修改一并回滚
+    with pytest.raises(MigrationError, match="1 rows in quote_file"):
+        with engine.begin() as conn:
+            fix_orphans(conn, foreign_keys, delete_orphans=False)
+    with engine.begin() as conn:
+        fix_orphans(conn, foreign_keys, delete_orphans=True)
+        images = conn.execute(select(tables["image"].c.create_user_id)).scalars()
+        assert sorted(images, key=str) == [1, None]
+        assert conn.execute(select(tables["quote_file"])).all() == []
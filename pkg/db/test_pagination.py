@@ -0,0 +1,40 @@
+import pytest
+
+from pkg.db.model.model import User
+from pkg.db.pagination import KeysetPage, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("-name", ["张三", 42])
+    assert decode_cursor(cursor) == ("-name", ["张三", 42])
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_unindexed_order_by_rejected():
+    with pytest.raises(ValueError):
+        KeysetPage(User, 10, order_by="description")
+
+
+def test_cursor_order_by_mismatch():
+    cursor = encode_cursor("name", ["a", 1])
+    with pytest.raises(ValueError):
+        KeysetPage(User, 10, cursor=cursor, order_by="-name")
+
+
+def test_page_next_cursor():
+    class Row:
+        def __init__(self, id, name):
+            self.id = id
+            self.name = name
+
+    page = KeysetPage(User, 2, order_by="name")
+    rows, next_cursor = page.page([Row(1, "a"), Row(2, "b"), Row(3, "c")])
+    assert [row.id for row in rows] == [1, 2]
+    assert decode_cursor(next_cursor) == ("name", ["b", 2])
+
+    rows, next_cursor = page.page([Row(3, "c")])
+    assert next_cursor is None
@@ -0,0 +1,56 @@
+import time
+
+from pkg.util.metric.metric import MetricRegistry, metric_registry
+
+HTTP_REQUESTS_TOTAL = "http_requests_total"
+HTTP_REQUEST_DURATION_SECONDS = "http_request_duration_seconds"
+HTTP_REQUESTS_IN_PROGRESS = "http_requests_in_progress"
+
+metric_registry.describe(HTTP_REQUESTS_TOTAL, "按子应用/路由/方法/状态码统计的请求数")
+metric_registry.describe(HTTP_REQUEST_DURATION_SECONDS, "按子应用/路由/方法统计的请求耗时(秒)")
+metric_registry.describe(HTTP_REQUESTS_IN_PROGRESS, "处理中的请求数")
+
+
+class MetricMiddleware:
+    """
+    全局计时中间件(纯 ASGI, 不缓冲响应体, 流式响应按发送完成计时)
+
+    路由取匹配到的路由模板(如 /users/{user_id}), 避免 path 参数导致标签爆炸;
+    子应用取 mount 后的 root_path, 即 AppServer.base_url
+    """
+
+    def __init__(self, app, registry: MetricRegistry = metric_registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress_labels = {"method": scope["method"]}
+        self.registry.add_gauge(HTTP_REQUESTS_IN_PROGRESS, 1, in_progress_labels)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            self.registry.add_gauge(HTTP_REQUESTS_IN_PROGRESS, -1, in_progress_labels)
+            # 路由匹配会原地更新 scope, 此时可以拿到子应用与路由模板
+            route = scope.get("route")
+            labels = {
+                "app": scope.get("root_path") or "/",
+                "route": getattr(route, "path", "<unmatched>"),
+                "method": scope["method"],
+            }
+            self.registry.observe(HTTP_REQUEST_DURATION_SECONDS, duration, labels)
+            labels["status"] = str(status_code)
+            self.registry.inc(HTTP_REQUESTS_TOTAL, labels)
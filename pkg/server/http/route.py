@@ -1,5 +1,7 @@
 from starlette.middleware.cors import CORSMiddleware
 
+from pkg.server.http.middleware import MetricMiddleware
+
 
 class Route:
     """
@@ -26,6 +28,8 @@ class Route:
             allow_methods=["*"],
             allow_headers=["*"],
         )
+        # 最后添加的中间件在最外层, 计时覆盖整个请求
+        self.app.add_middleware(MetricMiddleware)
 
     def add_route(self):
         """
@@ -1,8 +1,14 @@
-from typing import List
+import multiprocessing
+import signal
+import time
+from typing import Callable, Dict, List
 
 from fastapi import FastAPI
 import uvicorn
 
+from pkg.server.http.route import Route
+from pkg.util.log.log import logger
+
 
 class AppServer:
     """
@@ -28,30 +34,138 @@ class WebServerLoader:
     相当于 server listener 所在, 加载 host port
     api:
         - 主 app 在此定义, 获取此 app 去注册路由, 加载 子 app 都行
-        - start 启动 http server
+        - add_worker_initializer 注册每个 worker 进程启动前的初始化(数据库连接池, agent 等)
+        - start 启动 http server, workers > 1 时 prefork 多个 worker 共享监听 socket
         - stop 停止 http server
     """
 
-    def __init__(self, host: str, port: int):
+    # worker 启动后存活不足该时长即退出, 视为启动失败, 退出后等待该时长再重启, 避免崩溃循环打满 CPU
+    WORKER_MIN_UPTIME = 1.0
+    SUPERVISE_INTERVAL = 0.5
+
+    def __init__(self, host: str, port: int, workers: int = 1):
         self.host = host
         self.port = port
+        self.workers = workers
         self.root_app = FastAPI()
         self.uvicorn_server = None
         self.sub_apps = {}
+        self.worker_initializers: List[Callable[[], None]] = []
+        self.worker_processes = {}
+        # 已退出、等待重启的 worker 及其重启时间
+        self.restart_at: Dict[int, float] = {}
+        self.should_exit = False
 
     def mount_sub_app(self):
         for app_server in self.sub_apps.values():
-            self.root_app.mount(app_server.base_url, app_server.get_app())
+            sub_app = app_server.get_app()
+            self.root_app.mount(app_server.base_url, sub_app)
+            # 被 mount 的子 app 不会收到 lifespan 事件, 转交给主 app 执行
+            self.root_app.router.on_startup.extend(sub_app.router.on_startup)
+            self.root_app.router.on_shutdown.extend(sub_app.router.on_shutdown)
+
+    def add_worker_initializer(self, initializer: Callable[[], None]):
+        """
+        注册 worker 初始化函数, 在 worker 进程内(fork 之后)执行,
+        连接池等不能跨进程共享的资源应在这里创建
+        """
+        self.worker_initializers.append(initializer)
+
+    def init_worker(self):
+        for initializer in self.worker_initializers:
+            initializer()
 
     def start(self):
         self.mount_sub_app()
+        Route(self.root_app).add_global_middleware()
 
         # 启动 Uvicorn 服务器
         config = uvicorn.Config(self.root_app, host=self.host, port=self.port)
+        if self.workers > 1:
+            self.start_workers(config)
+            return
+
+        self.init_worker()
         self.uvicorn_server = uvicorn.Server(config)
         self.uvicorn_server.run()
 
+    def start_workers(self, config: uvicorn.Config):
+        """
+        主进程只负责监听 socket 与监督 worker, 崩溃的 worker 会被重新拉起
+        """
+        sock = config.bind_socket()
+        context = multiprocessing.get_context("fork")
+
+        def handle_exit(sig, frame):
+            self.should_exit = True
+
+        signal.signal(signal.SIGINT, handle_exit)
+        signal.signal(signal.SIGTERM, handle_exit)
+
+        for worker_id in range(self.workers):
+            self.spawn_worker(context, config, sock, worker_id)
+
+        while not self.should_exit:
+            for worker_id in self.check_workers(time.monotonic()):
+                if not self.should_exit:
+                    self.spawn_worker(context, config, sock, worker_id)
+            time.sleep(self.SUPERVISE_INTERVAL)
+
+        for process, _ in self.worker_processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process, _ in self.worker_processes.values():
+            process.join(timeout=config.timeout_graceful_shutdown or 10)
+            if process.is_alive():
+                process.kill()
+        sock.close()
+
+    def check_workers(self, now: float) -> List[int]:
+        """
+        返回此刻需要重启的 worker;
+        存活不足 WORKER_MIN_UPTIME 即退出的 worker 推迟到退出后 WORKER_MIN_UPTIME 秒再重启,
+        推迟期间不阻塞对其他 worker 的监督
+        """
+        restart = []
+        for worker_id, (process, started_at) in self.worker_processes.items():
+            if process.is_alive():
+                continue
+            restart_at = self.restart_at.get(worker_id)
+            if restart_at is None:
+                crashed = now - started_at < self.WORKER_MIN_UPTIME
+                restart_at = now + self.WORKER_MIN_UPTIME if crashed else now
+                self.restart_at[worker_id] = restart_at
+                logger.warning(
+                    "worker {} (pid {}) exited with code {}, restarting in {:.1f}s".format(
+                        worker_id, process.pid, process.exitcode, restart_at - now
+                    )
+                )
+            if now >= restart_at:
+                restart.append(worker_id)
+        return restart
+
+    def spawn_worker(self, context, config: uvicorn.Config, sock, worker_id: int):
+        process = context.Process(
+            target=self.run_worker,
+            args=(config, sock),
+            name="lisco-worker-{}".format(worker_id),
+            daemon=False,
+        )
+        process.start()
+        self.worker_processes[worker_id] = (process, time.monotonic())
+        self.restart_at.pop(worker_id, None)
+        logger.info("worker {} started, pid {}".format(worker_id, process.pid))
+
+    def run_worker(self, config: uvicorn.Config, sock):
+        # 恢复默认信号处理, uvicorn.Server 会安装自己的退出信号处理
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        self.init_worker()
+        self.uvicorn_server = uvicorn.Server(config)
+        self.uvicorn_server.run(sockets=[sock])
+
     def stop(self):
+        self.should_exit = True
         if self.uvicorn_server:
             self.uvicorn_server.should_exit = True
             self.uvicorn_server.force_exit = True
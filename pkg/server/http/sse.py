@@ -0,0 +1,42 @@
+import json
+from typing import Any, AsyncIterator, Optional
+
+from starlette.responses import StreamingResponse
+
+
+def format_sse(data: Any, event: Optional[str] = None) -> str:
+    """
+    编码一条 Server-Sent Event, 非字符串数据序列化为 json
+    """
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False, default=str)
+    lines = ["event: " + event] if event else []
+    lines.extend("data: " + line for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+async def start_event_stream(events: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    先取出第一条事件再返回响应, 流开始前的异常(如 agent 池耗尽)仍能以普通 HTTP 错误返回
+    """
+    first = await events.__anext__()
+
+    async def stream():
+        yield first
+        async for event in events:
+            yield event
+
+    return stream()
+
+
+class EventSourceResponse(StreamingResponse):
+    media_type = "text/event-stream"
+
+    def __init__(self, content, headers: Optional[dict] = None, **kwargs):
+        # 禁止代理缓冲, 事件产生即发往客户端
+        headers = {
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            **(headers or {}),
+        }
+        super().__init__(content, headers=headers, media_type=self.media_type, **kwargs)
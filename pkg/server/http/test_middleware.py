@@ -0,0 +1,104 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from pkg.server.http.middleware import (
+    HTTP_REQUEST_DURATION_SECONDS,
+    HTTP_REQUESTS_IN_PROGRESS,
+    HTTP_REQUESTS_TOTAL,
+    MetricMiddleware,
+)
+from pkg.util.metric.metric import MetricRegistry
+
+
+@pytest.fixture
+def registry():
+    return MetricRegistry()
+
+
+@pytest.fixture
+def client(registry):
+    sub_app = FastAPI()
+
+    @sub_app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return {"id": item_id}
+
+    @sub_app.get("/slow")
+    def read_slow():
+        def chunks():
+            yield "a"
+            # 流式响应按发送完成计时
+            time.sleep(0.05)
+            yield "b"
+
+        return StreamingResponse(chunks())
+
+    @sub_app.get("/error")
+    def read_error():
+        raise RuntimeError("boom")
+
+    root_app = FastAPI()
+    root_app.mount("/sub", sub_app)
+    root_app.add_middleware(MetricMiddleware, registry=registry)
+    return TestClient(root_app, raise_server_exceptions=False)
+
+
+def series(registry, kind: str, name: str) -> list:
+    return sorted(
+        registry.to_json()[kind].get(name, []),
+        key=lambda s: sorted(s["labels"].items()),
+    )
+
+
+def test_labels_and_counts(client, registry):
+    assert client.get("/sub/items/1").status_code == 200
+    assert client.get("/sub/items/2").status_code == 200
+    assert client.get("/sub/missing").status_code == 404
+    assert client.get("/missing").status_code == 404
+    assert client.get("/sub/error").status_code == 500
+
+    counters = {
+        tuple(sorted(s["labels"].items())): s["value"]
+        for s in series(registry, "counters", HTTP_REQUESTS_TOTAL)
+    }
+
+    def key(app, route, status):
+        labels = {"app": app, "route": route, "method": "GET", "status": status}
+        return tuple(sorted(labels.items()))
+
+    # 路由取模板, 不同 path 参数计入同一序列
+    assert counters == {
+        key("/sub", "/items/{item_id}", "200"): 2,
+        key("/sub", "<unmatched>", "404"): 1,
+        key("/", "<unmatched>", "404"): 1,
+        key("/sub", "/error", "500"): 1,
+    }
+    assert (
+        'http_requests_total{app="/sub",method="GET",route="/items/{item_id}",'
+        'status="200"} 2' in registry.to_prometheus()
+    )
+
+
+def test_duration_and_in_progress(client, registry):
+    assert client.get("/sub/slow").text == "ab"
+    client.get("/sub/items/1")
+
+    histograms = {
+        s["labels"]["route"]: s
+        for s in series(registry, "histograms", HTTP_REQUEST_DURATION_SECONDS)
+    }
+    assert histograms["/slow"]["labels"] == {
+        "app": "/sub",
+        "route": "/slow",
+        "method": "GET",
+    }
+    assert histograms["/slow"]["count"] == 1
+    assert histograms["/slow"]["sum"] >= 0.05
+    assert histograms["/items/{item_id}"]["count"] == 1
+
+    gauges = series(registry, "gauges", HTTP_REQUESTS_IN_PROGRESS)
+    assert gauges == [{"labels": {"method": "GET"}, "value": 0}]
@@ -0,0 +1,118 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import urllib.request
+
+import pytest
+
+from pkg.server.http.server import WebServerLoader
+
+
+class Process:
+    def __init__(self, pid: int, alive: bool = True):
+        self.pid = pid
+        self.alive = alive
+        self.exitcode = None if alive else 1
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+
+def test_check_workers_restarts_dead_workers():
+    loader = WebServerLoader("127.0.0.1", 0, workers=2)
+    loader.worker_processes = {0: (Process(10), 0.0), 1: (Process(11, False), 0.0)}
+    assert loader.check_workers(now=100.0) == [1]
+
+
+def test_check_workers_delays_crash_loop():
+    loader = WebServerLoader("127.0.0.1", 0, workers=2)
+    min_uptime = loader.WORKER_MIN_UPTIME
+    # worker 1 启动后很快退出, 推迟重启, 同时 worker 0 退出仍立即重启
+    loader.worker_processes = {
+        0: (Process(10, False), 0.0),
+        1: (Process(11, False), 100.0),
+    }
+    now = 100.0 + min_uptime / 10
+    assert loader.check_workers(now) == [0]
+    assert loader.check_workers(now + min_uptime / 2) == [0]
+    assert loader.check_workers(now + min_uptime) == [0, 1]
+
+
+def test_init_worker_runs_initializers_in_order():
+    loader = WebServerLoader("127.0.0.1", 0)
+    calls = []
+    loader.add_worker_initializer(lambda: calls.append("db"))
+    loader.add_worker_initializer(lambda: calls.append("agent"))
+    loader.init_worker()
+    assert calls == ["db", "agent"]
+
+
+def run_server(port: int, pid_file: str):
+    loader = WebServerLoader("127.0.0.1", port, workers=2)
+    loader.WORKER_MIN_UPTIME = 0.1
+    loader.SUPERVISE_INTERVAL = 0.05
+
+    def record_pid():
+        with open(pid_file, "a") as f:
+            f.write("{}\n".format(os.getpid()))
+
+    loader.add_worker_initializer(record_pid)
+    loader.get_app().get("/pid")(os.getpid)
+    loader.start()
+
+
+def worker_pids(pid_file: str) -> list:
+    try:
+        with open(pid_file) as f:
+            return [int(line) for line in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def wait_for(condition, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.05)
+    raise AssertionError("timed out")
+
+
+def serving_pid(port: int) -> int:
+    try:
+        with urllib.request.urlopen("http://127.0.0.1:{}/pid".format(port)) as r:
+            return int(r.read())
+    except OSError:
+        return 0
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork needs fork")
+def test_prefork_replaces_killed_worker(tmp_path):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    pid_file = str(tmp_path / "pids")
+    supervisor = multiprocessing.get_context("fork").Process(
+        target=run_server, args=(port, pid_file)
+    )
+    supervisor.start()
+    try:
+        pids = wait_for(
+            lambda: len(worker_pids(pid_file)) == 2 and worker_pids(pid_file)
+        )
+        # 两个 worker 共用监听 socket, 请求由其中之一处理
+        assert wait_for(lambda: serving_pid(port)) in pids
+
+        os.kill(pids[0], signal.SIGKILL)
+        new_pids = wait_for(lambda: worker_pids(pid_file)[2:])
+        assert new_pids[0] not in pids
+        assert wait_for(lambda: serving_pid(port)) in pids[1:] + new_pids
+    finally:
+        supervisor.terminate()
+        supervisor.join(timeout=15)
+        if supervisor.is_alive():
+            supervisor.kill()
+    assert supervisor.exitcode is not None
@@ -0,0 +1,54 @@
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from pkg.server.http.sse import EventSourceResponse, format_sse, start_event_stream
+
+
+def test_format_sse():
+    assert format_sse("hi") == "data: hi\n\n"
+    assert (
+        format_sse({"a": "值"}, event="token") == 'event: token\ndata: {"a": "值"}\n\n'
+    )
+    # 多行数据拆为多个 data 行, 避免换行提前结束事件
+    assert format_sse("a\nb", "output") == "event: output\ndata: a\ndata: b\n\n"
+
+
+async def events(fail_at: int):
+    for index in range(3):
+        if index == fail_at:
+            raise HTTPException(status_code=503, detail="busy")
+        yield format_sse({"index": index}, event="step")
+
+
+app = FastAPI()
+
+
+@app.get("/events")
+async def read_events(fail_at: int = -1):
+    return EventSourceResponse(await start_event_stream(events(fail_at)))
+
+
+def test_stream_framing():
+    response = TestClient(app).get("/events")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["x-accel-buffering"] == "no"
+    assert response.text == "".join(
+        "event: step\ndata: {}\n\n".format('{"index": %d}' % index)
+        for index in range(3)
+    )
+
+
+def test_error_before_first_event_is_http_error():
+    response = TestClient(app).get("/events", params={"fail_at": 0})
+    assert response.status_code == 503
+    assert response.json() == {"detail": "busy"}
+
+
+@pytest.mark.asyncio
+async def test_error_after_first_event_ends_stream():
+    stream = await start_event_stream(events(fail_at=1))
+    assert await stream.__anext__() == format_sse({"index": 0}, event="step")
+    with pytest.raises(HTTPException):
+        await stream.__anext__()
@@ -0,0 +1,44 @@
+import time
+
+from pkg.util.cache.cache import LRUTTLCache
+
+
+def test_lru_eviction():
+    cache = LRUTTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiration():
+    cache = LRUTTLCache(maxsize=10, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_delete_and_stats():
+    cache = LRUTTLCache(maxsize=10)
+    cache.set(("user", 1), {"id": 1})
+    assert cache.get(("user", 1)) == {"id": 1}
+    cache.delete(("user", 1))
+    assert cache.get(("user", 1)) is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_disabled_cache():
+    cache = LRUTTLCache(maxsize=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
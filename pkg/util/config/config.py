@@ -1,5 +1,5 @@
 import configparser
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -9,13 +9,31 @@ from pkg.constant.config import DEFAULT_CONFIG_PATH
 class Server(BaseModel):
     host: str = Field(..., description="服务器地址")
     port: int = Field(..., description="服务器端口")
+    workers: int = Field(1, description="worker 进程数, 大于 1 时以多进程共享监听 socket")
 
 
 class LLM(BaseModel):
     base_url: str = Field(..., description="LLM 服务器地址")
     model: str = Field(..., description="LLM 模型")
+    models: List[str] = Field([], description="可路由的其它模型, 与 model 共用 base_url, 由各 agent 的 allowed_models 限定")
     api_key: str = Field(..., description="LLM API Key")
     app_code: Optional[str] = Field(description="LLM 应用编码")
+    agent_pool_size: int = Field(4, description="每种 agent 预先构建的实例数, 即单个 worker 内的最大并发")
+    agent_pool_timeout: float = Field(30, description="agent 池无空闲实例时的最长等待时间(秒)")
+    cache_path: Optional[str] = Field(None, description="LLM 响应缓存的 SQLite 文件, 为空时只用内存缓存")
+    cache_size: int = Field(1000, description="每种 agent 的 LLM 响应内存缓存条目数")
+    cache_ttl: float = Field(86400, description="LLM 响应缓存默认过期时间(秒), 0 为关闭, agent 可单独覆盖")
+    max_connections: int = Field(100, description="到 LLM 服务的最大连接数, 即上游最大并发")
+    max_keepalive_connections: int = Field(20, description="保持的空闲长连接数")
+    keepalive_expiry: float = Field(30, description="空闲长连接保持时间(秒)")
+    connect_timeout: float = Field(5, description="建立连接超时(秒)")
+    read_timeout: float = Field(60, description="读取响应超时(秒)")
+    http2: bool = Field(False, description="是否启用 HTTP/2, 需安装 h2")
+    batch_max_concurrency: int = Field(8, description="批量接口单个请求内同时执行的 agent 调用数上限")
+    rate_limit_rpm: float = Field(0, description="每个模型与 api key 每分钟最多请求数, 0 为不限制, 由各 worker 均分")
+    rate_limit_tpm: float = Field(0, description="每个模型与 api key 每分钟最多 token 数, 0 为不限制, 由各 worker 均分")
+    rate_limit_max_waiting: int = Field(32, description="限流器中最多等待的请求数, 超出时直接返回 503")
+    rate_limit_max_wait: float = Field(10, description="限流器中最长等待时间(秒), 超出时直接返回 503")
 
 
 class Spider(BaseModel):
@@ -28,10 +46,37 @@ class DB(BaseModel):
     user: str = Field(..., description="数据库用户名")
     password: str = Field(..., description="数据库密码")
     db_name: str = Field(..., description="数据库名称")
+    pool_size: int = Field(10, description="连接池常驻连接数")
+    max_overflow: int = Field(20, description="连接池允许超出 pool_size 的连接数")
+    pool_recycle: int = Field(3600, description="连接回收时间(秒), 需小于 mysql wait_timeout")
+    pool_pre_ping: bool = Field(True, description="取出连接前是否探活")
+    enable_async: bool = Field(False, description="是否启用异步数据库引擎(aiomysql)")
+
+
+class Cache(BaseModel):
+    resource_cache_size: int = Field(10000, description="resource 按 id 读取缓存的最大条目数, 0 为关闭")
+    resource_cache_ttl: float = Field(60, description="resource 按 id 读取缓存的过期时间(秒)")
+
+
+class Metric(BaseModel):
+    sample_interval: float = Field(1.0, description="运行时指标采样间隔(秒)")
+    sample_capacity: int = Field(300, description="运行时指标环形缓冲区保留的采样数")
 
 
 class Storage(BaseModel):
     image_storage_path: str = Field(..., description="图片存储路径")
+    artifact_path: str = Field("./artifact_storage", description="大体积工具结果的存储路径")
+    artifact_threshold: int = Field(16384, description="工具结果超过该字符数时转存, 0 表示不转存")
+    artifact_ttl: float = Field(3600, description="artifact 保留时间(秒)")
+    artifact_max_bytes: int = Field(1073741824, description="artifact 存储总大小上限(字节)")
+
+
+class Sandbox(BaseModel):
+    workers: int = Field(2, description="解析沙箱的进程数, 0 表示在请求线程中执行")
+    timeout: float = Field(5, description="单个任务的超时时间(秒)")
+    cpu_seconds: float = Field(5, description="单个任务的 CPU 时间上限(秒)")
+    memory_mb: int = Field(512, description="单个任务可新增的内存上限(MB)")
+    max_input_chars: int = Field(1000000, description="输入字符数上限")
 
 
 class LiscoConfig(BaseModel):
@@ -40,6 +85,9 @@ class LiscoConfig(BaseModel):
     spider: Spider = Field(..., description="爬虫配置")
     db: DB = Field(..., description="数据库配置")
     storage: Storage = Field(..., description="存储配置")
+    cache: Cache = Field(..., description="缓存配置")
+    metric: Metric = Field(..., description="指标配置")
+    sandbox: Sandbox = Field(..., description="解析沙箱配置")
 
 
 class ConfigManager:
@@ -56,27 +104,80 @@ class ConfigManager:
         try:
             server_host = self.config_parser.get("server", "host")
             server_port = self.config_parser.getint("server", "port")
+            server_workers = self.config_parser.getint("server", "workers", fallback=1)
             api_key = self.config_parser.get("llm", "api_key")
             base_url = self.config_parser.get("llm", "base_url")
             model = self.config_parser.get("llm", "model")
+            models = [m.strip() for m in self.config_parser.get("llm", "models", fallback="").split(",") if m.strip()]
             app_code = self.config_parser.get("llm", "app_code", fallback=None)
+            agent_pool_size = self.config_parser.getint("llm", "agent_pool_size", fallback=4)
+            agent_pool_timeout = self.config_parser.getfloat("llm", "agent_pool_timeout", fallback=30)
+            llm_cache_path = self.config_parser.get("llm", "cache_path", fallback="") or None
+            llm_cache_size = self.config_parser.getint("llm", "cache_size", fallback=1000)
+            llm_cache_ttl = self.config_parser.getfloat("llm", "cache_ttl", fallback=86400)
+            llm_max_connections = self.config_parser.getint("llm", "max_connections", fallback=100)
+            llm_max_keepalive_connections = self.config_parser.getint("llm", "max_keepalive_connections", fallback=20)
+            llm_keepalive_expiry = self.config_parser.getfloat("llm", "keepalive_expiry", fallback=30)
+            llm_connect_timeout = self.config_parser.getfloat("llm", "connect_timeout", fallback=5)
+            llm_read_timeout = self.config_parser.getfloat("llm", "read_timeout", fallback=60)
+            llm_http2 = self.config_parser.getboolean("llm", "http2", fallback=False)
+            llm_batch_max_concurrency = self.config_parser.getint("llm", "batch_max_concurrency", fallback=8)
+            llm_rate_limit_rpm = self.config_parser.getfloat("llm", "rate_limit_rpm", fallback=0)
+            llm_rate_limit_tpm = self.config_parser.getfloat("llm", "rate_limit_tpm", fallback=0)
+            llm_rate_limit_max_waiting = self.config_parser.getint("llm", "rate_limit_max_waiting", fallback=32)
+            llm_rate_limit_max_wait = self.config_parser.getfloat("llm", "rate_limit_max_wait", fallback=10)
             jm_session_id = self.config_parser.get("spider", "jm_session_id", fallback=None)
             db_host = self.config_parser.get("db", "host")
             db_port = self.config_parser.getint("db", "port")
             db_user = self.config_parser.get("db", "user")
             db_password = self.config_parser.get("db", "password")
             db_name = self.config_parser.get("db", "db_name")
+            db_pool_size = self.config_parser.getint("db", "pool_size", fallback=10)
+            db_max_overflow = self.config_parser.getint("db", "max_overflow", fallback=20)
+            db_pool_recycle = self.config_parser.getint("db", "pool_recycle", fallback=3600)
+            db_pool_pre_ping = self.config_parser.getboolean("db", "pool_pre_ping", fallback=True)
+            db_enable_async = self.config_parser.getboolean("db", "enable_async", fallback=False)
             image_storage_path = self.config_parser.get("storage", "image_storage_path")
+            artifact_path = self.config_parser.get("storage", "artifact_path", fallback="./artifact_storage")
+            artifact_threshold = self.config_parser.getint("storage", "artifact_threshold", fallback=16384)
+            artifact_ttl = self.config_parser.getfloat("storage", "artifact_ttl", fallback=3600)
+            artifact_max_bytes = self.config_parser.getint("storage", "artifact_max_bytes", fallback=1073741824)
+            resource_cache_size = self.config_parser.getint("cache", "resource_cache_size", fallback=10000)
+            resource_cache_ttl = self.config_parser.getfloat("cache", "resource_cache_ttl", fallback=60)
+            metric_sample_interval = self.config_parser.getfloat("metric", "sample_interval", fallback=1.0)
+            metric_sample_capacity = self.config_parser.getint("metric", "sample_capacity", fallback=300)
+            sandbox_workers = self.config_parser.getint("sandbox", "workers", fallback=2)
+            sandbox_timeout = self.config_parser.getfloat("sandbox", "timeout", fallback=5)
+            sandbox_cpu_seconds = self.config_parser.getfloat("sandbox", "cpu_seconds", fallback=5)
+            sandbox_memory_mb = self.config_parser.getint("sandbox", "memory_mb", fallback=512)
+            sandbox_max_input_chars = self.config_parser.getint("sandbox", "max_input_chars", fallback=1000000)
         except (configparser.NoSectionError, configparser.NoOptionError) as e:
             raise RuntimeError(f"Missing config section or key: {e}")
 
         self.config = LiscoConfig(
-            server=Server(host=server_host, port=server_port),
+            server=Server(host=server_host, port=server_port, workers=server_workers),
             llm=LLM(
                 api_key=api_key,
                 base_url=base_url,
                 model=model,
+                models=models,
                 app_code=app_code,
+                agent_pool_size=agent_pool_size,
+                agent_pool_timeout=agent_pool_timeout,
+                cache_path=llm_cache_path,
+                cache_size=llm_cache_size,
+                cache_ttl=llm_cache_ttl,
+                max_connections=llm_max_connections,
+                max_keepalive_connections=llm_max_keepalive_connections,
+                keepalive_expiry=llm_keepalive_expiry,
+                connect_timeout=llm_connect_timeout,
+                read_timeout=llm_read_timeout,
+                http2=llm_http2,
+                batch_max_concurrency=llm_batch_max_concurrency,
+                rate_limit_rpm=llm_rate_limit_rpm,
+                rate_limit_tpm=llm_rate_limit_tpm,
+                rate_limit_max_waiting=llm_rate_limit_max_waiting,
+                rate_limit_max_wait=llm_rate_limit_max_wait,
             ),
             spider=Spider(
                 jm_session_id=jm_session_id
@@ -87,9 +188,33 @@ class ConfigManager:
                 user=db_user,
                 password=db_password,
                 db_name=db_name,
+                pool_size=db_pool_size,
+                max_overflow=db_max_overflow,
+                pool_recycle=db_pool_recycle,
+                pool_pre_ping=db_pool_pre_ping,
+                enable_async=db_enable_async,
             ),
             storage=Storage(
-                image_storage_path=image_storage_path
+                image_storage_path=image_storage_path,
+                artifact_path=artifact_path,
+                artifact_threshold=artifact_threshold,
+                artifact_ttl=artifact_ttl,
+                artifact_max_bytes=artifact_max_bytes,
+            ),
+            cache=Cache(
+                resource_cache_size=resource_cache_size,
+                resource_cache_ttl=resource_cache_ttl,
+            ),
+            metric=Metric(
+                sample_interval=metric_sample_interval,
+                sample_capacity=metric_sample_capacity,
+            ),
+            sandbox=Sandbox(
+                workers=sandbox_workers,
+                timeout=sandbox_timeout,
+                cpu_seconds=sandbox_cpu_seconds,
+                memory_mb=sandbox_memory_mb,
+                max_input_chars=sandbox_max_input_chars,
             ),
         )
 
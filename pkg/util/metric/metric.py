@@ -0,0 +1,185 @@
+import bisect
+import math
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+# 秒级延迟直方图的默认分桶
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        按分桶上界估算分位数, 落在最后一个桶时返回最大有限上界
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound if bound != math.inf else self.buckets[-1]
+        return self.buckets[-1]
+
+
+class MetricRegistry:
+    """
+    进程内指标注册表, 支持 counter / gauge / histogram, 线程安全
+
+    api:
+        - inc 计数器累加
+        - set_gauge 设置瞬时值
+        - observe 直方图观测
+        - to_json / to_prometheus 导出
+    多 worker 模式下每个进程各自计数
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, labels: Optional[Dict[str, str]] = None, value: float = 1.0):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def add_gauge(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        labels: Optional[Dict[str, str]] = None,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def to_json(self, prefix: str = "") -> dict:
+        """
+        :param prefix: 只导出以此为前缀的指标
+        """
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                    if name.startswith(prefix)
+                },
+                "gauges": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._gauges.items()
+                    if name.startswith(prefix)
+                },
+                "histograms": {
+                    name: [
+                        {
+                            "labels": dict(key),
+                            "count": histogram.count,
+                            "sum": histogram.sum,
+                            "avg": histogram.sum / histogram.count if histogram.count else None,
+                            "p50": histogram.quantile(0.5),
+                            "p90": histogram.quantile(0.9),
+                            "p99": histogram.quantile(0.99),
+                        }
+                        for key, histogram in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                    if name.startswith(prefix)
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for metric_type, families in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in families.items():
+                    if name in self._help:
+                        lines.append("# HELP {} {}".format(name, self._help[name]))
+                    lines.append("# TYPE {} {}".format(name, metric_type))
+                    for key, value in series.items():
+                        lines.append("{}{} {}".format(name, _format_labels(key), _format_value(value)))
+            for name, series in self._histograms.items():
+                if name in self._help:
+                    lines.append("# HELP {} {}".format(name, self._help[name]))
+                lines.append("# TYPE {} histogram".format(name))
+                for key, histogram in series.items():
+                    for bound, total in histogram.cumulative():
+                        labels = _format_labels(key, [("le", _format_value(bound))])
+                        lines.append("{}_bucket{} {}".format(name, labels, total))
+                    lines.append("{}_sum{} {}".format(name, _format_labels(key), _format_value(histogram.sum)))
+                    lines.append("{}_count{} {}".format(name, _format_labels(key), histogram.count))
+        return "\n".join(lines) + "\n"
+
+
+metric_registry = MetricRegistry()
@@ -0,0 +1,135 @@
+import asyncio
+import gc
+import os
+import resource
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+from anyio import to_thread
+
+from pkg.util.metric.metric import MetricRegistry, metric_registry
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # 非 linux 退化为峰值 RSS (linux 单位 KB)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _open_fds() -> Optional[int]:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+class RuntimeSampler:
+    """
+    进程运行时采样器, 在事件循环中周期性采样, 结果写入环形缓冲区并同步到 metric_registry
+
+    采样内容:
+        - 进程 CPU 使用率、RSS、打开的文件描述符数、线程数
+        - GC 各代计数与回收次数, 采样间隔内的 GC 暂停总时长与最大暂停
+        - 同步路由所用线程池(anyio 默认 limiter)的活跃线程数与排队数
+        - 事件循环延迟: 实际唤醒时间与预期唤醒时间之差
+    """
+
+    def __init__(self, interval: float = 1.0, capacity: int = 300, registry: MetricRegistry = metric_registry):
+        self.interval = interval
+        self.samples = deque(maxlen=capacity)
+        self.registry = registry
+        self._task = None
+        self._lock = threading.Lock()
+        self._gc_start = None
+        self._gc_pause_total = 0.0
+        self._gc_pause_max = 0.0
+        self._last_wall = None
+        self._last_cpu = None
+
+    def _gc_callback(self, phase, info):
+        if phase == "start":
+            self._gc_start = time.perf_counter()
+        elif phase == "stop" and self._gc_start is not None:
+            pause = time.perf_counter() - self._gc_start
+            self._gc_start = None
+            with self._lock:
+                self._gc_pause_total += pause
+                self._gc_pause_max = max(self._gc_pause_max, pause)
+
+    def _cpu_percent(self) -> Optional[float]:
+        times = os.times()
+        wall, cpu = time.monotonic(), times.user + times.system
+        percent = None
+        if self._last_wall is not None and wall > self._last_wall:
+            percent = (cpu - self._last_cpu) / (wall - self._last_wall) * 100
+        self._last_wall, self._last_cpu = wall, cpu
+        return percent
+
+    def snapshot(self, loop_lag: Optional[float] = None) -> dict:
+        """
+        采样一次, 需在事件循环线程内调用(读取线程池 limiter 状态)
+        """
+        with self._lock:
+            gc_pause_total, gc_pause_max = self._gc_pause_total, self._gc_pause_max
+            self._gc_pause_total = self._gc_pause_max = 0.0
+        limiter = to_thread.current_default_thread_limiter()
+        gc_count = gc.get_count()
+        gc_stats = gc.get_stats()
+        sample = {
+            "timestamp": time.time(),
+            "cpu_percent": self._cpu_percent(),
+            "rss_bytes": _rss_bytes(),
+            "open_fds": _open_fds(),
+            "threads": threading.active_count(),
+            "threadpool_active": limiter.borrowed_tokens,
+            "threadpool_size": limiter.total_tokens,
+            "threadpool_waiting": limiter.statistics().tasks_waiting,
+            "event_loop_lag_seconds": loop_lag,
+            "gc_pause_seconds": gc_pause_total,
+            "gc_pause_max_seconds": gc_pause_max,
+        }
+        for generation in range(3):
+            sample["gc_gen{}_count".format(generation)] = gc_count[generation]
+            sample["gc_gen{}_collections".format(generation)] = gc_stats[generation]["collections"]
+        self.samples.append(sample)
+        for key, value in sample.items():
+            if key != "timestamp" and value is not None:
+                self.registry.set_gauge("process_" + key, value)
+        return sample
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.snapshot()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.snapshot(max(loop.time() - expected, 0.0))
+
+    def recent(self, size: Optional[int] = None) -> List[dict]:
+        samples = list(self.samples)
+        if size is not None:
+            samples = samples[-size:] if size > 0 else []
+        return samples
+
+    async def start(self):
+        if self._task is not None:
+            return
+        gc.callbacks.append(self._gc_callback)
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        if self._gc_callback in gc.callbacks:
+            gc.callbacks.remove(self._gc_callback)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,35 @@
+from pkg.util.metric.metric import MetricRegistry
+
+
+def test_counter_and_gauge():
+    registry = MetricRegistry()
+    registry.inc("requests_total", {"app": "/metric"})
+    registry.inc("requests_total", {"app": "/metric"}, 2)
+    registry.set_gauge("in_progress", 3)
+    data = registry.to_json()
+    assert data["counters"]["requests_total"] == [{"labels": {"app": "/metric"}, "value": 3.0}]
+    assert data["gauges"]["in_progress"][0]["value"] == 3
+
+
+def test_histogram_quantile():
+    registry = MetricRegistry()
+    for value in [0.001] * 90 + [2.0] * 10:
+        registry.observe("latency_seconds", value, {"route": "/"})
+    histogram = registry.to_json()["histograms"]["latency_seconds"][0]
+    assert histogram["count"] == 100
+    assert histogram["p50"] == 0.005
+    assert histogram["p99"] == 2.5
+
+
+def test_prometheus_text():
+    registry = MetricRegistry()
+    registry.describe("requests_total", "请求数")
+    registry.inc("requests_total", {"route": '/a"b'})
+    registry.observe("latency_seconds", 0.02, buckets=(0.01, 0.1))
+    text = registry.to_prometheus()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a\\"b"} 1' in text
+    assert 'latency_seconds_bucket{le="0.01"} 0' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 1' in text
+    assert "latency_seconds_count 1" in text
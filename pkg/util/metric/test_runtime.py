@@ -0,0 +1,23 @@
+import asyncio
+
+import pytest
+
+from pkg.util.metric.metric import MetricRegistry
+from pkg.util.metric.runtime import RuntimeSampler
+
+
+@pytest.mark.asyncio
+async def test_runtime_sampler_ring_buffer():
+    registry = MetricRegistry()
+    sampler = RuntimeSampler(interval=0.01, capacity=3, registry=registry)
+    await sampler.start()
+    await asyncio.sleep(0.1)
+    await sampler.stop()
+
+    samples = sampler.recent()
+    assert len(samples) == 3
+    assert len(sampler.recent(1)) == 1
+    assert sampler.recent(1)[0] == samples[-1]
+    assert samples[-1]["event_loop_lag_seconds"] >= 0
+    assert samples[-1]["rss_bytes"] > 0
+    assert "process_threads" in registry.to_json()["gauges"]